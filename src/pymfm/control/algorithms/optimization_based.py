@@ -22,12 +22,17 @@
 
 
 from datetime import datetime
-from typing import Tuple
+from typing import Tuple, Union
 import pandas as pd
 from typing import Tuple
-from pyomo.environ import SolverFactory
 from pyomo.core import *
-from pymfm.control.utils.data_input import Bulk
+from pymfm.control.utils.data_input import (
+    BatteryTable,
+    Bulk,
+    P_net_after_kW_lim_to_arrays,
+    as_battery_table,
+)
+from pymfm.control.utils import solvers, model_capture
 from pyomo.opt import SolverStatus
 import pyomo.kernel as pmo
 
@@ -384,34 +389,23 @@ def obj_rule(model):
     )
 
 
-def scheduling(
+def build_model(
     P_load_gen: pd.Series,
-    df_battery: pd.DataFrame,
+    df_battery: Union[pd.DataFrame, BatteryTable],
     day_end: datetime,
     bulk_data: Bulk,
     P_net_after_kW_limits: pd.DataFrame,
     pv_curtailment: bool,
-) -> Tuple[
-    pd.Series,
-    pd.DataFrame,
-    pd.Series,
-    pd.DataFrame,
-    pd.Series,
-    pd.Series,
-    pd.Series,
-    Tuple[str,str],
-]:
-    """The scheduling optimization function which acts upon the load and generation forecast data considering
+) -> ConcreteModel:
+    """Build the scheduling optimization model from the load and generation forecast data,
     battery specifications, optimization horizon, and power boundaries.
-    Depending on the input data, bulk delivery/reception and PV curtailment can also be satisfied.
-
 
     Parameters
     ----------
     P_load_gen : pd.Series
         load and generation forecast time series of float type.
-    df_battery : pd.DataFrame
-        battery specifications of float and string types.
+    df_battery : Union[pd.DataFrame, BatteryTable]
+        battery specifications of float and string types (see battery_to_df and battery_to_table).
     day_end : datetime
         user-defined end of the day (datetime) till which household batteries should reach
         maximum SoC. By default, its value is set to then sun-set time.
@@ -424,26 +418,13 @@ def scheduling(
     pv_curtailment : bool
         If true, PV generation can be curtailed.
 
-        (solver.status, solver.termination_condition),
-
     Returns
     -------
-    Tuple[ pd.Series, pd.DataFrame, pd.Series, pd.DataFrame, pd.Series, pd.Series, pd.Series, Tuple[Any, Any], ]
-        pv_profile: Series containing the PV (Photovoltaic) profile.
-        P_bat_kW_df: DataFrame containing battery power for different nodes.
-        P_bat_total_kW: Series containing the total battery power.
-        SoC_bat_df: DataFrame containing battery state of charge for different nodes.
-        P_net_after_kW: Series containing net power after control.
-        P_net_after_kW_upperb: Series containing upper bounds for net power after control.
-        P_net_after_kW_lowerb: Series containing lower bounds for net power after control.
-        (str, str): status and details from the solver
+    ConcreteModel
+        the pyomo model including its objective, ready to be solved.
     """
-
-    # Selected optimization solver
-    optimization_solver = SolverFactory("gurobi")
-    # optimization_solver = SolverFactory("scip")
-
     # Initialize necessary values from the inputs
+    battery_table = as_battery_table(df_battery)
     load = P_load_gen.P_load_kW
     generation = P_load_gen.P_gen_kW
     start_time = load.index[0]
@@ -473,7 +454,7 @@ def scheduling(
 
     # Index sets
     # Index set with aggregated battery identifiers
-    model.N = list(df_battery.index)
+    model.N = list(battery_table.index)
     # Index set with optimization horizon time step identifiers
     model.T = tuple(opt_horizon)
     # Index set with battery horizon time step identifiers
@@ -490,10 +471,14 @@ def scheduling(
     model.end_time = end_time
     model.day_end = day_end
     # P_net_after_kW (import-export) limits for every each timestamp enabling the microgrid to go full islanding (if both are zero)
-    model.upper_bound_kW = P_net_after_kW_limits.upper_bound
-    model.lower_bound_kW = P_net_after_kW_limits.lower_bound
-    model.with_upper_bound = P_net_after_kW_limits.with_upper_bound
-    model.with_lower_bound = P_net_after_kW_limits.with_lower_bound
+    limits = P_net_after_kW_lim_to_arrays(P_net_after_kW_limits, opt_horizon)
+    model.upper_bound_kW = pd.Series(limits["upper_bound"], index=opt_horizon)
+    model.lower_bound_kW = pd.Series(limits["lower_bound"], index=opt_horizon)
+    model.with_upper_bound = pd.Series(limits["with_upper_bound"], index=opt_horizon)
+    model.with_lower_bound = pd.Series(limits["with_lower_bound"], index=opt_horizon)
+    # Index sets with the bounded time step identifiers
+    model.T_upper_bound = tuple(opt_horizon[limits["with_upper_bound"]])
+    model.T_lower_bound = tuple(opt_horizon[limits["with_lower_bound"]])
     # Forecast parameters
     # Total load and generation forecast
     model.P_net_before_kW = considered_load_forecast - considered_generation_forecast
@@ -504,25 +489,25 @@ def scheduling(
     # Battery parameters
     # Type of the battery
     # cbes: comunity battery energy storage, hbes: household battery energy storage
-    model.bat_type = df_battery.bat_type
+    model.bat_type = battery_table.mapping("bat_type")
     # Minimum allowable state of charge of the battery n
-    model.min_SoC_bat = df_battery.min_SoC
+    model.min_SoC_bat = battery_table.mapping("min_SoC")
     # Maximum allowable state of charge of the battery n
-    model.max_SoC_bat = df_battery.max_SoC
+    model.max_SoC_bat = battery_table.mapping("max_SoC")
     # State of charge value of battery n at the beginning of the optimization horizon
-    model.ini_SoC_bat = df_battery.initial_SoC
+    model.ini_SoC_bat = battery_table.mapping("initial_SoC")
     # The value of the final state of charge (if given) to be reached for the battery n at the end of the optimization horizon
-    model.final_SoC_bat = df_battery.final_SoC
+    model.final_SoC_bat = battery_table.mapping("final_SoC")
     # Capacity of the battery n (kWsec)
-    model.bat_capacity_kWs = df_battery.bat_capacity_kWs
+    model.bat_capacity_kWs = battery_table.mapping("bat_capacity_kWs")
     # Maximum charging power of the battery n (KW)
-    model.P_ch_bat_max_kW = df_battery.P_ch_max_kW
+    model.P_ch_bat_max_kW = battery_table.mapping("P_ch_max_kW")
     # Maximum discharging power of the battery n (KW)
-    model.P_dis_bat_max_kW = df_battery.P_dis_max_kW
+    model.P_dis_bat_max_kW = battery_table.mapping("P_dis_max_kW")
     # Charging efficiency of the battery n
-    model.ch_eff_bat = df_battery.ch_efficiency
+    model.ch_eff_bat = battery_table.mapping("ch_efficiency")
     # Discharging efficiency of the battery n
-    model.dis_eff_bat = df_battery.dis_efficiency
+    model.dis_eff_bat = battery_table.mapping("dis_efficiency")
     # Bulk parameters (bulk energy)
     if bulk_data is not None:
         # Bulk energy of battery assets (kWsec)
@@ -577,10 +562,10 @@ def scheduling(
     model.bat_min_SoC = Constraint(model.N, model.T_SoC_bat, rule=bat_min_SoC)
     model.bat_max_SoC = Constraint(model.N, model.T_SoC_bat, rule=bat_max_SoC)
     model.P_net_after_kW_upper_bound = Constraint(
-        model.T, rule=P_net_after_kW_upper_bound
+        model.T_upper_bound, rule=P_net_after_kW_upper_bound
     )
     model.P_net_after_kW_lower_bound = Constraint(
-        model.T, rule=P_net_after_kW_lower_bound
+        model.T_lower_bound, rule=P_net_after_kW_lower_bound
     )
     model.ch_dis_binary = Constraint(model.N, model.T, rule=ch_dis_binary)
     model.imp_exp_binary = Constraint(model.T, rule=imp_exp_binary)
@@ -593,24 +578,142 @@ def scheduling(
     model.hbes_avoid_diss = Constraint(model.N, model.T, rule=hbes_avoid_diss)
     model.pv_curtailment_constr = Constraint(model.T, rule=pv_curtailment_constr)
 
-    # Objective function and solver
+    # Objective function
     ######################################################################################################
     model.obj = Objective(rule=obj_rule, sense=minimize)
-    solver = optimization_solver.solve(model).solver
 
+    return model
+
+
+def scheduling(
+    P_load_gen: pd.Series,
+    df_battery: Union[pd.DataFrame, BatteryTable],
+    day_end: datetime,
+    bulk_data: Bulk,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+    solver: str = None,
+    capture_directory: str = None,
+    input_hash: str = None,
+    solver_options: dict = None,
+) -> Tuple[
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.Series,
+    pd.Series,
+    Tuple[str,str],
+]:
+    """The scheduling optimization function which acts upon the load and generation forecast data considering
+    battery specifications, optimization horizon, and power boundaries.
+    Depending on the input data, bulk delivery/reception and PV curtailment can also be satisfied.
+
+
+    Parameters
+    ----------
+    P_load_gen : pd.Series
+        load and generation forecast time series of float type.
+    df_battery : Union[pd.DataFrame, BatteryTable]
+        battery specifications of float and string types (see battery_to_df and battery_to_table).
+    day_end : datetime
+        user-defined end of the day (datetime) till which household batteries should reach
+        maximum SoC. By default, its value is set to then sun-set time.
+    bulk_data : Bulk
+        Class related to the bulk delivery/reception of energy from batteries including bulk_start
+        and _end datetime and the bulk_energy_kWh float.
+    P_net_after_kW_limits : pd.DataFrame
+        consisiting of upper and lower bound float time series (kW) and
+        the integer identifiers for the existance of any upper or lower bounds.
+    pv_curtailment : bool
+        If true, PV generation can be curtailed.
+    solver : str, optional
+        name of a registered solver backend (see pymfm.control.utils.solvers), by default
+        the backend selected by the PYMFM_SOLVER environment variable or gurobi.
+    capture_directory : str, optional
+        If given, the built model is dumped into this directory for offline analysis
+        (see pymfm.control.utils.model_capture), by default None.
+    input_hash : str, optional
+        hash of the InputData identifying the capture, by default None.
+    solver_options : dict, optional
+        solver options overriding the defaults of the solver backend (e.g. a time limit, see
+        pymfm.control.utils.solvers.time_limit_options), by default None.
+
+    Returns
+    -------
+    Tuple[ pd.Series, pd.DataFrame, pd.Series, pd.DataFrame, pd.Series, pd.Series, pd.Series, Tuple[Any, Any], ]
+        pv_profile: Series containing the PV (Photovoltaic) profile.
+        P_bat_kW_df: DataFrame containing battery power for different nodes.
+        P_bat_total_kW: Series containing the total battery power.
+        SoC_bat_df: DataFrame containing battery state of charge for different nodes.
+        P_net_after_kW: Series containing net power after control.
+        P_net_after_kW_upperb: Series containing upper bounds for net power after control.
+        P_net_after_kW_lowerb: Series containing lower bounds for net power after control.
+        (str, str): status and details from the solver
+    """
+
+    model = build_model(
+        P_load_gen,
+        df_battery,
+        day_end,
+        bulk_data,
+        P_net_after_kW_limits,
+        pv_curtailment,
+    )
+    if capture_directory is None:
+        solver = solvers.solve(model, solver, solver_options).solver
+    else:
+        solver = model_capture.capture_and_solve(
+            model, capture_directory, input_hash, solver, solver_options
+        ).solver
+
+    return extract_results(model, df_battery, solver)
+
+
+def extract_results(
+    model: ConcreteModel, df_battery: Union[pd.DataFrame, BatteryTable], solver
+) -> Tuple[
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.Series,
+    pd.Series,
+    Tuple[str,str],
+]:
+    """Post-process a solved scheduling optimization model.
+
+    Parameters
+    ----------
+    model : ConcreteModel
+        the solved pyomo model (see build_model).
+    df_battery : Union[pd.DataFrame, BatteryTable]
+        battery specifications of float and string types (see battery_to_df and battery_to_table).
+    solver : SolverInformation
+        solver information of the solver results (results.solver).
+
+    Returns
+    -------
+    Tuple[ pd.Series, pd.DataFrame, pd.Series, pd.DataFrame, pd.Series, pd.Series, pd.Series, Tuple[Any, Any], ]
+        the results as returned by scheduling.
+    """
     #####################################################################################################
     ##################################       POST PROCESSING             ################################
     # Initialize DataFrames and Series to store post-processing results
-    P_bat_kW_df = pd.DataFrame(index=model.T, columns=df_battery.index)
+    batteries = list(as_battery_table(df_battery).index)
+    P_bat_kW_df = pd.DataFrame(index=model.T, columns=batteries)
     P_bat_total_kW = pd.Series(
         index=model.T, dtype=float
     )  # Total battery power (discharging: negative, charging: positive)
     P_net_after_kW = pd.Series(index=model.T, dtype=float)
-    bat_ch = pd.DataFrame(index=model.T, columns=df_battery.index)
-    bat_dis = pd.DataFrame(index=model.T, columns=df_battery.index)
-    SoC_bat_df = pd.DataFrame(index=model.T_SoC_bat, columns=df_battery.index)
-    lower_bound = pd.Series(index=model.T, dtype=float)
-    upper_bound = pd.Series(index=model.T, dtype=float)
+    bat_ch = pd.DataFrame(index=model.T, columns=batteries)
+    bat_dis = pd.DataFrame(index=model.T, columns=batteries)
+    SoC_bat_df = pd.DataFrame(index=model.T_SoC_bat, columns=batteries)
+    # Lower and upper bounds where they exist for the time step (NaN otherwise)
+    lower_bound = model.lower_bound_kW.where(model.with_lower_bound)
+    upper_bound = model.upper_bound_kW.where(model.with_upper_bound)
 
     # Loop through time steps to calculate and store post-processing results
     for t in model.T:
@@ -632,14 +735,8 @@ def scheduling(
         # Store the total supply in P_bat_total_kW
         P_bat_total_kW[t] = total_supply
 
-        # Check if lower and upper bounds exist for this time step and store them
-        if model.with_lower_bound[t]:
-            lower_bound[t] = model.lower_bound_kW[t]
-        if model.with_upper_bound[t]:
-            upper_bound[t] = model.upper_bound_kW[t]
-
     # Loop through battery nodes (col) to extract charging, discharging, and SoC data
-    for col in df_battery.index:
+    for col in batteries:
         bat_ch[col] = model.P_ch_bat_kW[col, :]()
         bat_dis[col] = model.P_dis_bat_kW[col, :]()
         SoC_bat_df[col] = model.SoC_bat[col, :]()
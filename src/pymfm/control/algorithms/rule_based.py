@@ -21,12 +21,21 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
+from typing import List, Tuple
+import numpy as np
 import pandas as pd
 from datetime import timedelta
-from pymfm.control.utils.data_input import BatterySpecs
+from pymfm.control.utils.data_input import BatteryTable, PreparedBattery
 
 
-def near_real_time(measurements_request_dict: dict, battery_specs: BatterySpecs):
+# Order in which the battery types are charged from a surplus
+CHARGE_PRIORITY = ("hbes", "cbes")
+# Order in which the battery types are discharged in a deficit, household batteries (hbes)
+# are not discharged (as in the optimization based control)
+DISCHARGE_PRIORITY = ("cbes",)
+
+
+def near_real_time(measurements_request_dict: dict, battery_specs: PreparedBattery):
     """
     For this operation mode, rule based logic is implemented on the net power measurement of
     the microgrid respecting battery boundaries.
@@ -39,10 +48,10 @@ def near_real_time(measurements_request_dict: dict, battery_specs: BatterySpecs)
         In the measurement_request dictionary, for each time stamp (datetime), the corresponding
         float values for the requested (P_req_kW) and measured (P_net_meas_kW) net power
         consumption of the microgrid (in kW).
-    battery_specs : pymfm.control.utils.data_input.BatterySpecs 
-        BatterySpecs class and the corresponding pydantic model representing
-        string values of battery "type" and "id" and float values of initital SoC in %,
-        maximum charging and discharging powers in kW, min and max SoC in %, battery capacity in kWh,
+    battery_specs : pymfm.control.utils.data_input.PreparedBattery
+        PreparedBattery class (as prepared by input_prep) representing
+        string values of battery "type" and "id" and float values of initital SoC (between 0 and 1),
+        maximum charging and discharging powers in kW, min and max SoC (between 0 and 1), battery capacity in kWh,
         and (dis)charging efficiency (0<efficiency<=1)
 
     Returns
@@ -152,7 +161,7 @@ def near_real_time(measurements_request_dict: dict, battery_specs: BatterySpecs)
     return output
 
 
-def scheduling(P_load_gen: pd.Series, battery_specs: BatterySpecs, delta_T: timedelta):
+def scheduling(P_load_gen: pd.Series, battery_specs: PreparedBattery, delta_T: timedelta):
     """
     For the scheduling operation mode and with the rule based logic, the same control method as
     in (near) real time is implemented. However, this logic is implemented on the net power
@@ -162,8 +171,8 @@ def scheduling(P_load_gen: pd.Series, battery_specs: BatterySpecs, delta_T: time
     ----------
     P_load_gen : pd.Series
         load and generation forecast time series of float type
-    param battery_specs : pymfm.control.utils.data_input.BatterySpecs
-        BatterySpecs class and the corresponding pydantic model representing
+    param battery_specs : pymfm.control.utils.data_input.PreparedBattery
+        PreparedBattery class (as prepared by input_prep) representing
         string values of battery "type" and "id" and float values of initital SoC (between 0 and 1),
         maximum charging and discharging powers in kW, min and max SoC (between 0 and 1), battery capacity in kWh,
         and (dis)charging efficiency (0<efficiency<=1)
@@ -280,3 +289,197 @@ def scheduling(P_load_gen: pd.Series, battery_specs: BatterySpecs, delta_T: time
     )  # charging: positiv, discharging: negativ
 
     return output_ds
+
+
+def battery_labels(battery_table: BatteryTable) -> List[str]:
+    """
+    Labels of the batteries in the output columns: their ids, or bat_1, bat_2, ... without ids.
+
+    :param battery_table: The battery specifications.
+    :return: The labels in row order.
+    """
+    if battery_table.has_ids:
+        return [str(battery_id) for battery_id in battery_table.index]
+    return [f"bat_{i + 1}" for i in range(len(battery_table))]
+
+
+def _priority_groups(battery_table: BatteryTable, priority: Tuple[str]) -> List[np.ndarray]:
+    """
+    Rows of the batteries of every battery type, in priority order.
+    """
+    groups = [np.flatnonzero(battery_table.bat_type == bat_type) for bat_type in priority]
+    return [group for group in groups if len(group) > 0]
+
+
+def _allocate(demand_kW: float, capacity_kW: np.ndarray, groups: List[np.ndarray]) -> np.ndarray:
+    """
+    Allocate a (non-negative) power demand over the batteries. The groups are served one after
+    another in priority order and within a group proportional to the available power capacity
+    of the batteries, so all batteries of a group reach their limits at the same time.
+
+    :param demand_kW: The power demand in kW.
+    :param capacity_kW: The available (dis)charging power of every battery in kW.
+    :param groups: Battery rows of every priority group.
+    :return: The allocated power of every battery in kW.
+    """
+    allocation_kW = np.zeros_like(capacity_kW)
+    for group in groups:
+        if demand_kW <= 0:
+            break
+        group_capacity_kW = capacity_kW[group].sum()
+        if group_capacity_kW <= 0:
+            continue
+        share = min(1.0, demand_kW / group_capacity_kW)
+        allocation_kW[group] = capacity_kW[group] * share
+        demand_kW -= group_capacity_kW * share
+    return allocation_kW
+
+
+def fleet_dispatch(
+    P_net_before_kW: np.ndarray,
+    battery_table: BatteryTable,
+    delta_T: timedelta,
+    charge_priority: Tuple[str] = CHARGE_PRIORITY,
+    discharge_priority: Tuple[str] = DISCHARGE_PRIORITY,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Rule based dispatch of a battery fleet: in every time step a deficit is covered by
+    discharging and a surplus is absorbed by charging the batteries, respecting their power and
+    SoC limits. The power is allocated over the batteries by priority of their type and within a
+    type proportional to their available power (see _allocate). Every time step is computed with
+    NumPy over the battery axis. The (dis)charging efficiencies are applied as in scheduling and
+    the optimization model: discharging P depletes dis_efficiency * P * delta_T, charging P adds
+    P * delta_T / ch_efficiency.
+
+    Parameters
+    ----------
+    P_net_before_kW : np.ndarray
+        net power consumption (load - generation) of every time step in kW.
+    battery_table : BatteryTable
+        battery specifications (as prepared by input_prep) with SoCs between 0 and 1.
+    delta_T : timedelta
+        time step of the net power time series.
+    charge_priority : Tuple[str], optional
+        battery types charged from a surplus, in priority order, by default CHARGE_PRIORITY.
+    discharge_priority : Tuple[str], optional
+        battery types discharged in a deficit, in priority order, by default DISCHARGE_PRIORITY.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray]
+        P_bat_kW: (time steps x batteries) battery power in kW (charging: positive, discharging: negative).
+        SoC_bat: (time steps x batteries) SoC at the end of every time step (between 0 and 1).
+        P_net_after_kW: net power after control of every time step in kW.
+    """
+    P_net_before_kW = np.asarray(P_net_before_kW, dtype=float)
+    delta_T_s = delta_T.total_seconds()
+    capacity_kWs = battery_table.bat_capacity_kWs.astype(float)
+    ch_eff = battery_table.ch_efficiency.astype(float)
+    dis_eff = battery_table.dis_efficiency.astype(float)
+    P_ch_max_kW = battery_table.P_ch_max_kW.astype(float)
+    P_dis_max_kW = battery_table.P_dis_max_kW.astype(float)
+    min_energy_kWs = battery_table.min_SoC * capacity_kWs
+    max_energy_kWs = battery_table.max_SoC * capacity_kWs
+    charge_groups = _priority_groups(battery_table, charge_priority)
+    discharge_groups = _priority_groups(battery_table, discharge_priority)
+
+    n_steps, n_batteries = len(P_net_before_kW), len(battery_table)
+    P_bat_kW = np.zeros((n_steps, n_batteries))
+    SoC_bat = np.zeros((n_steps, n_batteries))
+    energy_kWs = battery_table.initial_SoC * capacity_kWs
+    for t, P_net_kW in enumerate(P_net_before_kW):
+        if P_net_kW > 0:
+            # Deficit: discharge, limited by the power and the energy above min_SoC
+            capacity_kW = np.clip(
+                np.minimum(P_dis_max_kW, (energy_kWs - min_energy_kWs) / (dis_eff * delta_T_s)),
+                0.0,
+                None,
+            )
+            P_dis_kW = _allocate(P_net_kW, capacity_kW, discharge_groups)
+            energy_kWs = energy_kWs - dis_eff * P_dis_kW * delta_T_s
+            P_bat_kW[t] = -P_dis_kW
+        elif P_net_kW < 0:
+            # Surplus: charge, limited by the power and the energy below max_SoC
+            capacity_kW = np.clip(
+                np.minimum(P_ch_max_kW, (max_energy_kWs - energy_kWs) * ch_eff / delta_T_s),
+                0.0,
+                None,
+            )
+            P_ch_kW = _allocate(-P_net_kW, capacity_kW, charge_groups)
+            energy_kWs = energy_kWs + P_ch_kW * delta_T_s / ch_eff
+            P_bat_kW[t] = P_ch_kW
+        SoC_bat[t] = energy_kWs / capacity_kWs
+    P_net_after_kW = P_net_before_kW + P_bat_kW.sum(axis=1)
+    return P_bat_kW, SoC_bat, P_net_after_kW
+
+
+def fleet_scheduling(
+    P_load_gen: pd.DataFrame, battery_table: BatteryTable, delta_T: timedelta
+) -> pd.DataFrame:
+    """
+    Rule based scheduling of multiple batteries on the net power forecast (see fleet_dispatch).
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast time series of float type.
+    battery_table : BatteryTable
+        battery specifications (as prepared by input_prep).
+    delta_T : timedelta
+        time step of the forecast time series.
+
+    Returns
+    -------
+    pd.DataFrame
+        For every forecast timestamp, the net power consumption before "P_net_before_kW" and
+        after "P_net_after_kW" control action in kW, the power setpoint "P_<battery>_kW" in kW
+        (charging: positive, discharging: negative) and SoC "SoC_<battery>_%" in % after the time
+        step of every battery, and the total battery power "P_bat_total_kW" in kW.
+    """
+    P_net_before_kW = (P_load_gen.P_load_kW - P_load_gen.P_gen_kW).to_numpy(dtype=float)
+    P_bat_kW, SoC_bat, P_net_after_kW = fleet_dispatch(
+        P_net_before_kW, battery_table, delta_T
+    )
+    output = {"P_net_before_kW": P_net_before_kW, "P_net_after_kW": P_net_after_kW}
+    for i, label in enumerate(battery_labels(battery_table)):
+        output[f"P_{label}_kW"] = P_bat_kW[:, i]
+        output[f"SoC_{label}_%"] = SoC_bat[:, i] * 100
+    output["P_bat_total_kW"] = P_bat_kW.sum(axis=1)
+    return pd.DataFrame(output, index=P_load_gen.index)
+
+
+def fleet_near_real_time(
+    measurements_request_dict: dict, battery_table: BatteryTable
+) -> dict:
+    """
+    Rule based near real-time control of multiple batteries (see fleet_dispatch): the deviation
+    of the measured net power from the requested net power is covered by the batteries.
+
+    Parameters
+    ----------
+    measurements_request_dict : dict
+        timestamp, requested (P_req_kW) and measured (P_net_meas_kW) net power consumption of
+        the microgrid in kW and the time step delta_T_h in hours.
+    battery_table : BatteryTable
+        battery specifications (as prepared by input_prep).
+
+    Returns
+    -------
+    dict
+        The output of near_real_time, with the initial SoC "initial_SoC_bat_%", final SoC
+        "SoC_bat_%" and power setpoint "P_bat_kW" (charging: positive) given per battery label.
+    """
+    P_bat_kW, SoC_bat, P_net_after_kW = fleet_dispatch(
+        [measurements_request_dict["P_net_meas_kW"] - measurements_request_dict["P_req_kW"]],
+        battery_table,
+        timedelta(hours=measurements_request_dict["delta_T_h"]),
+    )
+    labels = battery_labels(battery_table)
+    return {
+        "timestamp": measurements_request_dict["timestamp"],
+        "initial_SoC_bat_%": dict(zip(labels, (battery_table.initial_SoC * 100).tolist())),
+        "SoC_bat_%": dict(zip(labels, (SoC_bat[0] * 100).tolist())),
+        "P_bat_kW": dict(zip(labels, P_bat_kW[0].tolist())),
+        "P_net_meas_kW": measurements_request_dict["P_net_meas_kW"],
+        "P_net_after_kW": float(P_net_after_kW[0]),
+    }
@@ -0,0 +1,693 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import argparse
+import time
+from datetime import datetime
+from typing import List, Tuple, Union
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from pyomo.core import (
+    ConcreteModel,
+    Objective,
+    Var,
+    Binary,
+    Reals,
+    minimize,
+    value,
+)
+from pyomo.core.base.matrix_constraint import MatrixConstraint
+from pyomo.core.expr.numeric_expr import LinearExpression
+from pymfm.control.utils.data_input import (
+    BatteryTable,
+    Bulk,
+    InputData,
+    as_battery_table,
+    open_json,
+)
+from pymfm.control.utils import data_input, solvers, model_capture
+
+
+class _RowAssembler:
+    """
+    Collects constraint rows in coordinate format. Every call adds a block of rows with the
+    same number of non-zeros per row, so whole blocks are assembled with NumPy at once.
+    """
+
+    def __init__(self):
+        self.rows, self.cols, self.coefs = [], [], []
+        self.lower, self.upper = [], []
+        self.n_rows = 0
+
+    def add(self, cols: np.ndarray, coefs: np.ndarray, lower, upper):
+        """
+        Add a block of rows lower <= coefs @ x[cols] <= upper.
+
+        :param cols: (... x non-zeros) array of variable columns, one row per leading index.
+        :param coefs: array of coefficients broadcastable to cols.
+        :param lower: lower bounds of the rows (-np.inf if none), broadcastable to the leading shape of cols.
+        :param upper: upper bounds of the rows (np.inf if none), broadcastable to the leading shape of cols.
+        :return: None
+        """
+        cols = np.asarray(cols)
+        if cols.ndim == 1:
+            cols = cols[None, :]
+        block_shape, nnz = cols.shape[:-1], cols.shape[-1]
+        m = int(np.prod(block_shape))
+        if m == 0:
+            return
+        self.rows.append(np.repeat(np.arange(self.n_rows, self.n_rows + m), nnz))
+        self.cols.append(cols.reshape(-1))
+        self.coefs.append(np.broadcast_to(coefs, cols.shape).reshape(-1).astype(float))
+        self.lower.append(
+            np.broadcast_to(np.asarray(lower, dtype=float), block_shape).reshape(-1)
+        )
+        self.upper.append(
+            np.broadcast_to(np.asarray(upper, dtype=float), block_shape).reshape(-1)
+        )
+        self.n_rows += m
+
+    def matrix(self, n_cols: int) -> Tuple[sparse.csr_matrix, np.ndarray, np.ndarray]:
+        """
+        Assemble the sparse constraint matrix.
+
+        :param n_cols: The number of variables.
+        :return: Tuple of the CSR matrix and the lower and upper row bounds.
+        """
+        A = sparse.csr_matrix(
+            (
+                np.concatenate(self.coefs),
+                (np.concatenate(self.rows), np.concatenate(self.cols)),
+            ),
+            shape=(self.n_rows, n_cols),
+        )
+        return A, np.concatenate(self.lower), np.concatenate(self.upper)
+
+
+def build_model(
+    P_load_gen_scenarios: List[pd.DataFrame],
+    probabilities: List[float],
+    df_battery: Union[pd.DataFrame, BatteryTable],
+    day_end: datetime,
+    bulk_data: Bulk,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+) -> ConcreteModel:
+    """Build the two-stage stochastic scheduling optimization model.
+
+    The battery setpoints and SoCs (first stage) are shared by all K forecast scenarios,
+    PV, import and export (second stage) are decided per scenario, and the expected grid
+    interaction is minimized. The constraints are those of the deterministic optimization
+    based scheduling. Its bilinear import/export terms are linearized exactly: import is
+    bounded by the deficit (deficit_case_1, surplus_case_2) and export by the surplus plus the
+    discharging power, which gives tight big-M values for the binaries. All scenario blocks
+    are assembled at once as a sparse matrix, which is handed to Pyomo as a MatrixConstraint.
+
+    Parameters
+    ----------
+    P_load_gen_scenarios : List[pd.DataFrame]
+        load and generation forecast time series of each scenario, all on the same timestamps.
+    probabilities : List[float]
+        probability of each scenario.
+    df_battery : Union[pd.DataFrame, BatteryTable]
+        battery specifications of float and string types (see battery_to_df and battery_to_table).
+    day_end : datetime
+        user-defined end of the day (datetime) till which household batteries should reach
+        maximum SoC.
+    bulk_data : Bulk
+        bulk delivery/reception of energy from batteries (optional).
+    P_net_after_kW_limits : pd.DataFrame
+        consisiting of upper and lower bound float time series (kW) and
+        the integer identifiers for the existance of any upper or lower bounds.
+    pv_curtailment : bool
+        If true, PV generation can be curtailed.
+
+    Returns
+    -------
+    ConcreteModel
+        the pyomo model including its objective, ready to be solved.
+    """
+    opt_horizon = P_load_gen_scenarios[0].index
+    for k, P_load_gen in enumerate(P_load_gen_scenarios):
+        if not P_load_gen.index.equals(opt_horizon):
+            raise ValueError(
+                f"forecast scenario {k} does not have the timestamps of forecast scenario 0."
+            )
+    delta_T = pd.to_timedelta(opt_horizon.freq)
+    dT_s = delta_T.total_seconds()
+    soc_horizon = opt_horizon.append(pd.DatetimeIndex([opt_horizon[-1] + delta_T]))
+    battery_table = as_battery_table(df_battery)
+    K, T, N = len(P_load_gen_scenarios), len(opt_horizon), len(battery_table)
+
+    # Scenario data (K x T)
+    load = np.vstack([df.P_load_kW.to_numpy(dtype=float) for df in P_load_gen_scenarios])
+    generation = np.vstack(
+        [df.P_gen_kW.to_numpy(dtype=float) for df in P_load_gen_scenarios]
+    )
+    P_net_before_kW = load - generation
+    probabilities = np.asarray(probabilities, dtype=float)
+
+    # Battery data (N x 1)
+    capacity_kWs = battery_table.bat_capacity_kWs.astype(float)[:, None]
+    ch_eff = battery_table.ch_efficiency.astype(float)[:, None]
+    dis_eff = battery_table.dis_efficiency.astype(float)[:, None]
+    P_ch_max_kW = battery_table.P_ch_max_kW.astype(float)[:, None]
+    P_dis_max_kW = battery_table.P_dis_max_kW.astype(float)[:, None]
+    is_hbes = battery_table.is_hbes
+
+    # Column layout of the variable vector
+    blocks = {}
+    n_cols = 0
+    for name, shape in [
+        ("P_ch_bat_kW", (N, T)),
+        ("P_dis_bat_kW", (N, T)),
+        ("x_ch", (N, T)),
+        ("x_dis", (N, T)),
+        ("SoC_bat", (N, T + 1)),
+        ("P_PV_kW", (K, T)),
+        ("P_imp_kW", (K, T)),
+        ("P_exp_kW", (K, T)),
+        ("x_imp", (K, T)),
+        ("x_exp", (K, T)),
+        ("alpha_imp", (K,)),
+        ("alpha_exp", (K,)),
+    ]:
+        blocks[name] = n_cols + np.arange(int(np.prod(shape))).reshape(shape)
+        n_cols += int(np.prod(shape))
+    ch, dis = blocks["P_ch_bat_kW"], blocks["P_dis_bat_kW"]
+    x_ch, x_dis, soc = blocks["x_ch"], blocks["x_dis"], blocks["SoC_bat"]
+    pv, imp, exp = blocks["P_PV_kW"], blocks["P_imp_kW"], blocks["P_exp_kW"]
+    x_imp, x_exp = blocks["x_imp"], blocks["x_exp"]
+
+    # Variable bounds
+    lower = np.zeros(n_cols)
+    upper = np.full(n_cols, np.inf)
+    upper[x_ch] = upper[x_dis] = upper[x_imp] = upper[x_exp] = 1
+    # SoC limits, initial and final SoC (bat_min_SoC, bat_max_SoC, bat_init_SoC, bat_final_SoC)
+    lower[soc] = battery_table.min_SoC[:, None]
+    upper[soc] = battery_table.max_SoC[:, None]
+    lower[soc[:, 0]] = upper[soc[:, 0]] = battery_table.initial_SoC
+    with_final_SoC = battery_table.with_final_SoC
+    if with_final_SoC.any():
+        hbes = np.flatnonzero(with_final_SoC & is_hbes)
+        if len(hbes) > 0:
+            k = soc_horizon.get_loc(day_end)
+            lower[soc[hbes, k]] = upper[soc[hbes, k]] = battery_table.max_SoC[hbes]
+        cbes = np.flatnonzero(with_final_SoC & ~is_hbes)
+        lower[soc[cbes, T - 1]] = upper[soc[cbes, T - 1]] = battery_table.final_SoC[cbes]
+    # Household batteries are not discharged (hbes_avoid_diss)
+    upper[dis[is_hbes]] = 0
+    # No charging in timestamps with a deficit in any scenario (deficit_case_2)
+    upper[ch[:, (P_net_before_kW >= 0).any(axis=0)]] = 0
+    # PV generation (pv_curtailment_constr)
+    upper[pv] = generation
+    if not pv_curtailment:
+        lower[pv] = generation
+    # Import only up to the deficit, export up to surplus plus discharging (deficit_case_1, surplus_case_2)
+    M_imp = np.clip(P_net_before_kW, 0, None)
+    M_exp = P_dis_max_kW[~is_hbes].sum() + np.clip(-P_net_before_kW, 0, None)
+    upper[imp] = M_imp
+    upper[exp] = M_exp
+
+    rows = _RowAssembler()
+    # Battery SoC update (bat_charging)
+    rows.add(
+        np.stack([soc[:, 1:], soc[:, :-1], ch, dis], axis=-1),
+        np.stack(
+            np.broadcast_arrays(
+                1.0, -1.0, -dT_s / (ch_eff * capacity_kWs), dT_s * dis_eff / capacity_kWs
+            ),
+            axis=-1,
+        ),
+        0,
+        0,
+    )
+    # Maximum (dis)charging power and charge/discharge exclusion
+    # (bat_max_ch_power, bat_max_dis_power, ch_dis_binary)
+    rows.add(
+        np.stack([ch, x_ch], axis=-1),
+        np.stack(np.broadcast_arrays(1.0, -P_ch_max_kW), axis=-1),
+        -np.inf,
+        0,
+    )
+    rows.add(
+        np.stack([dis, x_dis], axis=-1),
+        np.stack(np.broadcast_arrays(1.0, -P_dis_max_kW), axis=-1),
+        -np.inf,
+        0,
+    )
+    rows.add(np.stack([x_ch, x_dis], axis=-1), 1.0, -np.inf, 1)
+    # Charging only with the surplus of the scenario with the least surplus (surplus_case_1)
+    surplus = (P_net_before_kW <= 0).all(axis=0)
+    rows.add(
+        ch[:, surplus].T,
+        (1 / ch_eff).T,
+        -np.inf,
+        (-P_net_before_kW[:, surplus]).min(axis=0),
+    )
+    # Bulk energy (bulk_energy)
+    if bulk_data is not None:
+        bulk_horizon = pd.date_range(
+            bulk_data.bulk_start, bulk_data.bulk_end, freq=delta_T, inclusive="both"
+        )
+        bulk_t = opt_horizon.get_indexer(bulk_horizon)
+        if (bulk_t < 0).any():
+            raise ValueError("The bulk window is not within the optimization horizon.")
+        rows.add(
+            np.concatenate([dis[:, bulk_t].ravel(), ch[:, bulk_t].ravel()]),
+            np.concatenate(
+                [
+                    np.broadcast_to(dT_s * dis_eff, (N, len(bulk_t))).ravel(),
+                    np.broadcast_to(-dT_s / ch_eff, (N, len(bulk_t))).ravel(),
+                ]
+            ),
+            -bulk_data.bulk_energy_kWh * 3600,
+            -bulk_data.bulk_energy_kWh * 3600,
+        )
+    # Power balance per scenario (power_balance)
+    rows.add(
+        np.concatenate(
+            [
+                np.broadcast_to(ch.T[None, :, :], (K, T, N)),
+                np.broadcast_to(dis.T[None, :, :], (K, T, N)),
+                np.stack([exp, imp, pv], axis=-1),
+            ],
+            axis=-1,
+        ),
+        np.concatenate([np.ones(N), -np.ones(N), [1.0, -1.0, -1.0]]),
+        -load,
+        -load,
+    )
+    # Import/export binaries (imp_exp_binary and the linearization of the bilinear terms)
+    rows.add(
+        np.stack([imp, x_imp], axis=-1),
+        np.stack(np.broadcast_arrays(1.0, -M_imp), axis=-1),
+        -np.inf,
+        0,
+    )
+    rows.add(
+        np.stack([exp, x_exp], axis=-1),
+        np.stack(np.broadcast_arrays(1.0, -M_exp), axis=-1),
+        -np.inf,
+        0,
+    )
+    rows.add(np.stack([x_imp, x_exp], axis=-1), 1.0, -np.inf, 1)
+    # P_net_after_kW bounds per scenario (P_net_after_kW_upper_bound, P_net_after_kW_lower_bound)
+    limits = data_input.P_net_after_kW_lim_to_arrays(P_net_after_kW_limits, opt_horizon)
+    with_upper = limits["with_upper_bound"]
+    with_lower = limits["with_lower_bound"]
+    bounded = with_upper | with_lower
+    rows.add(
+        np.stack([imp[:, bounded], exp[:, bounded]], axis=-1),
+        np.array([1.0, -1.0]),
+        np.where(with_lower, limits["lower_bound"], -np.inf)[bounded],
+        np.where(with_upper, limits["upper_bound"], np.inf)[bounded],
+    )
+    # Peak import and export per scenario (penalty_for_imp, penalty_for_exp)
+    rows.add(
+        np.stack(np.broadcast_arrays(imp, blocks["alpha_imp"][:, None]), axis=-1),
+        np.array([1.0, -1.0]),
+        -np.inf,
+        0,
+    )
+    rows.add(
+        np.stack(np.broadcast_arrays(exp, blocks["alpha_exp"][:, None]), axis=-1),
+        np.array([1.0, -1.0]),
+        -np.inf,
+        0,
+    )
+
+    A, row_lower, row_upper = rows.matrix(n_cols)
+
+    # Expected grid interaction (obj_rule weighted by the scenario probabilities)
+    cost = np.zeros(n_cols)
+    cost[imp] = cost[exp] = probabilities[:, None]
+    cost[blocks["alpha_imp"]] = cost[blocks["alpha_exp"]] = probabilities
+
+    ######################################################################################################
+    # Pyomo model from the assembled arrays
+    model = ConcreteModel()
+    model.N = list(battery_table.index)
+    model.T = tuple(opt_horizon)
+    model.T_SoC_bat = tuple(soc_horizon)
+    model.K = K
+    model.blocks = blocks
+    model.x = Var(range(n_cols), within=Reals)
+    x = [model.x[j] for j in range(n_cols)]
+    for name in ("x_ch", "x_dis", "x_imp", "x_exp"):
+        for j in blocks[name].ravel():
+            x[j].domain = Binary
+    for j in range(n_cols):
+        x[j].setlb(lower[j])
+        x[j].setub(None if np.isinf(upper[j]) else upper[j])
+
+    # The rows are passed to Pyomo as CSR matrix, without building an expression per row
+    model.rows = MatrixConstraint(
+        A.data.tolist(),
+        A.indices.tolist(),
+        A.indptr.tolist(),
+        [None if np.isinf(bound) else bound for bound in row_lower.tolist()],
+        [None if np.isinf(bound) else bound for bound in row_upper.tolist()],
+        x,
+    )
+    objective_cols = np.flatnonzero(cost)
+    model.obj = Objective(
+        expr=LinearExpression(
+            constant=0,
+            linear_coefs=cost[objective_cols].tolist(),
+            linear_vars=[x[j] for j in objective_cols],
+        ),
+        sense=minimize,
+    )
+    return model
+
+
+def _values(model, name: str) -> np.ndarray:
+    """
+    Read the solution values of a variable block of the stochastic model.
+
+    :param model: The solved pyomo model.
+    :param name: The name of the variable block.
+    :return: Array of the values in the shape of the block.
+    """
+    cols = model.blocks[name]
+    return np.array([model.x[j].value for j in cols.ravel()], dtype=float).reshape(
+        cols.shape
+    )
+
+
+def scheduling(
+    P_load_gen_scenarios: List[pd.DataFrame],
+    probabilities: List[float],
+    df_battery: Union[pd.DataFrame, BatteryTable],
+    day_end: datetime,
+    bulk_data: Bulk,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+    solver: str = None,
+    solver_options: dict = None,
+    capture_directory: str = None,
+    input_hash: str = None,
+) -> Tuple[
+    pd.DataFrame,
+    pd.DataFrame,
+    pd.Series,
+    pd.DataFrame,
+    pd.DataFrame,
+    pd.Series,
+    pd.Series,
+    Tuple[str, str],
+]:
+    """The two-stage stochastic scheduling optimization function. The battery setpoints are
+    optimized against all forecast scenarios at once, minimizing the expected grid interaction.
+
+    Parameters
+    ----------
+    P_load_gen_scenarios : List[pd.DataFrame]
+        load and generation forecast time series of each scenario, all on the same timestamps.
+    probabilities : List[float]
+        probability of each scenario.
+    df_battery : Union[pd.DataFrame, BatteryTable]
+        battery specifications of float and string types (see battery_to_df and battery_to_table).
+    day_end : datetime
+        user-defined end of the day (datetime) till which household batteries should reach
+        maximum SoC.
+    bulk_data : Bulk
+        bulk delivery/reception of energy from batteries (optional).
+    P_net_after_kW_limits : pd.DataFrame
+        consisiting of upper and lower bound float time series (kW) and
+        the integer identifiers for the existance of any upper or lower bounds.
+    pv_curtailment : bool
+        If true, PV generation can be curtailed.
+    solver : str, optional
+        name of a registered solver backend (see pymfm.control.utils.solvers).
+    solver_options : dict, optional
+        solver options overriding the defaults of the solver backend (e.g. a time limit, see
+        pymfm.control.utils.solvers.time_limit_options), by default None.
+    capture_directory : str, optional
+        If given, the built model is dumped into this directory for offline analysis
+        (see pymfm.control.utils.model_capture), by default None.
+    input_hash : str, optional
+        hash of the InputData identifying the capture, by default None.
+
+    Returns
+    -------
+    Tuple[ pd.DataFrame, pd.DataFrame, pd.Series, pd.DataFrame, pd.DataFrame, pd.Series, pd.Series, Tuple[Any, Any], ]
+        PV_profile_df: DataFrame containing the PV profile of each scenario.
+        P_bat_kW_df: DataFrame containing battery power for different nodes.
+        P_bat_total_kW: Series containing the total battery power.
+        SoC_bat_df: DataFrame containing battery state of charge for different nodes.
+        P_net_after_kW_df: DataFrame containing net power after control of each scenario.
+        P_net_after_kW_upperb: Series containing upper bounds for net power after control.
+        P_net_after_kW_lowerb: Series containing lower bounds for net power after control.
+        (str, str): status and details from the solver
+    """
+    model = build_model(
+        P_load_gen_scenarios,
+        probabilities,
+        df_battery,
+        day_end,
+        bulk_data,
+        P_net_after_kW_limits,
+        pv_curtailment,
+    )
+    if capture_directory is None:
+        solver = solvers.solve(model, solver, solver_options).solver
+    else:
+        solver = model_capture.capture_and_solve(
+            model, capture_directory, input_hash, solver, solver_options
+        ).solver
+
+    #####################################################################################################
+    ##################################       POST PROCESSING             ################################
+    battery_table = as_battery_table(df_battery)
+    ch_eff = battery_table.ch_efficiency.astype(float)[:, None]
+    dis_eff = battery_table.dis_efficiency.astype(float)[:, None]
+    P_bat_kW = (
+        _values(model, "P_ch_bat_kW") * ch_eff - _values(model, "P_dis_bat_kW") / dis_eff
+    )
+    P_bat_kW_df = pd.DataFrame(P_bat_kW.T, index=model.T, columns=model.N)
+    P_bat_total_kW = P_bat_kW_df.sum(axis=1)
+    SoC_bat_df = pd.DataFrame(
+        _values(model, "SoC_bat").T, index=model.T_SoC_bat, columns=model.N
+    )
+    P_net_after_kW_df = pd.DataFrame(
+        (_values(model, "P_imp_kW") - _values(model, "P_exp_kW")).T, index=model.T
+    )
+    PV_profile_df = pd.DataFrame(_values(model, "P_PV_kW").T, index=model.T)
+
+    limits = data_input.P_net_after_kW_lim_to_arrays(P_net_after_kW_limits, model.T)
+    upper_bound = pd.Series(
+        np.where(limits["with_upper_bound"], limits["upper_bound"], np.nan),
+        index=model.T,
+    )
+    lower_bound = pd.Series(
+        np.where(limits["with_lower_bound"], limits["lower_bound"], np.nan),
+        index=model.T,
+    )
+
+    return (
+        PV_profile_df,
+        P_bat_kW_df,
+        P_bat_total_kW,
+        SoC_bat_df,
+        P_net_after_kW_df,
+        upper_bound,
+        lower_bound,
+        (solver.status, solver.termination_condition),
+    )
+
+
+def prep_output_df(
+    PV_profile_df: pd.DataFrame,
+    P_bat_kW_df: pd.DataFrame,
+    P_bat_total_kW: pd.Series,
+    SoC_bat_df: pd.DataFrame,
+    P_net_after_kW_df: pd.DataFrame,
+    df_forecasts_scenarios: List[pd.DataFrame],
+    probabilities: List[float],
+    P_net_after_kW_upperb: pd.Series,
+    P_net_after_kW_lowerb: pd.Series,
+) -> pd.DataFrame:
+    """
+    Prepare the output DataFrame of the stochastic scheduling. It has the columns of the
+    deterministic optimization based output, holding expected values over the scenarios,
+    plus the net power after control of each scenario (P_net_after_kW_scenario_<k>).
+
+    Parameters
+    ----------
+    PV_profile_df : pd.DataFrame
+        containing the PV profile of each scenario.
+    P_bat_kW_df : DataFrame
+        containing battery power for different nodes.
+    P_bat_total_kW : pd.Series
+        containing the total battery power.
+    SoC_bat_df : DataFrame
+        containing battery state of charge for different nodes.
+    P_net_after_kW_df : pd.DataFrame
+        containing net power after control of each scenario.
+    df_forecasts_scenarios : List[pd.DataFrame]
+        containing forecasted data of each scenario.
+    probabilities : List[float]
+        probability of each scenario.
+    P_net_after_kW_upperb : pd.Series
+        containing upper bounds for net power after control.
+    P_net_after_kW_lowerb : pd.Series
+        containing lower bounds for net power after control.
+
+    Returns
+    ----------
+    output_df : DataFrame
+        containing prepared output data.
+    """
+    probabilities = np.asarray(probabilities, dtype=float)
+    index = df_forecasts_scenarios[0].index
+    load = np.column_stack([df.P_load_kW.to_numpy() for df in df_forecasts_scenarios])
+    generation = np.column_stack(
+        [df.P_gen_kW.to_numpy() for df in df_forecasts_scenarios]
+    )
+
+    output_df = pd.DataFrame(index=index)
+    output_df["P_net_before_kW"] = (load - generation) @ probabilities
+    output_df["P_net_before_controlled_PV_kW"] = (
+        load - PV_profile_df.to_numpy()
+    ) @ probabilities
+    output_df["P_PV_forecast_kW"] = generation @ probabilities
+    output_df["P_PV_controlled_kW"] = PV_profile_df.to_numpy() @ probabilities
+    output_df["P_net_after_kW"] = P_net_after_kW_df.to_numpy() @ probabilities
+    output_df["upperb"] = P_net_after_kW_upperb
+    output_df["lowerb"] = P_net_after_kW_lowerb
+
+    for col in P_bat_kW_df.columns:
+        output_df[f"P_{col}_kW"] = P_bat_kW_df[col]
+        output_df[f"SoC_{col}_%"] = SoC_bat_df[col] * 100
+
+    output_df["P_bat_total_kW"] = P_bat_total_kW
+    for k in P_net_after_kW_df.columns:
+        output_df[f"P_net_after_kW_scenario_{k}"] = P_net_after_kW_df[k]
+
+    return output_df
+
+
+def benchmark(
+    data: dict,
+    scenario_counts: List[int] = (1, 2, 5, 10, 20, 50),
+    solver: str = None,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Benchmark build and solve time of the stochastic scheduling over the number of scenarios.
+
+    The K scenarios are derived from the generation_and_load forecast of the input by
+    multiplying every value of scenario 1..K-1 with a uniform random factor (generation
+    0.9-1.1, load 0.95-1.05). PV curtailment is enabled, so that shared battery setpoints stay feasible.
+
+    Parameters
+    ----------
+    data : dict
+        The loaded JSON data of an optimization based InputData.
+    scenario_counts : List[int], optional
+        The numbers of scenarios K to benchmark, by default up to 50.
+    solver : str, optional
+        name of a registered solver backend, by default the selected backend.
+    seed : int, optional
+        seed of the random scenario factors, by default 0.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per K with the number of constraints, build and solve time in seconds,
+        objective and solver termination condition.
+    """
+    input_data = InputData(**data)
+    battery_specs = data_input.input_prep(input_data.battery_specs)
+    df_forecasts = data_input.generation_and_load_to_df(
+        input_data.generation_and_load, start=input_data.uc_start, end=input_data.uc_end
+    )
+    P_net_after_kW_limits = data_input.P_net_after_kW_lim_to_df(
+        input_data.P_net_after_kW_limitation, input_data.generation_and_load
+    )
+    battery_table = data_input.battery_to_table(battery_specs)
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    for K in scenario_counts:
+        scenarios = [df_forecasts.copy() for _ in range(K)]
+        for scenario in scenarios[1:]:
+            scenario["P_gen_kW"] *= rng.uniform(0.9, 1.1, len(scenario))
+            scenario["P_load_kW"] *= rng.uniform(0.95, 1.05, len(scenario))
+
+        start = time.perf_counter()
+        model = build_model(
+            scenarios,
+            [1 / K] * K,
+            battery_table,
+            input_data.day_end,
+            input_data.bulk,
+            P_net_after_kW_limits,
+            True,
+        )
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = solvers.solve(model, solver)
+        solve_time = time.perf_counter() - start
+
+        rows.append(
+            {
+                "scenarios": K,
+                "constraints": len(model.rows),
+                "build_time_s": build_time,
+                "solve_time_s": solve_time,
+                "objective": value(model.obj, exception=False),
+                "termination_condition": str(results.solver.termination_condition),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def main():
+    """
+    Command line entry point of the stochastic scheduling benchmark, e.g.
+    python -m pymfm.control.algorithms.stochastic_optimization_based inputs/scheduling_optimization_based.json
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the stochastic scheduling over the number of forecast scenarios."
+    )
+    parser.add_argument("input_file", help="Optimization based InputData JSON file.")
+    parser.add_argument(
+        "--scenarios", nargs="+", type=int, default=[1, 2, 5, 10, 20, 50]
+    )
+    parser.add_argument("--solver", default=None, help="Solver backend.")
+    args = parser.parse_args()
+
+    print(
+        benchmark(open_json(args.input_file), args.scenarios, args.solver).to_string(
+            index=False
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
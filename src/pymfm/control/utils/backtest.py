@@ -0,0 +1,312 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+import os
+import time
+from datetime import date
+from multiprocessing import Pool
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from pymfm.control.utils import data_input
+from pymfm.control.utils.data_input import InputData, ControlLogic as CL
+from pymfm.control.utils.mode_logic_handler import mode_logic_handler
+from pymfm.control.utils.time_series_store import TimeSeriesStore
+
+# Control logics compared by default
+CONTROL_LOGICS = (CL.RULE_BASED, CL.OPTIMIZATION_BASED)
+# Columns of the backtest results, one row per day and control logic
+RESULT_COLUMNS = [
+    "day",
+    "control_logic",
+    "status",
+    "runtime_s",
+    "grid_import_kWh",
+    "grid_export_kWh",
+    "peak_import_kW",
+    "peak_export_kW",
+    "bound_violation_steps",
+    "bound_violation_kWh",
+    "error",
+]
+# Power (in kW) by which the bounds may be exceeded without counting as violation
+BOUND_TOLERANCE_KW = 1e-6
+
+
+def day_input(template: InputData, day: date, store: TimeSeriesStore) -> InputData:
+    """
+    Move a scheduling InputData to another day, with the generation and load forecast of that day
+    from a forecast store. uc_start, uc_end, the bulk window and the P_net_after_kW limitations
+    of the template are shifted by whole days, as is a day_end given in the template. A day_end
+    the template derived from the sunset is derived again for the day.
+
+    :param template: The scheduling InputData of any day.
+    :param day: The day to schedule.
+    :param store: Generation and load forecast store (see pymfm.control.utils.time_series_store).
+    :return: The InputData of the day.
+    """
+    offset = pd.Timedelta(days=(day - template.uc_start.date()).days)
+    generation_and_load = store.to_generation_and_load(
+        template.uc_start + offset,
+        template.uc_end + offset,
+        template.generation_and_load.pv_curtailment
+        if template.generation_and_load is not None
+        else None,
+    )
+    update = {
+        "uc_start": template.uc_start + offset,
+        "uc_end": template.uc_end + offset,
+        "forecast_scenarios": None,
+        "generation_and_load": generation_and_load,
+    }
+    if "day_end" in template.__fields_set__:
+        update["day_end"] = template.day_end + offset
+    elif template.day_end is not None:
+        # The sunset moves over the year, the validator's derivation is repeated for the day
+        update["day_end"] = data_input.sunset_day_end(
+            generation_and_load, update["uc_start"], template.site_location
+        )
+    if template.bulk is not None:
+        update["bulk"] = template.bulk.copy(
+            update={
+                "bulk_start": template.bulk.bulk_start + offset,
+                "bulk_end": template.bulk.bulk_end + offset,
+            }
+        )
+    if template.P_net_after_kW_limitation is not None:
+        update["P_net_after_kW_limitation"] = [
+            limitation.copy(update={"timestamp": limitation.timestamp + offset})
+            for limitation in template.P_net_after_kW_limitation
+        ]
+    return template.copy(update=update)
+
+
+def schedule_kpis(output_df: pd.DataFrame, P_net_after_kW_limits: pd.DataFrame) -> dict:
+    """
+    Key performance indicators of a scheduling output: grid energy exchange, peaks and
+    violations of the P_net_after_kW limitations.
+
+    :param output_df: The scheduling output (as returned by mode_logic_handler).
+    :param P_net_after_kW_limits: The limitations (as returned by P_net_after_kW_lim_to_df).
+    :return: Dictionary of the grid import and export energy in kWh, peak import and export in kW,
+        number of time steps and energy in kWh exceeding the bounds.
+    """
+    P_net_after_kW = output_df.P_net_after_kW.to_numpy(dtype=float)
+    timestamps = pd.DatetimeIndex(output_df.index)
+    delta_T_h = (
+        pd.to_timedelta(timestamps.freq) / pd.Timedelta(hours=1)
+        if timestamps.freq is not None
+        else np.median(np.diff(timestamps.asi8)) / 3.6e12
+    )
+    limits = data_input.P_net_after_kW_lim_to_arrays(P_net_after_kW_limits, timestamps)
+    excess_kW = np.maximum(
+        np.where(
+            limits["with_upper_bound"], P_net_after_kW - limits["upper_bound"], 0.0
+        ),
+        np.where(
+            limits["with_lower_bound"], limits["lower_bound"] - P_net_after_kW, 0.0
+        ),
+    )
+    violating = excess_kW > BOUND_TOLERANCE_KW
+    return {
+        "grid_import_kWh": float(np.clip(P_net_after_kW, 0, None).sum() * delta_T_h),
+        "grid_export_kWh": float(np.clip(-P_net_after_kW, 0, None).sum() * delta_T_h),
+        "peak_import_kW": float(max(P_net_after_kW.max(), 0.0)),
+        "peak_export_kW": float(max(-P_net_after_kW.min(), 0.0)),
+        "bound_violation_steps": int(violating.sum()),
+        "bound_violation_kWh": float(excess_kW[violating].sum() * delta_T_h),
+    }
+
+
+# Settings and forecast store of a backtest worker process
+_worker = {}
+
+
+def _init_worker(template: InputData, store_directory: str, solver: str):
+    """
+    Pool initializer passing the template InputData and the settings to a worker process once.
+    """
+    _worker.update(
+        template=template, store_directory=store_directory, solver=solver, store=None
+    )
+
+
+def _run_day(job: Tuple[str, str]) -> Tuple[dict, bool]:
+    """
+    Pool worker scheduling one day with one control logic. The forecast store of the worker is
+    opened on its first day and read by all further ones.
+
+    :param job: Tuple of the day (ISO format) and the control logic.
+    :return: Tuple of the result row (see RESULT_COLUMNS) and whether the day is finished. A day
+        whose input could not be prepared (e.g. the forecast store is not readable) is not
+        finished, so it is not checkpointed and a rerun retries it.
+    """
+    day, control_logic = job
+    row = dict.fromkeys(RESULT_COLUMNS)
+    row.update(day=day, control_logic=control_logic)
+    start = time.perf_counter()
+    try:
+        if _worker["store"] is None:
+            _worker["store"] = TimeSeriesStore(_worker["store_directory"])
+        data = day_input(
+            _worker["template"].copy(update={"control_logic": CL(control_logic)}),
+            date.fromisoformat(day),
+            _worker["store"],
+        )
+    except Exception as error:
+        # The input of the day is missing, not the control failing on it
+        _worker["store"] = None
+        row["runtime_s"] = time.perf_counter() - start
+        row["status"] = "error"
+        row["error"] = f"{type(error).__name__}: {error}"
+        return row, False
+    try:
+        _, output_df, (status, termination_condition) = mode_logic_handler(
+            data, _worker["solver"]
+        )
+        row["runtime_s"] = time.perf_counter() - start
+        row["status"] = str(termination_condition)
+        row.update(
+            schedule_kpis(
+                output_df,
+                data_input.P_net_after_kW_lim_to_df(
+                    data.P_net_after_kW_limitation, data.generation_and_load
+                ),
+            )
+        )
+    except Exception as error:
+        row["runtime_s"] = time.perf_counter() - start
+        row["status"] = "error"
+        row["error"] = f"{type(error).__name__}: {error}"
+    return row, True
+
+
+def read_checkpoint(checkpoint_file: str) -> List[dict]:
+    """
+    Read the result rows of a backtest checkpoint file (one JSON row per line).
+    A truncated last line, left by an interrupted run, is ignored.
+
+    :param checkpoint_file: The checkpoint file.
+    :return: The result rows, empty if the file does not exist.
+    """
+    rows = []
+    if not os.path.exists(checkpoint_file):
+        return rows
+    with open(checkpoint_file) as checkpoint:
+        for line in checkpoint:
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass
+    return rows
+
+
+def backtest(
+    template: InputData,
+    store_directory: str,
+    start_day: date,
+    end_day: date,
+    control_logics: Tuple[CL, ...] = CONTROL_LOGICS,
+    checkpoint_file: str = None,
+    solver: str = None,
+    processes: int = None,
+) -> pd.DataFrame:
+    """
+    Backtest control logics by scheduling every day of a date range with each of them, in a
+    process pool. Every finished day is appended to the checkpoint file, so an interrupted
+    backtest continues where it stopped when it is run again with the same checkpoint file.
+    Days failing with a control logic are recorded with their error, not retried. Days whose
+    input could not be prepared (e.g. a missing forecast window) are returned with their error
+    but not checkpointed, so they are retried when the backtest is run again.
+
+    :param template: Scheduling InputData of any day, moved to every backtest day (see day_input).
+    :param store_directory: Directory of the generation and load forecast store
+        (see pymfm.control.utils.time_series_store).
+    :param start_day: First day of the backtest.
+    :param end_day: Last day of the backtest (inclusive).
+    :param control_logics: The control logics to compare, by default rule and optimization based.
+    :param checkpoint_file: JSON lines file of the finished days (optional).
+    :param solver: Solver backend of the optimization based control (optional, see pymfm.control.utils.solvers).
+    :param processes: The number of worker processes (optional, defaults to the number of CPUs).
+    :return: DataFrame with one row per day and control logic (see RESULT_COLUMNS).
+    """
+    days = [day.date().isoformat() for day in pd.date_range(start_day, end_day, freq="D")]
+    rows = read_checkpoint(checkpoint_file) if checkpoint_file is not None else []
+    finished = {(row["day"], row["control_logic"]) for row in rows}
+    jobs = [
+        (day, CL(control_logic).value)
+        for day in days
+        for control_logic in control_logics
+        if (day, CL(control_logic).value) not in finished
+    ]
+    print(
+        f"Backtest of {len(days)} days: {len(finished)} runs from the checkpoint, {len(jobs)} to run."
+    )
+
+    checkpoint = open(checkpoint_file, "a") if checkpoint_file is not None else None
+    try:
+        with Pool(
+            processes,
+            initializer=_init_worker,
+            initargs=(template, store_directory, solver),
+        ) as pool:
+            for row, finished_day in pool.imap_unordered(_run_day, jobs):
+                rows.append(row)
+                if checkpoint is not None and finished_day:
+                    checkpoint.write(json.dumps(row) + "\n")
+                    checkpoint.flush()
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    results = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    results = results[results.day.isin(days)]
+    return results.sort_values(["day", "control_logic"], ignore_index=True)
+
+
+def summarize_backtest(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate backtest results per control logic.
+
+    :param results: The backtest results (see backtest).
+    :return: DataFrame indexed by control logic with the number of days and failed days, the
+        total grid energy exchange, the highest peaks, the total bound violations and the mean
+        and maximum runtime per day. Failed days only count in "failed_days".
+    """
+    succeeded = results[results.status != "error"]
+    summary = succeeded.groupby("control_logic").agg(
+        grid_import_kWh=("grid_import_kWh", "sum"),
+        grid_export_kWh=("grid_export_kWh", "sum"),
+        peak_import_kW=("peak_import_kW", "max"),
+        peak_export_kW=("peak_export_kW", "max"),
+        bound_violation_steps=("bound_violation_steps", "sum"),
+        bound_violation_kWh=("bound_violation_kWh", "sum"),
+        mean_runtime_s=("runtime_s", "mean"),
+        max_runtime_s=("runtime_s", "max"),
+    )
+    counts = results.groupby("control_logic").agg(
+        days=("day", "count"),
+        failed_days=("status", lambda status: int((status == "error").sum())),
+    )
+    return counts.join(summary)
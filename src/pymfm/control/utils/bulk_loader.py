@@ -0,0 +1,289 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from typing import IO, Dict, Iterator, List, Tuple, Union
+import numpy as np
+import pandas as pd
+from pymfm.control.utils.data_input import (
+    GenerationAndLoad,
+    InputData,
+    generation_and_load_values_from_arrays,
+)
+
+# Shared memory segments attached by this process, by segment name
+_attached: Dict[str, SharedMemory] = {}
+
+
+@dataclass(frozen=True)
+class SeriesRef:
+    """
+    Reference to a one-dimensional array in a shared memory segment.
+    It is small to pickle, the array itself is attached with attach().
+    """
+
+    name: str  # The name of the shared memory segment.
+    length: int  # The number of array elements.
+    dtype: str  # The NumPy dtype of the array.
+
+
+@dataclass(frozen=True)
+class BulkInput:
+    """
+    InputData loaded by load_bulk with its generation_and_load time series in shared memory.
+    """
+
+    name: str  # The name of the input (file name or JSONL line).
+    data: dict  # The InputData JSON without the generation_and_load values.
+    timestamps: SeriesRef  # The generation_and_load timestamps in ns since epoch (UTC).
+    P_gen_kW: SeriesRef  # The generated power in kW.
+    P_load_kW: SeriesRef  # The load power in kW.
+
+
+class SharedSeriesStore:
+    """
+    Owner of deduplicated time series in shared memory.
+    Identical arrays (e.g. the regional PV forecast of many communities) are stored once.
+    The segments are released when the store is closed, use it as context manager.
+    """
+
+    def __init__(self):
+        self._segments: Dict[str, SharedMemory] = {}
+        self._refs: Dict[str, SeriesRef] = {}
+
+    def add(self, array: np.ndarray) -> SeriesRef:
+        """
+        Place an array in shared memory, unless an identical one is already stored.
+
+        :param array: The one-dimensional array.
+        :return: The reference to the shared array.
+        """
+        array = np.ascontiguousarray(array)
+        digest = hashlib.sha256(
+            array.dtype.str.encode() + array.tobytes()
+        ).hexdigest()
+        if digest not in self._refs:
+            segment = SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[:] = array
+            self._segments[segment.name] = segment
+            self._refs[digest] = SeriesRef(segment.name, len(array), array.dtype.str)
+        return self._refs[digest]
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes of the stored arrays."""
+        return sum(
+            ref.length * np.dtype(ref.dtype).itemsize for ref in self._refs.values()
+        )
+
+    def close(self):
+        """
+        Close and unlink all shared memory segments of the store.
+
+        :return: None
+        """
+        for name, segment in self._segments.items():
+            _attached.pop(name, None)
+            segment.close()
+            segment.unlink()
+        self._segments.clear()
+        self._refs.clear()
+
+    def __enter__(self) -> "SharedSeriesStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach(ref: SeriesRef) -> np.ndarray:
+    """
+    Attach to a shared array without copying it.
+    The segment stays attached for the lifetime of the process.
+
+    :param ref: The reference to the shared array.
+    :return: Read-only view of the shared array.
+    """
+    if ref.name not in _attached:
+        _attached[ref.name] = SharedMemory(name=ref.name)
+    array = np.ndarray(
+        (ref.length,), dtype=np.dtype(ref.dtype), buffer=_attached[ref.name].buf
+    )
+    array.flags.writeable = False
+    return array
+
+
+def iter_inputs(source: Union[str, IO[str]]) -> Iterator[Tuple[str, dict]]:
+    """
+    Iterate over the InputData JSON of a directory of JSON files, a JSONL file or a JSONL stream.
+
+    :param source: Directory, JSONL file path or open text stream with one InputData JSON per line.
+    :return: Iterator of (name, loaded JSON data) tuples.
+    """
+    if isinstance(source, str) and os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            if filename.endswith(".json"):
+                with open(os.path.join(source, filename)) as data_file:
+                    yield filename, json.load(data_file)
+        return
+    if isinstance(source, str):
+        with open(source) as stream:
+            yield from _iter_lines(stream, os.path.basename(source))
+        return
+    yield from _iter_lines(source, "stream")
+
+
+def _iter_lines(stream: IO[str], prefix: str) -> Iterator[Tuple[str, dict]]:
+    """
+    Iterate over the non-empty lines of a JSONL stream.
+
+    :param stream: Open text stream.
+    :param prefix: Prefix of the input names.
+    :return: Iterator of (name, loaded JSON data) tuples.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if line.strip():
+            yield f"{prefix}:{line_number}", json.loads(line)
+
+
+def load_bulk(
+    source: Union[str, IO[str]], store: SharedSeriesStore
+) -> List[BulkInput]:
+    """Load many InputData and move their generation_and_load time series into shared memory.
+
+    Parameters
+    ----------
+    source : Union[str, IO[str]]
+        Directory of InputData JSON files, JSONL file or JSONL text stream.
+    store : SharedSeriesStore
+        Store receiving the (deduplicated) time series.
+
+    Returns
+    -------
+    List[BulkInput]
+        One entry per input with generation_and_load. Inputs without generation_and_load
+        (e.g. near real-time requests) are skipped.
+    """
+    bulk_inputs = []
+    for name, data in iter_inputs(source):
+        generation_and_load = data.get("generation_and_load")
+        if generation_and_load is None:
+            continue
+        values = generation_and_load["values"]
+        timestamps = pd.to_datetime([row["timestamp"] for row in values], utc=True)
+        bulk_inputs.append(
+            BulkInput(
+                name=name,
+                data={
+                    **data,
+                    "generation_and_load": {
+                        key: value
+                        for key, value in generation_and_load.items()
+                        if key != "values"
+                    },
+                },
+                timestamps=store.add(timestamps.asi8),
+                P_gen_kW=store.add(
+                    np.asarray([row["P_gen_kW"] for row in values], dtype=float)
+                ),
+                P_load_kW=store.add(
+                    np.asarray([row["P_load_kW"] for row in values], dtype=float)
+                ),
+            )
+        )
+    return bulk_inputs
+
+
+def to_input_data(bulk_input: BulkInput) -> InputData:
+    """
+    Build the InputData of a bulk input from the shared time series.
+    The generation_and_load values are not validated row by row (see InputData.from_trusted_json).
+
+    :param bulk_input: The bulk input.
+    :return: The InputData object (with UTC timestamps).
+    """
+    values = generation_and_load_values_from_arrays(
+        pd.to_datetime(attach(bulk_input.timestamps), utc=True),
+        attach(bulk_input.P_gen_kW),
+        attach(bulk_input.P_load_kW),
+    )
+    generation_and_load = GenerationAndLoad(
+        **{**bulk_input.data["generation_and_load"], "values": []}
+    ).copy(update={"values": values})
+    return InputData.from_trusted_json(
+        {**bulk_input.data, "generation_and_load": generation_and_load}
+    )
+
+
+def _schedule(arguments: Tuple[BulkInput, str]) -> tuple:
+    """
+    Pool worker running the control logic of one bulk input.
+
+    :param arguments: Tuple of the bulk input and the solver backend name.
+    :return: Tuple of input name, mode_logic, output DataFrame and solver status.
+    """
+    # Imported here, the mode logic handler is only needed in the workers
+    from pymfm.control.utils.mode_logic_handler import mode_logic_handler
+
+    bulk_input, solver = arguments
+    mode_logic, output_df, status = mode_logic_handler(
+        to_input_data(bulk_input), solver=solver
+    )
+    return bulk_input.name, mode_logic, output_df, status
+
+
+def run_bulk(
+    source: Union[str, IO[str]], processes: int = None, solver: str = None
+) -> List[tuple]:
+    """Run the control logic of many inputs in a process pool with shared forecast time series.
+
+    Parameters
+    ----------
+    source : Union[str, IO[str]]
+        Directory of InputData JSON files, JSONL file or JSONL text stream.
+    processes : int, optional
+        Number of worker processes, by default the number of CPUs.
+    solver : str, optional
+        Solver backend of the optimization based control, by default see pymfm.control.utils.solvers.
+
+    Returns
+    -------
+    List[tuple]
+        (input name, mode_logic, output DataFrame, solver status) per input with generation_and_load.
+    """
+    with SharedSeriesStore() as store:
+        bulk_inputs = load_bulk(source, store)
+        print(
+            f"{len(bulk_inputs)} inputs loaded, {len(store)} distinct time series "
+            f"({store.nbytes / 1e6:.2f} MB) in shared memory."
+        )
+        with Pool(processes) as pool:
+            return pool.map(_schedule, [(bulk_input, solver) for bulk_input in bulk_inputs])
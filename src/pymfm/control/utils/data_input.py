@@ -23,12 +23,25 @@
 
 from typing import Dict, Optional, List, Union
 import json
+import logging
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+import numpy as np
 import pandas as pd
-from pydantic import BaseModel as PydBaseModel, Field, ValidationError, validator
-from datetime import datetime, timezone, timedelta
+from pydantic import BaseModel as PydBaseModel, Field, PrivateAttr, ValidationError, validator
+from datetime import date, datetime, timezone, timedelta
 from enum import Enum
-from astral.sun import sun
-from astral.location import LocationInfo
+from astral import Observer
+from astral.sun import sunset
+from pymfm.control.utils import regularization
+
+logger = logging.getLogger(__name__)
+
+# Default site location (Berlin) used to derive day_end from the sunset time
+DEFAULT_LATITUDE = 52.52
+DEFAULT_LONGITUDE = 13.40
+# Number of (date, latitude, longitude) sunset times kept in memory
+SUNSET_CACHE_SIZE = 1024
 
 
 def open_json(filename):
@@ -82,6 +95,16 @@ class OperationMode(StrEnum):
     SCHEDULING = "scheduling"  # Scheduling operation mode.
 
 
+class GapFillMethod(StrEnum):
+    """
+    An enumeration class representing the methods to fill missing time steps of generation and load data.
+    """
+
+    FFILL = "ffill"  # Repeat the last value.
+    INTERPOLATE = "interpolate"  # Interpolate linearly in time.
+    ZERO = "zero"  # Fill zeros.
+
+
 class Bulk(BaseModel):
     """
     Pydantic model representing bulk energy data.
@@ -155,6 +178,81 @@ class GenerationAndLoad(BaseModel):
     values: List[GenerationAndLoadValues] = Field(
         ..., alias="values", description="A list of generation and load data values."
     )
+    gap_fill_method: GapFillMethod = Field(
+        GapFillMethod.INTERPOLATE,
+        alias="gap_fill_method",
+        description="The method to fill missing time steps of the values (default: interpolate).",
+    )
+    # The values list and its length the cached timestamps were built from, the timestamps and
+    # their regular index (see timestamps and regular_index)
+    _timestamps: Optional[list] = PrivateAttr(None)
+
+    def _cache(self) -> list:
+        cached = self._timestamps
+        if cached is None or cached[0] is not self.values or cached[1] != len(self.values):
+            index = pd.DatetimeIndex(
+                [value.timestamp for value in self.values], name="timestamp"
+            )
+            cached = self._timestamps = [self.values, len(self.values), index, None]
+        return cached
+
+    def timestamps(self) -> pd.DatetimeIndex:
+        """
+        The timestamps of the values in their input order. They are built once per values list,
+        so validators and conversions of the same GenerationAndLoad share them.
+
+        :return: DatetimeIndex of the value timestamps.
+        """
+        return self._cache()[2]
+
+    def regular_index(self) -> pd.DatetimeIndex:
+        """
+        The regular time index the values are mapped onto by generation_and_load_to_df
+        (see pymfm.control.utils.regularization.regular_index), built once per values list.
+
+        :return: The regular DatetimeIndex.
+        """
+        cached = self._cache()
+        if cached[3] is None:
+            cached[3] = regularization.regular_index(cached[2])
+        return cached[3]
+
+
+class ForecastScenario(BaseModel):
+    """
+    Pydantic model representing one generation and load forecast scenario of the stochastic scheduling.
+    """
+
+    probability: float = Field(
+        ...,
+        alias="probability",
+        description="The probability of the scenario (0<probability<=1).",
+    )
+    values: List[GenerationAndLoadValues] = Field(
+        ..., alias="values", description="A list of generation and load data values."
+    )
+    gap_fill_method: GapFillMethod = Field(
+        GapFillMethod.INTERPOLATE,
+        alias="gap_fill_method",
+        description="The method to fill missing time steps of the values (default: interpolate).",
+    )
+
+
+class ForecastPatch(BaseModel):
+    """
+    Pydantic model representing an intraday update of a running scheduling session.
+    """
+
+    values: List[GenerationAndLoadValues] = Field(
+        [],
+        alias="values",
+        description="The changed generation and load data values.",
+    )
+    initial_SoC: Optional[Dict[str, float]] = Field(
+        None,
+        alias="initial_SoC",
+        description="The new initial state of charge in percentage per battery id (optional).",
+    )
 
 
 class MeasurementsRequest(BaseModel):
@@ -180,6 +278,27 @@ class MeasurementsRequest(BaseModel):
     )
 
 
+class SiteLocation(BaseModel):
+    """
+    Pydantic model representing the geographic location of the microgrid site.
+    """
+
+    latitude: float = Field(
+        DEFAULT_LATITUDE,
+        alias="latitude",
+        ge=-90,
+        le=90,
+        description="The latitude of the site in degrees.",
+    )
+    longitude: float = Field(
+        DEFAULT_LONGITUDE,
+        alias="longitude",
+        ge=-180,
+        le=180,
+        description="The longitude of the site in degrees.",
+    )
+
+
 class BatterySpecs(BaseModel):
     """
     Pydantic model representing battery specifications consisting of:
@@ -244,6 +363,113 @@ class BatterySpecs(BaseModel):
     )
 
 
+def _trusted_timestamps(rows: List[dict], name: str) -> pd.DatetimeIndex:
+    """
+    Parse the timestamps of a list of rows at once.
+
+    :param rows: List of dictionaries with a "timestamp" field.
+    :param name: Name of the rows used in error messages.
+    :return: The parsed timestamps.
+    """
+    try:
+        timestamps = [row["timestamp"] for row in rows]
+    except KeyError as error:
+        raise ValueError(f"{name} values are missing the field {error}") from error
+    index = pd.to_datetime(timestamps)
+    if not isinstance(index, pd.DatetimeIndex):
+        # Timestamps with different UTC offsets
+        index = pd.to_datetime(timestamps, utc=True)
+    return index
+
+
+def generation_and_load_values_from_arrays(
+    timestamps: pd.DatetimeIndex,
+    P_gen_kW: np.ndarray,
+    P_load_kW: np.ndarray,
+    name: str = "generation_and_load",
+) -> List[GenerationAndLoadValues]:
+    """
+    Build generation and load values from arrays without validating every row.
+    Only the structural checks run, as array operations over all rows:
+    the rows must not be empty, the timestamps must be strictly increasing
+    and the powers must be finite numbers.
+
+    :param timestamps: Timestamps of the values.
+    :param P_gen_kW: Generated power in kW of the values.
+    :param P_load_kW: Load power in kW of the values.
+    :param name: Name of the values used in error messages.
+    :return: List of (unvalidated) GenerationAndLoadValues objects.
+    """
+    P_gen_kW = np.asarray(P_gen_kW, dtype=float)
+    P_load_kW = np.asarray(P_load_kW, dtype=float)
+    if len(timestamps) == 0:
+        raise ValueError(f"{name} has no values")
+    if not len(timestamps) == len(P_gen_kW) == len(P_load_kW):
+        raise ValueError(
+            f"{name} timestamps, P_gen_kW and P_load_kW have to be of the same length"
+        )
+    if not (timestamps.is_monotonic_increasing and timestamps.is_unique):
+        raise ValueError(f"{name} timestamps have to be strictly increasing")
+    if not (np.isfinite(P_gen_kW).all() and np.isfinite(P_load_kW).all()):
+        raise ValueError(f"{name} P_gen_kW and P_load_kW have to be finite")
+    return [
+        GenerationAndLoadValues.construct(
+            timestamp=timestamp, P_gen_kW=P_gen, P_load_kW=P_load
+        )
+        for timestamp, P_gen, P_load in zip(
+            timestamps.to_pydatetime(), P_gen_kW.tolist(), P_load_kW.tolist()
+        )
+    ]
+
+
+def _trusted_values(values: List[dict], name: str) -> List[GenerationAndLoadValues]:
+    """
+    Build generation and load values from value dictionaries without validating every row
+    (see generation_and_load_values_from_arrays).
+
+    :param values: List of generation and load value dictionaries.
+    :param name: Name of the values used in error messages.
+    :return: List of (unvalidated) GenerationAndLoadValues objects.
+    """
+    if len(values) == 0:
+        raise ValueError(f"{name} has no values")
+    index = _trusted_timestamps(values, name)
+    try:
+        P_gen_kW = np.asarray([row["P_gen_kW"] for row in values], dtype=float)
+        P_load_kW = np.asarray([row["P_load_kW"] for row in values], dtype=float)
+    except KeyError as error:
+        raise ValueError(f"{name} values are missing the field {error}") from error
+    return generation_and_load_values_from_arrays(index, P_gen_kW, P_load_kW, name)
+
+
+def _trusted_limitations(
+    limitations: List[dict],
+) -> List[P_net_after_kWLimitation]:
+    """
+    Build P_net_after_kW limitations without validating every row.
+    Only the timestamps are parsed (at once) and the given bounds are checked to be finite numbers.
+
+    :param limitations: List of P_net_after_kW limitation dictionaries.
+    :return: List of (unvalidated) P_net_after_kWLimitation objects.
+    """
+    index = _trusted_timestamps(limitations, "P_net_after_kW_limitation")
+    bounds = {}
+    for bound in ("upper_bound", "lower_bound"):
+        given = [row.get(bound) for row in limitations]
+        array = np.asarray([np.nan if b is None else b for b in given], dtype=float)
+        if not np.isfinite(array[[b is not None for b in given]]).all():
+            raise ValueError(f"P_net_after_kW_limitation {bound} has to be finite")
+        bounds[bound] = [None if b is None else float(b) for b in given]
+    return [
+        P_net_after_kWLimitation.construct(
+            timestamp=timestamp, upper_bound=upper_bound, lower_bound=lower_bound
+        )
+        for timestamp, upper_bound, lower_bound in zip(
+            index.to_pydatetime(), bounds["upper_bound"], bounds["lower_bound"]
+        )
+    ]
+
+
 class InputData(BaseModel):
     """
     Pydantic model representing input data for each use case including control logic,
@@ -274,6 +500,16 @@ class InputData(BaseModel):
         alias="generation_and_load",
         description="Generation and load data (optional).",
     )
+    forecast_scenarios: Optional[List[ForecastScenario]] = Field(
+        None,
+        alias="forecast_scenarios",
+        description="Generation and load forecast scenarios for stochastic scheduling (optional).",
+    )
+    site_location: Optional[SiteLocation] = Field(
+        None,
+        alias="site_location",
+        description="The site location used to derive day_end from the sunset time (optional, default Berlin).",
+    )
     day_end: Optional[datetime] = Field(
         None,
         alias="day_end",
@@ -304,10 +540,11 @@ class InputData(BaseModel):
         :return: The validated value.
         """
         uc_start = values["uc_start"]
-        # Check if generation_and_load starts before or at uc_start
-        if uc_start < meas.values[0].timestamp:
+        # Check if generation_and_load starts before or at uc_start (the values may be unordered)
+        start = meas.timestamps().min()
+        if uc_start < start:
             raise ValueError(
-                f"generation_and_load have to start at or before uc_start. generation_and_load start at {meas.values[0].timestamp} uc_start was {uc_start}"
+                f"generation_and_load have to start at or before uc_start. generation_and_load start at {start} uc_start was {uc_start}"
             )
         return meas
 
@@ -322,47 +559,195 @@ class InputData(BaseModel):
         :return: The validated value
         """
         uc_end = values["uc_end"]
-        # Check if generation_and_load ends after or at uc_end
-        if uc_end > meas.values[-1].timestamp:
+        # Check if generation_and_load ends after or at uc_end (the values may be unordered)
+        end = meas.timestamps().max()
+        if uc_end > end:
             raise ValueError(
-                f"generation_and_load have to end at or after uc_end. generation_and_load end at {meas.values[-1].timestamp} uc_end was {uc_end}"
+                f"generation_and_load have to end at or after uc_end. generation_and_load end at {end} uc_end was {uc_end}"
             )
         return meas
 
+    @validator("forecast_scenarios")
+    def forecast_scenarios_with_generation_and_load(cls, scenarios, values):
+        """
+        Validator to ensure generation_and_load is given together with forecast scenarios. It provides
+        the PV curtailment setting and the time steps of day_end and the P_net_after_kW limitations.
+
+        :param scenarios: The value of forecast_scenarios.
+        :param values: The values dictionary.
+        :return: The validated value.
+        """
+        # A generation_and_load failing its own validation is not in values
+        if scenarios is not None and "generation_and_load" in values:
+            if values["generation_and_load"] is None:
+                raise ValueError(
+                    "forecast_scenarios require generation_and_load (e.g. the expected forecast), "
+                    "which provides pv_curtailment and the time steps of day_end and P_net_after_kW_limitation"
+                )
+        return scenarios
+
+    @validator("forecast_scenarios")
+    def forecast_scenarios_cover_timewindow(cls, scenarios, values):
+        """
+        Validator to ensure the forecast scenarios cover uc_start to uc_end and their probabilities sum up to 1.
+
+        :param scenarios: The value of forecast_scenarios.
+        :param values: The values dictionary.
+        :return: The validated value.
+        """
+        if scenarios is None:
+            return scenarios
+        for k, scenario in enumerate(scenarios):
+            if not 0 < scenario.probability <= 1:
+                raise ValueError(
+                    f"forecast scenario {k} has probability {scenario.probability}, which is not in (0, 1]"
+                )
+            # The values may be unordered
+            start = min(value.timestamp for value in scenario.values)
+            end = max(value.timestamp for value in scenario.values)
+            if values["uc_start"] < start or values["uc_end"] > end:
+                raise ValueError(
+                    f"forecast scenario {k} has to cover uc_start to uc_end. It starts at "
+                    f"{start} and ends at {end}"
+                )
+        total_probability = sum(scenario.probability for scenario in scenarios)
+        if abs(total_probability - 1) > 1e-6:
+            raise ValueError(
+                f"the probabilities of the forecast scenarios have to sum up to 1, they sum up to {total_probability}"
+            )
+        return scenarios
+
     @validator("day_end", always=True)
     def set_day_end(cls, v, values):
         """
-        Validator to set day_end if not provided, based on sunset time in Berlin.
+        Validator to set day_end if not provided, based on the sunset time at the site location (default Berlin).
+        day_end lies on the regular time index of generation_and_load (see GenerationAndLoad.regular_index),
+        so a given day_end is moved to its nearest time step.
 
         :param v: The value of day_end.
         :param values: The values dictionary.
         :return: The validated value.
         """
         generation_and_load = values.get("generation_and_load")
+        if not isinstance(generation_and_load, GenerationAndLoad):
+            return v
 
         # Check if day_end is not provided
         if v is None:
-            # Calculate the sunset time for uc_start date and location (Berlin)
-            berlin_location = LocationInfo(
-                "Berlin", "Germany", "Europe/Berlin", 52.52, 13.40
+            return sunset_day_end(
+                generation_and_load, values["uc_start"], values.get("site_location")
             )
-            s = sun(berlin_location.observer, date=values["uc_start"].date())
-
-            # Set day_end to the sunset time
-            sunset_time = s["sunset"].astimezone(timezone.utc)
-
-            if generation_and_load and isinstance(
-                generation_and_load, GenerationAndLoad
-            ):
-                timestamps = [
-                    data_point.timestamp for data_point in generation_and_load.values
-                ]
-                # Find the nearest timestamp in generation_and_load data to sunset_time
-                nearest_timestamp = min(timestamps, key=lambda t: abs(t - sunset_time))
-                return nearest_timestamp
-            return v
-        else:
-            return v
+        return regularization.snap(
+            pd.DatetimeIndex([v]), generation_and_load.regular_index()
+        )[0].to_pydatetime()
+
+    @classmethod
+    def from_trusted_json(cls, data: Union[str, bytes, dict]) -> "InputData":
+        """
+        Create InputData from a trusted (already schema-checked) source, e.g. the own forecast pipeline.
+        The rows of generation_and_load, forecast_scenarios and P_net_after_kW_limitation are not validated
+        one by one, only their structure is checked as array operations (see _trusted_values and
+        _trusted_limitations). All other fields and the InputData validators (e.g. uc_start to uc_end coverage)
+        are validated as usual.
+
+        :param data: InputData as JSON string or as dictionary loaded from JSON
+            (generation_and_load may also be given as GenerationAndLoad object).
+        :return: The InputData object.
+        """
+        if isinstance(data, (str, bytes)):
+            data = json.loads(data)
+        data = dict(data)
+        generation_and_load = data.pop("generation_and_load", None)
+        if isinstance(generation_and_load, GenerationAndLoad):
+            # Already built, e.g. from arrays with generation_and_load_values_from_arrays
+            data["generation_and_load"] = generation_and_load
+        elif generation_and_load is not None:
+            # Validate everything but the values, then set the values unvalidated
+            data["generation_and_load"] = GenerationAndLoad(
+                **{**generation_and_load, "values": []}
+            ).copy(
+                update={
+                    "values": _trusted_values(
+                        generation_and_load["values"], "generation_and_load"
+                    )
+                }
+            )
+        limitations = data.pop("P_net_after_kW_limitation", None)
+        forecast_scenarios = data.pop("forecast_scenarios", None)
+        if forecast_scenarios is not None:
+            data["forecast_scenarios"] = [
+                ForecastScenario(**{**scenario, "values": []}).copy(
+                    update={
+                        "values": _trusted_values(
+                            scenario["values"], f"forecast scenario {k}"
+                        )
+                    }
+                )
+                for k, scenario in enumerate(forecast_scenarios)
+            ]
+        input_data = cls(**data)
+        if limitations is None:
+            return input_data
+        # No validator depends on the limitations, set them without copying every row
+        return input_data.copy(
+            update={"P_net_after_kW_limitation": _trusted_limitations(limitations)}
+        )
+
+
+@lru_cache(maxsize=SUNSET_CACHE_SIZE)
+def sunset_utc(day: date, latitude: float, longitude: float) -> datetime:
+    """Calculate the (memoized) sunset time of a day at a site location.
+
+    :param day: The date of the day.
+    :param latitude: The latitude of the site in degrees.
+    :param longitude: The longitude of the site in degrees.
+    :return: The sunset time in UTC.
+    """
+    observer = Observer(latitude=latitude, longitude=longitude)
+    return sunset(observer, date=day, tzinfo=timezone.utc)
+
+
+def sunset_day_end(
+    generation_and_load: GenerationAndLoad,
+    uc_start: datetime,
+    site_location: Optional[SiteLocation] = None,
+) -> datetime:
+    """Derive day_end from the sunset time of the uc_start date at the site location.
+
+    :param generation_and_load: The generation and load data.
+    :param uc_start: The start of the control operation.
+    :param site_location: The site location (optional, default Berlin).
+    :return: The time step of the generation and load data nearest to the sunset time.
+    """
+    site_location = site_location or SiteLocation()
+    # Calculate the sunset time for uc_start date and site location
+    sunset_time = sunset_utc(
+        uc_start.date(), site_location.latitude, site_location.longitude
+    )
+    # Find the nearest time step of the generation_and_load data to sunset_time
+    return nearest_timestamp(generation_and_load.regular_index(), sunset_time)
+
+
+def nearest_timestamp(timestamps: pd.DatetimeIndex, target: datetime) -> datetime:
+    """Find the timestamp nearest to target.
+
+    On a tie the earlier timestamp is returned. Unsorted timestamps are sorted first.
+
+    :param timestamps: The timestamps (a DatetimeIndex or a list of datetimes).
+    :param target: The timestamp to search for.
+    :return: The nearest timestamp.
+    """
+    timestamps = pd.DatetimeIndex(timestamps)
+    if not timestamps.is_monotonic_increasing:
+        timestamps = timestamps.sort_values()
+    i = int(timestamps.searchsorted(target, side="left"))
+    if i == 0:
+        return timestamps[0].to_pydatetime()
+    if i == len(timestamps):
+        return timestamps[-1].to_pydatetime()
+    before, after = timestamps[i - 1], timestamps[i]
+    nearest = before if target - before <= after - target else after
+    return nearest.to_pydatetime()
 
 
 def minutes_horizon(starttime: datetime, endtime: datetime) -> float:
@@ -387,33 +772,85 @@ def minutes_horizon(starttime: datetime, endtime: datetime) -> float:
     return minutes
 
 
-def input_prep(battery_specs: Union[BatterySpecs, List[BatterySpecs]]):
+@dataclass(frozen=True)
+class PreparedBattery:
+    """
+    Immutable, normalized battery specification as produced by input_prep.
+    Unlike BatterySpecs, the SoC values are given in p.u. (between 0 and 1) and the battery
+    capacity is also available in kWs. The BatterySpecs the table was prepared from stay untouched.
+    """
+
+    __slots__ = (
+        "id",
+        "bat_type",
+        "initial_SoC",
+        "final_SoC",
+        "P_dis_max_kW",
+        "P_ch_max_kW",
+        "min_SoC",
+        "max_SoC",
+        "bat_capacity_kWh",
+        "ch_efficiency",
+        "dis_efficiency",
+        "bat_capacity_kWs",
+    )
+
+    id: Optional[str]  # The unique identifier for the battery (optional).
+    bat_type: str  # The type of the battery ('cbes' or 'hbes').
+    initial_SoC: float  # The initial SoC of the battery in p.u. at uc_start.
+    final_SoC: Optional[float]  # The final SoC of the battery in p.u. at uc_end (optional).
+    P_dis_max_kW: float  # The maximum dischargable power of the battery in kW.
+    P_ch_max_kW: float  # The maximum chargable power of the battery in kW.
+    min_SoC: float  # The minimum SoC of the battery in p.u.
+    max_SoC: float  # The maximum SoC of the battery in p.u.
+    bat_capacity_kWh: float  # The full capacity of the battery (100% SoC) in kWh.
+    ch_efficiency: float  # The charging efficiency of the battery.
+    dis_efficiency: float  # The discharging efficiency of the battery.
+    bat_capacity_kWs: float  # The full capacity of the battery (100% SoC) in kWs.
+
+    def __reduce__(self):
+        # Frozen slots cannot be restored attribute by attribute, pickle by the constructor
+        return (PreparedBattery, tuple(getattr(self, name) for name in self.__slots__))
+
+
+def _prepare_battery(battery: BatterySpecs) -> PreparedBattery:
+    """
+    Normalize one battery specification.
+
+    :param battery: Battery specification.
+    :return: Normalized battery specification.
+    """
+    return PreparedBattery(
+        id=battery.id,
+        bat_type=battery.bat_type,
+        # Transform battery percent to absolute
+        initial_SoC=battery.initial_SoC / 100,
+        final_SoC=battery.final_SoC / 100 if battery.final_SoC is not None else None,
+        P_dis_max_kW=battery.P_dis_max_kW,
+        P_ch_max_kW=battery.P_ch_max_kW,
+        min_SoC=battery.min_SoC / 100,
+        max_SoC=battery.max_SoC / 100,
+        bat_capacity_kWh=battery.bat_capacity_kWh,
+        ch_efficiency=battery.ch_efficiency,
+        dis_efficiency=battery.dis_efficiency,
+        bat_capacity_kWs=battery.bat_capacity_kWh * 3600,
+    )
+
+
+def input_prep(
+    battery_specs: Union[BatterySpecs, List[BatterySpecs]]
+) -> Union[PreparedBattery, List[PreparedBattery]]:
     """
     Prepare battery specifications by transforming battery percentages to absolute values
     and saving battery capacity also in kWs.
+    The battery specifications are not modified, so the same InputData can be prepared repeatedly.
 
     :param battery_specs: Battery specifications.
-    :return: Updated battery specifications.
+    :return: Normalized battery specifications.
     """
-    # Transform battery percentage values to absolute values and calculate capacity in kWs
     if isinstance(battery_specs, list):
-        for battery in battery_specs:
-            # Transform battery percent to absolute
-            battery.min_SoC /= 100
-            battery.max_SoC /= 100
-            battery.initial_SoC /= 100
-            if battery.final_SoC is not None:
-                battery.final_SoC /= 100
-            battery.bat_capacity_kWs = battery.bat_capacity_kWh * 3600
-    else:
-        # Transform battery percent to absolute
-        battery_specs.min_SoC /= 100
-        battery_specs.max_SoC /= 100
-        battery_specs.initial_SoC /= 100
-        battery_specs.final_SoC /= 100
-        battery_specs.bat_capacity_kWs = battery_specs.bat_capacity_kWh * 3600
-
-    return battery_specs
+        return [_prepare_battery(battery) for battery in battery_specs]
+    return _prepare_battery(battery_specs)
 
 
 def generation_and_load_to_df(
@@ -433,32 +870,65 @@ def generation_and_load_to_df(
     Returns
     -------
     pd.DataFrame
-        containing filtered generation and load data.
-    """    
+        containing filtered generation and load data on a regular time index. The quality report of
+        the regularization (see pymfm.control.utils.regularization) is kept in its attrs["quality_report"].
+    """
     # Convert GenerationAndLoad objects to a DataFrame, set index to timestamp, and filter by time range
     df_forecasts = pd.json_normalize([mes.dict(by_alias=False) for mes in meas.values])
     df_forecasts.set_index("timestamp", inplace=True)
-    df_forecasts.index.freq = pd.infer_freq(df_forecasts.index)
+    # Regularize the time index (duplicates, jitter and missing time steps), which also sets its freq
+    df_forecasts, report = regularization.regularize(
+        df_forecasts, meas.gap_fill_method.value
+    )
+    if not report.is_regular:
+        logger.debug("Generation and load data regularized: %s", report)
     df_forecasts = df_forecasts.loc[start:end]
+    df_forecasts.attrs["quality_report"] = report
     return df_forecasts
 
 
+def forecast_scenarios_to_df(
+    scenarios: List[ForecastScenario], start: datetime = None, end: datetime = None
+) -> List[pd.DataFrame]:
+    """Convert generation and load forecast scenarios to DataFrames within a specified time range.
+
+    Parameters
+    ----------
+    scenarios : List[ForecastScenario]
+        Generation and load forecast scenarios.
+    start : datetime, optional
+        Start timestamp for filtering data, by default None
+    end : datetime, optional
+        End timestamp for filtering data, by default None
+
+    Returns
+    -------
+    List[pd.DataFrame]
+        containing filtered generation and load data of each scenario.
+    """
+    return [generation_and_load_to_df(scenario, start, end) for scenario in scenarios]
+
+
 def battery_to_df(
-    battery_specs: Union[BatterySpecs, List[BatterySpecs]]
+    battery_specs: Union[PreparedBattery, List[PreparedBattery]]
 ) -> pd.DataFrame:
     """
     Convert battery specifications to a DataFrame.
 
-    :param battery_specs: Battery specifications.
+    :param battery_specs: Battery specifications (as prepared by input_prep).
     :return: DataFrame containing battery specifications.
     """
-    # Convert BatterySpecs objects to a DataFrame, set index to 'id' if available
+
+    def as_dict(battery):
+        if isinstance(battery, BatterySpecs):
+            return battery.dict(by_alias=False)
+        return asdict(battery)
+
+    # Convert battery specifications to a DataFrame, set index to 'id' if available
     if isinstance(battery_specs, list):
-        df_battery = pd.json_normalize(
-            [battery.dict(by_alias=False) for battery in battery_specs]
-        )
+        df_battery = pd.json_normalize([as_dict(battery) for battery in battery_specs])
     else:
-        df_battery = pd.json_normalize(battery_specs.dict(by_alias=False))
+        df_battery = pd.json_normalize(as_dict(battery_specs))
 
     if ~df_battery.id.isna().any():
         df_battery.set_index("id", inplace=True)  # Set index to 'id' if available
@@ -466,6 +936,211 @@ def battery_to_df(
     return df_battery
 
 
+class BatteryTable:
+    """
+    Struct-of-arrays battery specifications (as prepared by input_prep) for large battery fleets.
+    Every field of PreparedBattery is a typed NumPy column and the battery identifiers map to
+    their row in O(1). final_SoC is NaN where it is not given. The float columns are float64
+    by default and can be stored as float32 to halve the memory of the table.
+    """
+
+    # Columns of float type, in the order of PreparedBattery
+    FLOAT_COLUMNS = (
+        "initial_SoC",
+        "final_SoC",
+        "P_dis_max_kW",
+        "P_ch_max_kW",
+        "min_SoC",
+        "max_SoC",
+        "bat_capacity_kWh",
+        "ch_efficiency",
+        "dis_efficiency",
+        "bat_capacity_kWs",
+    )
+
+    def __init__(
+        self,
+        ids: List[Optional[str]],
+        bat_type: np.ndarray,
+        columns: Dict[str, np.ndarray],
+    ):
+        """
+        :param ids: The battery identifiers. Like battery_to_df, the batteries are indexed by their
+            position if any identifier is missing.
+        :param bat_type: The battery types ('cbes' or 'hbes').
+        :param columns: The float columns (see FLOAT_COLUMNS), all of the same dtype.
+        """
+        self.has_ids = all(battery_id is not None for battery_id in ids)
+        # Battery identifiers (or positions) in row order, the index set of the optimization models
+        self.index = tuple(ids) if self.has_ids else tuple(range(len(ids)))
+        self._positions = {battery_id: i for i, battery_id in enumerate(self.index)}
+        if len(self._positions) != len(self.index):
+            raise ValueError("Battery identifiers have to be unique.")
+        self.bat_type = np.asarray(bat_type, dtype=str)
+        self.is_hbes = self.bat_type == "hbes"
+        for column in self.FLOAT_COLUMNS:
+            setattr(self, column, columns[column])
+
+    @classmethod
+    def from_batteries(
+        cls, batteries: List[PreparedBattery], dtype: np.dtype = np.float64
+    ) -> "BatteryTable":
+        """
+        Build the table from prepared battery specifications.
+
+        :param batteries: Battery specifications (as prepared by input_prep).
+        :param dtype: dtype of the float columns (np.float64 or np.float32).
+        :return: The battery table.
+        """
+        columns = {
+            column: np.fromiter(
+                (
+                    np.nan if getattr(battery, column) is None else getattr(battery, column)
+                    for battery in batteries
+                ),
+                dtype=dtype,
+                count=len(batteries),
+            )
+            for column in cls.FLOAT_COLUMNS
+        }
+        return cls(
+            [battery.id for battery in batteries],
+            [battery.bat_type for battery in batteries],
+            columns,
+        )
+
+    @classmethod
+    def from_df(cls, df_battery: pd.DataFrame, dtype: np.dtype = np.float64) -> "BatteryTable":
+        """
+        Build the table from a battery DataFrame (as returned by battery_to_df).
+
+        :param df_battery: Battery specifications DataFrame.
+        :param dtype: dtype of the float columns (np.float64 or np.float32).
+        :return: The battery table.
+        """
+        ids = list(df_battery.index) if "id" not in df_battery else [None] * len(df_battery)
+        columns = {
+            column: pd.to_numeric(df_battery[column]).to_numpy(dtype=dtype, na_value=np.nan)
+            for column in cls.FLOAT_COLUMNS
+        }
+        return cls(ids, df_battery.bat_type.to_numpy(), columns)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, position: int) -> PreparedBattery:
+        """The battery in a row, as PreparedBattery."""
+        values = {
+            column: float(getattr(self, column)[position])
+            for column in self.FLOAT_COLUMNS
+        }
+        if np.isnan(values["final_SoC"]):
+            values["final_SoC"] = None
+        return PreparedBattery(
+            id=self.index[position] if self.has_ids else None,
+            bat_type=str(self.bat_type[position]),
+            **values,
+        )
+
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+    @property
+    def dtype(self) -> np.dtype:
+        """dtype of the float columns."""
+        return self.initial_SoC.dtype
+
+    @property
+    def with_final_SoC(self) -> np.ndarray:
+        """
+        Batteries with a final SoC target. Household batteries (hbes) have to reach max_SoC at
+        day_end instead, which applies as soon as any battery of the fleet has a final SoC
+        (as for the final_SoC column of battery_to_df).
+        """
+        given = ~np.isnan(self.final_SoC)
+        return np.where(self.is_hbes, given.any(), given)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory of the columns in bytes."""
+        return self.bat_type.nbytes + sum(
+            getattr(self, column).nbytes for column in self.FLOAT_COLUMNS
+        )
+
+    def position(self, battery_id) -> int:
+        """The row of a battery identifier."""
+        return self._positions[battery_id]
+
+    def mapping(self, column: str) -> Dict:
+        """
+        Map the battery identifiers to the (Python scalar) values of a column,
+        e.g. as indexed parameters of a pyomo model. The final SoC is None for
+        batteries without a final SoC target (see with_final_SoC).
+
+        :param column: The column name.
+        :return: Dictionary of battery identifier and value.
+        """
+        if column == "bat_type":
+            return dict(zip(self.index, self.bat_type.tolist()))
+        values = getattr(self, column).tolist()
+        if column == "final_SoC":
+            values = [
+                value if given else None
+                for value, given in zip(values, self.with_final_SoC)
+            ]
+        return dict(zip(self.index, values))
+
+    def with_column(self, column: str, values) -> "BatteryTable":
+        """
+        Copy of the table with the values of a float column replaced (e.g. the initial SoCs
+        of the next control step). The table itself stays untouched.
+
+        :param column: The float column name.
+        :param values: The new values of all batteries in row order.
+        :return: The new battery table.
+        """
+        columns = {name: getattr(self, name) for name in self.FLOAT_COLUMNS}
+        columns[column] = np.array(values, dtype=self.dtype).reshape(len(self))
+        ids = list(self.index) if self.has_ids else [None] * len(self)
+        return BatteryTable(ids, self.bat_type, columns)
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        Convert the table to a battery DataFrame as returned by battery_to_df.
+
+        :return: DataFrame containing battery specifications.
+        """
+        return battery_to_df(list(self))
+
+
+def battery_to_table(
+    battery_specs: Union[PreparedBattery, List[PreparedBattery]],
+    dtype: np.dtype = np.float64,
+) -> BatteryTable:
+    """
+    Convert battery specifications to a struct-of-arrays BatteryTable.
+
+    :param battery_specs: Battery specifications (as prepared by input_prep).
+    :param dtype: dtype of the float columns, np.float32 halves the memory for large fleets.
+    :return: BatteryTable containing battery specifications.
+    """
+    if not isinstance(battery_specs, list):
+        battery_specs = [battery_specs]
+    return BatteryTable.from_batteries(battery_specs, dtype=dtype)
+
+
+def as_battery_table(df_battery: Union[pd.DataFrame, BatteryTable]) -> BatteryTable:
+    """
+    The battery specifications as BatteryTable, converting a DataFrame from battery_to_df.
+
+    :param df_battery: Battery specifications DataFrame or BatteryTable.
+    :return: BatteryTable containing battery specifications.
+    """
+    if isinstance(df_battery, BatteryTable):
+        return df_battery
+    return BatteryTable.from_df(df_battery)
+
+
 def measurements_request_to_dict(measurements_request: MeasurementsRequest):
     """
     Convert measurements request to a dictionary.
@@ -499,50 +1174,71 @@ def P_net_after_kW_lim_to_df(
     Returns
     -------
     pd.DataFrame
-        containing P_net_after_kWLimitation data
-    """    
+        containing P_net_after_kWLimitation data on the sorted union of the limitation and the
+        regular generation_and_load time index (see GenerationAndLoad.regular_index). Limitation
+        timestamps are moved to the nearest time step of that index. Bounds are float (0 where not
+        given) and the with_upper_bound / with_lower_bound identifiers are bool.
+    """
+    forecast_index = gen_load_data.regular_index()
+
     # Check if P_net_after_kW_limits is None
     if P_net_after_kW_limits is None:
-        # Create a DataFrame with default values and use timestamps from gen_load_data
-        all_timestamps = set(item.timestamp for item in gen_load_data.values)
-        missing_data = pd.DataFrame(
+        limits = pd.DataFrame(
+            {"upper_bound": np.nan, "lower_bound": np.nan}, index=forecast_index
+        )
+    else:
+        limits = pd.DataFrame(
             {
-                "upper_bound": [0] * len(all_timestamps),
-                "with_upper_bound": [False] * len(all_timestamps),
-                "lower_bound": [0] * len(all_timestamps),
-                "with_lower_bound": [False] * len(all_timestamps),
+                "upper_bound": [item.upper_bound for item in P_net_after_kW_limits],
+                "lower_bound": [item.lower_bound for item in P_net_after_kW_limits],
             },
-            index=list(all_timestamps),
+            index=regularization.snap(
+                pd.DatetimeIndex(
+                    [item.timestamp for item in P_net_after_kW_limits], name="timestamp"
+                ),
+                forecast_index,
+            ),
+            dtype=float,
         )
-        missing_data.index.name = "timestamp"  # Set the index name
-        return missing_data
-
-    # Convert the list of P_net_after_kWLimitation objects to a DataFrame
-    df = pd.DataFrame([item.dict() for item in P_net_after_kW_limits])
-    df.set_index("timestamp", inplace=True)
-
-    # Adding new columns and filling default values
-    df["with_upper_bound"] = df["upper_bound"].notnull()
-    df["with_lower_bound"] = df["lower_bound"].notnull()
-    df.fillna(0, inplace=True)
+        # The last limitation given for a time step applies
+        limits = limits[~limits.index.duplicated(keep="last")]
+        # Timestamps not present in P_net_after_kWLimitation but in generation_and_load are unbounded
+        limits = limits.reindex(forecast_index.union(limits.index))
 
-    # Handle timestamps not present in P_net_after_kWLimitation but in generation_and_load
-    all_timestamps = set(df.index).union(
-        set(item.timestamp for item in gen_load_data.values)
-    )
-    missing_timestamps = list(set(all_timestamps).difference(df.index))
-    missing_data = pd.DataFrame(
+    result_df = pd.DataFrame(
         {
-            "upper_bound": [0] * len(missing_timestamps),
-            "with_upper_bound": [False] * len(missing_timestamps),
-            "lower_bound": [0] * len(missing_timestamps),
-            "with_lower_bound": [False] * len(missing_timestamps),
+            "upper_bound": limits.upper_bound.fillna(0.0).to_numpy(dtype=float),
+            "lower_bound": limits.lower_bound.fillna(0.0).to_numpy(dtype=float),
+            "with_upper_bound": limits.upper_bound.notna().to_numpy(),
+            "with_lower_bound": limits.lower_bound.notna().to_numpy(),
         },
-        index=missing_timestamps,
+        index=limits.index.rename("timestamp"),
     )
+    return result_df.sort_index()
+
+
+def P_net_after_kW_lim_to_arrays(
+    P_net_after_kW_limits: pd.DataFrame, index: pd.DatetimeIndex
+) -> Dict[str, np.ndarray]:
+    """Align P_net_after_kW limitations to a time index as NumPy arrays.
 
-    # Concatenate the two DataFrames
-    result_df = pd.concat([df, missing_data.astype(int)], axis=0)
-    result_df.index.name = "timestamp"  # Set the index name
+    Parameters
+    ----------
+    P_net_after_kW_limits : pd.DataFrame
+        P_net_after_kW limitations as returned by P_net_after_kW_lim_to_df.
+    index : pd.DatetimeIndex
+        Time index (e.g. the optimization horizon) to align to.
 
-    return result_df
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        float arrays "upper_bound" and "lower_bound" (0 where not given) and boolean masks
+        "with_upper_bound" and "with_lower_bound", each of the length of index.
+    """
+    aligned = P_net_after_kW_limits.reindex(index)
+    return {
+        "upper_bound": aligned.upper_bound.fillna(0.0).to_numpy(dtype=float),
+        "lower_bound": aligned.lower_bound.fillna(0.0).to_numpy(dtype=float),
+        "with_upper_bound": aligned.with_upper_bound.fillna(False).to_numpy(dtype=bool),
+        "with_lower_bound": aligned.with_lower_bound.fillna(False).to_numpy(dtype=bool),
+    }
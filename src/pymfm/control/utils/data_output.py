@@ -23,21 +23,58 @@
 
 
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 import os
+import re
 import json
-import itertools
+import xlsxwriter
+from functools import partial
+from typing import Dict, Iterable, List, Tuple
+from pymfm.control.utils import plotting
 from pymfm.control.utils.data_input import (
     ControlLogic as CL,
     OperationMode as OM,
 )
+from pymfm.control.utils.plotting import PlotQueue
+
+
+# Layouts of the results of scheduling outputs: a record per time step or an array per column
+OUTPUT_LAYOUTS = ("records", "columns")
+# Columns of the summary sheet of Excel reports
+SUMMARY_COLUMNS = (
+    "community",
+    "sheet",
+    "control_logic",
+    "operation_mode",
+    "start (UTC)",
+    "end (UTC)",
+    "time_steps",
+    "import_kWh",
+    "export_kWh",
+)
+# Day zero of Excel serial dates
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+# Rows of the output time series converted at once when writing Excel reports
+EXCEL_CHUNK_ROWS = 10000
+# Maximum length of Excel sheet names
+MAX_SHEET_NAME_LENGTH = 31
 
 
 def visualize_and_save_plots(
-    mode_logic: dict, dataframe: pd.DataFrame, output_directory: str
+    mode_logic: dict,
+    dataframe: pd.DataFrame,
+    output_directory: str,
+    processes: int = None,
+    queue: PlotQueue = None,
+    format: str = "svg",
+    downsampling: str = "minmax",
 ):
     """Visualize control output data from a DataFrame and save plots as SVG files based on control logic and operation mode.
 
+    The plots are rendered headless (see pymfm.control.utils.plotting) and the render time of
+    every plot is printed. Long horizons are downsampled before drawing, so the file size
+    stays bounded.
+
     Parameters
     ----------
     mode_logic : dict
@@ -46,146 +83,336 @@ def visualize_and_save_plots(
         containing data to be visualized.
     output_directory : str
         Directory where the SVG plots will be saved.
-    """    
-    if mode_logic["CL"] == CL.OPTIMIZATION_BASED:
-        # First subplot for 'P_net_after_kW', 'upperb', and 'lowerb'
-        plt.figure(figsize=(12, 8))
-        plt.plot(
-            dataframe.index,
-            dataframe["P_net_after_kW"],
-            linestyle="--",
-            label="P_net_after_kW",
-            c="olivedrab",
-            lw=2,
-        )
-        plt.plot(
-            dataframe.index, dataframe["upperb"], label="Upperbound", c="red", lw=2
-        )
-        plt.plot(
-            dataframe.index, dataframe["lowerb"], label="Lowerbound", c="red", lw=2
-        )
-        plt.title("Net power after and its Boundaries")
-        plt.xlabel("Timestamp")
-        plt.ylabel("Value")
-        plt.grid(True)
-        plt.legend()
-
-        # Save the first plot to an SVG file in the specified output directory
-        output_file1 = os.path.join(
-            output_directory, f"{mode_logic['ID']}_p_net_after_and_boundries_plot.svg"
-        )
-        plt.savefig(output_file1, format="svg")
-
-        # Second subplot for power output ('P_net_before_kW', 'P_net_after_kW', and battery power)
-        plt.figure(figsize=(12, 8))
-
-        plt.plot(
-            dataframe.index,
-            dataframe["P_net_before_kW"],
-            label="P_net_before_kW",
-            c="hotpink",
-            lw=2,
-        )
-        plt.plot(
-            dataframe.index,
-            dataframe["P_net_after_kW"],
-            linestyle="--",
-            label="P_net_after_kW",
-            c="olivedrab",
-            lw=2,
-        )
-        plt.plot(
-            dataframe.index,
-            dataframe["P_bat_total_kW"],
-            label="P_bat_total_kW",
-            c="turquoise",
-            lw=2,
-        )
-
-        plt.title("The Power Balance")
-        plt.xlabel("Timestamp")
-        plt.grid(True)
-        plt.legend()
-
-        # Save the second plot to an SVG file in the specified output directory
-        output_file2 = os.path.join(
-            output_directory, f"{mode_logic['ID']}_power_balance_plot.svg"
-        )
-        plt.savefig(output_file2, format="svg")
+    processes : int, optional
+        Number of worker processes rendering the plots in parallel, by default the plots are
+        rendered in the calling process.
+    queue : PlotQueue, optional
+        If given, the plots are only queued and rendered when the queue is rendered.
+    format : str, optional
+        File format of the plots, by default 'svg'. 'png' gives rasterized plots.
+    downsampling : str, optional
+        Downsampling method of long lines, 'minmax' (per-pixel min/max envelope, by default)
+        or 'lttb' (largest-triangle-three-buckets). None draws every point.
+
+    Returns
+    -------
+    Dict[str, float]
+        Render time in seconds of every saved plot file (empty if the plots are queued).
+    """
+    if queue is not None:
+        queue.add(mode_logic, dataframe, output_directory, format, downsampling)
+        return {}
+
+    render_times = plotting.render_plots(
+        mode_logic,
+        dataframe,
+        output_directory,
+        format=format,
+        processes=processes,
+        downsampling=downsampling,
+    )
 
-        # Third subplot for battery state of charge ('SoC_bat_n_%')
-        plt.figure(figsize=(12, 8))
+    # Get the absolute file path of the generated .json file
+    absolute_output_directory_path = os.path.abspath(output_directory)
+    print(
+        f"Output .{format} plots generated and saved under: {absolute_output_directory_path}"
+    )
+    return render_times
+
+
+def format_timestamp(timestamp, operation_mode: str) -> str:
+    """
+    Format a timestamp of the control output as in the output JSON files.
+
+    :param timestamp: The timestamp (datetime).
+    :param operation_mode: The operation mode of the output.
+    :return: The timestamp string (ISO format for near real-time, UTC with microseconds for scheduling).
+    """
+    if operation_mode == OM.NEAR_REAL_TIME:
+        return timestamp.isoformat()
+    return timestamp.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _column_values(column: pd.Series) -> list:
+    """
+    Values of an output column as list, converted from the NumPy buffer as a whole.
+    """
+    if column.dtype == object:
+        try:
+            return column.to_numpy(dtype=float).tolist()
+        except (TypeError, ValueError):
+            return column.tolist()
+    return column.to_numpy().tolist()
+
+
+def _regular_step(timestamps: pd.DatetimeIndex) -> pd.Timedelta:
+    """
+    The time step of regular timestamps, None for irregular (or less than two) timestamps.
+    """
+    if len(timestamps) < 2:
+        return None
+    steps = np.diff(timestamps.asi8)
+    if (steps != steps[0]).any():
+        return None
+    return pd.Timedelta(int(steps[0]))
+
+
+def output_to_dict(
+    mode_logic: dict,
+    output_df: pd.DataFrame,
+    format_timestamps: bool = True,
+    layout: str = "records",
+) -> dict:
+    """Prepare the output control data in the structure of the output JSON files.
 
-        # Columns to plot for battery state of charge (detect dynamically)
-        battery_soc_columns = [col for col in dataframe.columns if "SoC_bat" in col]
-        # Generate a list of distinct colors
-        color_cycle = itertools.cycle(plt.cm.tab20.colors)
+    Parameters
+    ----------
+    mode_logic : dict
+        containing control logic and operation mode information.
+    output_df : pd.DataFrame
+        containing the control output data (dictionary for near real-time).
+    format_timestamps : bool, optional
+        If true, timestamps are formatted as strings (see format_timestamp), otherwise they are
+        kept as datetime, by default True.
+    layout : str, optional
+        Layout of the scheduling results (see OUTPUT_LAYOUTS), by default 'records' with one
+        record of all columns and the timestamp per time step. 'columns' gives one array per
+        column plus the time step step_s in seconds (the timestamps are uc_start + i * step_s),
+        which avoids repeating column names and timestamps. Irregular timestamps are given as
+        an array as well.
+
+    Returns
+    -------
+    dict
+        the output data.
+    """
+
+    def timestamp(value):
+        if format_timestamps:
+            return format_timestamp(value, mode_logic["OM"])
+        return value
+
+    if mode_logic["CL"] == CL.RULE_BASED and mode_logic["OM"] == OM.NEAR_REAL_TIME:
+        # Prepare data for near real-time rule-based mode
+        return {
+            "id": mode_logic["ID"],
+            "application": "pymfm",
+            "control_logic": "rule_based",
+            "operation_mode": "near_real_time",
+            "timestamp": timestamp(output_df["timestamp"]),
+            "initial_SoC_bat_%": output_df["initial_SoC_bat_%"],
+            "SoC_bat_%": output_df["SoC_bat_%"],
+            "P_bat_kW": output_df["P_bat_kW"],
+            "P_net_meas_kW": output_df["P_net_meas_kW"],
+            "P_net_after_kW": output_df["P_net_after_kW"],
+        }
 
-        for col in battery_soc_columns:
-            color = next(color_cycle)
-            plt.plot(dataframe.index, dataframe[col], label=col, c=color, lw=2)
+    if layout not in OUTPUT_LAYOUTS:
+        raise ValueError(f"unknown output layout '{layout}', use one of {OUTPUT_LAYOUTS}")
 
-        plt.title("State of Charges of the Batteries")
-        plt.xlabel("Timestamp")
-        plt.grid(True)
-        plt.legend()
+    # Prepare data for scheduling (rule-based or optimization-based) mode
+    if layout == "columns":
+        step = _regular_step(output_df.index)
+        results = {str(name): _column_values(output_df[name]) for name in output_df.columns}
+        output = {
+            "id": mode_logic["ID"],
+            "application": "pymfm",
+            "control_logic": CL(mode_logic["CL"]).value,
+            "operation_mode": "scheduling",
+            "uc_start": timestamp(output_df.index[0]),
+            "uc_end": timestamp(output_df.index[-1]),
+            "layout": "columns",
+            "step_s": step.total_seconds() if step is not None else None,
+        }
+        if step is None:
+            output["timestamps"] = [timestamp(value) for value in output_df.index]
+        output["results"] = results
+        return output
+
+    # Extract the timestamps as column
+    results_df = output_df.copy()
+    results_df["timestamp"] = [timestamp(value) for value in output_df.index]
+    return {
+        "id": mode_logic["ID"],
+        "application": "pymfm",
+        "control_logic": CL(mode_logic["CL"]).value,
+        "operation_mode": "scheduling",
+        "uc_start": timestamp(output_df.index[0]),
+        "uc_end": timestamp(output_df.index[-1]),
+        "results": results_df.to_dict(orient="records"),
+    }
+
+
+def _parse_timestamp(value) -> pd.Timestamp:
+    """A timestamp of an output (string or datetime) as UTC Timestamp."""
+    value = pd.Timestamp(value)
+    return value.tz_localize("UTC") if value.tzinfo is None else value.tz_convert("UTC")
+
+
+def output_from_dict(output: dict) -> Tuple[dict, pd.DataFrame]:
+    """Read output control data in the structure of the output JSON files (either layout).
 
-        # Save the third plot to an SVG file in the specified output directory
-        output_file3 = os.path.join(
-            output_directory, f"{mode_logic['ID']}_battery_soc_plot.svg"
+    Parameters
+    ----------
+    output : dict
+        the output data, as produced by output_to_dict or loaded from an output JSON file.
+
+    Returns
+    -------
+    Tuple[dict, pd.DataFrame]
+        mode_logic and the output DataFrame (dictionary for near real-time), as returned
+        by mode_logic_handler.
+    """
+    mode_logic = {
+        "ID": output["id"],
+        "CL": CL(output["control_logic"]),
+        "OM": OM(output["operation_mode"]),
+    }
+    if mode_logic["OM"] == OM.NEAR_REAL_TIME:
+        output_df = {
+            key: value
+            for key, value in output.items()
+            if key not in ("id", "application", "control_logic", "operation_mode")
+        }
+        output_df["timestamp"] = pd.Timestamp(output_df["timestamp"]).to_pydatetime()
+        return mode_logic, output_df
+
+    if output.get("layout", "records") == "columns":
+        results = output["results"]
+        n_steps = len(next(iter(results.values()), []))
+        if output.get("step_s") is not None:
+            index = pd.date_range(
+                _parse_timestamp(output["uc_start"]),
+                periods=n_steps,
+                freq=pd.Timedelta(seconds=output["step_s"]),
+            )
+        else:
+            index = pd.DatetimeIndex(pd.to_datetime(output["timestamps"], utc=True))
+        output_df = pd.DataFrame(
+            {name: np.asarray(values) for name, values in results.items()}, index=index
         )
-        plt.savefig(output_file3, format="svg")
+    else:
+        output_df = pd.DataFrame.from_records(output["results"])
+        output_df.index = pd.DatetimeIndex(
+            pd.to_datetime(output_df.pop("timestamp").tolist(), utc=True)
+        )
+    return mode_logic, output_df
 
-        plt.close()  # Close the current figure to free up resources
 
-    if mode_logic["CL"] == CL.RULE_BASED:
-        if mode_logic["OM"] == OM.SCHEDULING:
-            # Create a plot for 'P_net_before_kW', 'P_net_after_kW', and 'P_bat_1_kW'
-            plt.figure(figsize=(12, 8))
+def read_output_json(source) -> Tuple[dict, pd.DataFrame]:
+    """
+    Read an output JSON file or payload (see output_from_dict).
 
-            plt.plot(
-                dataframe.index,
-                dataframe["P_net_before_kW"],
-                label="P_net_before_kW",
-                c="hotpink",
-                lw=2,
-            )
-            plt.plot(
-                dataframe.index,
-                dataframe["P_net_after_kW"],
-                linestyle="--",
-                label="P_net_after_kW",
-                c="olivedrab",
-                lw=2,
-            )
-            plt.plot(
-                dataframe.index,
-                dataframe["P_bat_1_kW"],
-                label="P_bat_1_kW",
-                c="turquoise",
-                lw=2,
-            )
+    :param source: Path of the output JSON file, or the JSON payload as bytes.
+    :return: Tuple of mode_logic and the output DataFrame.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return output_from_dict(json.loads(source))
+    with open(source) as json_file:
+        return output_from_dict(json.load(json_file))
 
-            # Customize the plot (labels, titles, legends, etc.) as needed
-            plt.xlabel("Timestamp")
-            plt.grid(True)
-            plt.legend()
 
-            # Save the plot as an SVG image under the given directory
-            output_file = os.path.join(
-                output_directory, f"{mode_logic['ID']}_output_plot.svg"
-            )
-            plt.savefig(output_file, format="svg")
-            plt.close()  # Close the current figure to free up resources
-
-    # Get the absolute file path of the generated .json file
-    absolute_output_directory_path = os.path.abspath(output_directory)
-    print(
-        f"Output .svg plots generated and saved under: {absolute_output_directory_path}"
-    )
+def output_to_json(
+    mode_logic: dict, output_df: pd.DataFrame, layout: str = "records"
+) -> bytes:
+    """Serialize the output control data to the JSON payload of the output files, in memory.
 
+    Parameters
+    ----------
+    mode_logic : dict
+        containing control logic and operation mode information.
+    output_df : pd.DataFrame
+        containing the control output data (dictionary for near real-time).
+    layout : str, optional
+        Layout of the scheduling results (see output_to_dict), by default 'records'.
+
+    Returns
+    -------
+    bytes
+        the JSON payload (UTF-8), indented for readability for the records layout and
+        compact for the columns layout.
+    """
+    output = output_to_dict(mode_logic, output_df, layout=layout)
+    if layout == "columns":
+        # Compact, an indented array would put every value on its own line
+        return json.dumps(output, separators=(",", ":")).encode("utf-8")
+    return json.dumps(output, indent=4).encode("utf-8")
+
+
+def output_files(
+    mode_logic: dict,
+    output_df: pd.DataFrame,
+    plots: bool = True,
+    format: str = "svg",
+    downsampling: str = "minmax",
+    processes: int = None,
+    layout: str = "records",
+) -> Dict[str, bytes]:
+    """Produce the output JSON and plots of a control output in memory, without touching the disk.
+    The result can be returned by a service directly or saved with write_outputs.
 
-def prepare_json(mode_logic: dict, output_df: pd.DataFrame, output_directory: str):
+    Parameters
+    ----------
+    mode_logic : dict
+        containing control logic and operation mode information.
+    output_df : pd.DataFrame
+        containing the control output data (dictionary for near real-time).
+    plots : bool, optional
+        If true, the plots are rendered as well, by default True.
+    format : str, optional
+        File format of the plots, by default 'svg'.
+    downsampling : str, optional
+        Downsampling method of long lines of the plots, by default 'minmax'.
+    processes : int, optional
+        Number of worker processes rendering the plots in parallel (optional).
+    layout : str, optional
+        Layout of the scheduling results in the output JSON (see output_to_dict),
+        by default 'records'.
+
+    Returns
+    -------
+    Dict[str, bytes]
+        File name and content of the output JSON and of every plot.
+    """
+    files = {
+        f"{mode_logic['ID']}_output.json": output_to_json(mode_logic, output_df, layout)
+    }
+    if plots:
+        files.update(
+            plotting.render_plot_buffers(
+                mode_logic,
+                output_df,
+                format=format,
+                processes=processes,
+                downsampling=downsampling,
+            )
+        )
+    return files
+
+
+def write_outputs(files: Dict[str, bytes], output_directory: str) -> List[str]:
+    """
+    File sink of in-memory outputs (see output_files).
+
+    :param files: File name and content of every output.
+    :param output_directory: Directory where the files will be saved.
+    :return: The absolute paths of the saved files.
+    """
+    output_files = []
+    for filename, content in files.items():
+        output_file = os.path.abspath(os.path.join(output_directory, filename))
+        with open(output_file, "wb") as file:
+            file.write(content)
+        output_files.append(output_file)
+    return output_files
+
+
+def prepare_json(
+    mode_logic: dict,
+    output_df: pd.DataFrame,
+    output_directory: str,
+    layout: str = "records",
+):
     """Prepare and save output control data as JSON files based on control logic and operation mode.
 
 
@@ -197,86 +424,191 @@ def prepare_json(mode_logic: dict, output_df: pd.DataFrame, output_directory: st
         containing data to be saved as JSON.
     output_directory : str
         Directory where the JSON files will be saved.
-    """    
-    if mode_logic["CL"] == CL.RULE_BASED:
-        if mode_logic["OM"] == OM.NEAR_REAL_TIME:
-            # Prepare JSON data for near real-time rule-based mode
-            formatted_data = {
-                "id": mode_logic["ID"],
-                "application": "pymfm",
-                "control_logic": "rule_based",
-                "operation_mode": "near_real_time",
-                "timestamp": output_df["timestamp"].isoformat(),
-                "initial_SoC_bat_%": output_df["initial_SoC_bat_%"],
-                "SoC_bat_%": output_df["SoC_bat_%"],
-                "P_bat_kW": output_df["P_bat_kW"],
-                "P_net_meas_kW": output_df["P_net_meas_kW"],
-                "P_net_after_kW": output_df["P_net_after_kW"],
-            }
-
-            # Serialize the formatted data to a JSON string with indentation for readability
-            json_string = json.dumps(formatted_data, indent=4)
-
-            # Write the JSON string to a file
-            output_file = os.path.join(
-                output_directory, f"{mode_logic['ID']}_output.json"
+    layout : str, optional
+        Layout of the scheduling results (see output_to_dict), by default 'records'.
+        'columns' gives one array per column instead of one record per time step.
+    """
+    # Serialize the output data and write it to a file
+    (absolute_output_file_path,) = write_outputs(
+        {
+            f"{mode_logic['ID']}_output.json": output_to_json(
+                mode_logic, output_df, layout
             )
-            with open(output_file, "w") as json_file:
-                json_file.write(json_string)
-                # Save the dictionary as JSON to the specified output file
-            # with open(output_path, "w") as json_file:
-            #    json.dump(json_data, json_file)
-
-        if mode_logic["OM"] == OM.SCHEDULING:
-            # Prepare JSON data for scheduling rule-based mode
-            # Extract the timestamps as strings
-            output_df["timestamp"] = output_df.index.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-
-            # Create the JSON structure
-            result = {
-                "id": mode_logic["ID"],
-                "application": "pymfm",
-                "control_logic": "rule_based",
-                "operation_mode": "scheduling",
-                "uc_start": output_df.index[0].strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-                "uc_end": output_df.index[-1].strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-                "results": output_df.to_dict(orient="records"),
-            }
-
-            # Serialize the JSON data with indentation for readability
-            json_string = json.dumps(result, indent=4)
-
-            # Write the JSON string to a file
-            output_file = os.path.join(
-                output_directory, f"{mode_logic['ID']}_output.json"
-            )
-            with open(output_file, "w") as json_file:
-                json_file.write(json_string)
-
-    if mode_logic["CL"] == CL.OPTIMIZATION_BASED:
-        # Prepare JSON data for scheduling optimization-based mode
-        # Extract the timestamps as strings and reset the index
-        output_df["timestamp"] = output_df.index.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-
-        # Create the JSON structure
-        result = {
-            "id": mode_logic["ID"],
-            "application": "pymfm",
-            "control_logic": "optimization_based",
-            "operation_mode": "scheduling",
-            "uc_start": output_df.index[0].strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-            "uc_end": output_df.index[-1].strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-            "results": output_df.to_dict(orient="records"),
-        }
+        },
+        output_directory,
+    )
+    print(f"Output .json file generated and saved under: {absolute_output_file_path}")
 
-        # Serialize the JSON data with indentation for readability
-        json_string = json.dumps(result, indent=4)
 
-        # Write the JSON string to a file
-        output_file = os.path.join(output_directory, f"{mode_logic['ID']}_output.json")
-        with open(output_file, "w") as json_file:
-            json_file.write(json_string)
+def _sheet_name(name: str, used: set) -> str:
+    """
+    A valid, unique Excel sheet name for a community.
+
+    :param name: The community identifier.
+    :param used: The sheet names already used (the new name is added).
+    :return: The sheet name.
+    """
+    base = re.sub(r"[\[\]:*?/\\]", "_", str(name)).strip("'") or "community"
+    sheet_name = base[:MAX_SHEET_NAME_LENGTH]
+    suffix = 1
+    while sheet_name.lower() in used:
+        suffix += 1
+        tail = f" ({suffix})"
+        sheet_name = base[: MAX_SHEET_NAME_LENGTH - len(tail)] + tail
+    used.add(sheet_name.lower())
+    return sheet_name
+
+
+def _utc_naive(timestamps: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """Timestamps in UTC without time zone (Excel has no time zones)."""
+    if timestamps.tz is not None:
+        timestamps = timestamps.tz_convert("UTC").tz_localize(None)
+    return timestamps
+
+
+def _excel_serial_dates(timestamps: pd.DatetimeIndex) -> list:
+    """
+    Excel serial dates (days since 1899-12-30) of timezone naive timestamps, written as numbers
+    with a date format instead of converting every timestamp to datetime.
+    """
+    return ((timestamps - EXCEL_EPOCH) / pd.Timedelta(days=1)).tolist()
+
+
+def _time_step_h(timestamps: pd.DatetimeIndex) -> float:
+    """
+    Time step in hours of a scheduling output, the median step of its first chunk of timestamps.
+    """
+    if len(timestamps) < 2:
+        return None
+    if timestamps.freq is not None:
+        return pd.to_timedelta(timestamps.freq) / pd.Timedelta(hours=1)
+    return np.median(np.diff(timestamps[:EXCEL_CHUNK_ROWS].asi8)) / 3.6e12
+
+
+def _grid_energy_kWh(P_net_after_kW: np.ndarray, delta_T_h: float) -> np.ndarray:
+    """
+    Imported and exported energy of a time series of the net power after control.
+
+    :param P_net_after_kW: Net power after control in kW (positive: import).
+    :param delta_T_h: Time step in hours.
+    :return: Array of imported and exported energy in kWh.
+    """
+    return np.array(
+        [
+            np.nansum(np.clip(P_net_after_kW, 0, None)),
+            -np.nansum(np.clip(P_net_after_kW, None, 0)),
+        ]
+    ) * delta_T_h
+
+
+def write_excel_report(
+    results: Iterable[Tuple[dict, pd.DataFrame]], output_file: str
+) -> Dict[str, int]:
+    """Write the control outputs of many runs into one Excel workbook.
+
+    Every community (mode_logic ID) gets a sheet with the output time series of all its runs,
+    and the summary sheet lists every run. The workbook is written row by row in the
+    xlsxwriter constant_memory mode, so memory use stays flat regardless of the horizon length.
+    Results may therefore be a generator producing the runs one after another.
 
-    # Get the absolute file path of the generated .json file
+    Parameters
+    ----------
+    results : Iterable[Tuple[dict, pd.DataFrame]]
+        mode_logic and output DataFrame (dictionary for near real-time) of every run,
+        as returned by mode_logic_handler.
+    output_file : str
+        Path of the .xlsx file.
+
+    Returns
+    -------
+    Dict[str, int]
+        Number of written rows of every community sheet.
+    """
+    workbook = xlsxwriter.Workbook(
+        output_file, {"constant_memory": True, "strings_to_numbers": False}
+    )
+    timestamp_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+    header_format = workbook.add_format({"bold": True})
+
+    summary = workbook.add_worksheet("summary")
+    summary.write_row(0, 0, SUMMARY_COLUMNS, header_format)
+    summary.set_column(4, 5, 20, timestamp_format)
+    # Per community: worksheet, next row and the column header of the last run
+    sheets = {}
+    used_names = {"summary"}
+    try:
+        for n_run, (mode_logic, output_df) in enumerate(results, start=1):
+            if isinstance(output_df, dict):
+                # Near real-time output of a single timestamp
+                output_df = pd.DataFrame(
+                    [{k: v for k, v in output_df.items() if k != "timestamp"}],
+                    index=pd.DatetimeIndex([output_df["timestamp"]]),
+                )
+            community = mode_logic["ID"]
+            if community not in sheets:
+                worksheet = workbook.add_worksheet(_sheet_name(community, used_names))
+                worksheet.set_column(0, 0, 20, timestamp_format)
+                sheets[community] = [worksheet, 0, None]
+            worksheet, row, header = sheets[community]
+
+            # Runs with other columns than the previous run of the community get their own header
+            columns = ["timestamp (UTC)"] + [str(column) for column in output_df.columns]
+            if columns != header:
+                worksheet.write_row(row, 0, columns, header_format)
+                row += 1
+
+            timestamps = pd.DatetimeIndex(output_df.index)
+            delta_T_h = _time_step_h(timestamps)
+            with_energy = "P_net_after_kW" in output_df and delta_T_h is not None
+            grid_energy_kWh = np.zeros(2)
+            # Write functions of the columns, numbers are written without type dispatch
+            writers = [partial(worksheet.write_number, cell_format=timestamp_format)] + [
+                worksheet.write_number
+                if pd.api.types.is_float_dtype(dtype) or pd.api.types.is_integer_dtype(dtype)
+                else worksheet.write
+                for dtype in output_df.dtypes
+            ]
+            # Convert the time series chunkwise, so only one chunk is held as Python objects
+            for chunk_start in range(0, len(output_df), EXCEL_CHUNK_ROWS):
+                chunk = slice(chunk_start, chunk_start + EXCEL_CHUNK_ROWS)
+                if with_energy:
+                    grid_energy_kWh += _grid_energy_kWh(
+                        output_df["P_net_after_kW"].iloc[chunk].to_numpy(dtype=float),
+                        delta_T_h,
+                    )
+                for row_values in zip(
+                    _excel_serial_dates(_utc_naive(timestamps[chunk])),
+                    *(output_df[column].iloc[chunk].tolist() for column in output_df.columns),
+                ):
+                    for column, (write, value) in enumerate(zip(writers, row_values)):
+                        # NaN and None stay blank
+                        if value is not None and value == value:
+                            write(row, column, value)
+                    row += 1
+            sheets[community] = [worksheet, row, columns]
+
+            summary.write_row(
+                n_run,
+                0,
+                [
+                    str(community),
+                    worksheet.get_name(),
+                    CL(mode_logic["CL"]).value,
+                    OM(mode_logic["OM"]).value,
+                ],
+            )
+            start, end = _excel_serial_dates(_utc_naive(timestamps[[0, -1]]))
+            summary.write_number(n_run, 4, start, timestamp_format)
+            summary.write_number(n_run, 5, end, timestamp_format)
+            summary.write_number(n_run, 6, len(output_df))
+            if with_energy:
+                summary.write_row(n_run, 7, grid_energy_kWh.tolist())
+    finally:
+        workbook.close()
+
+    # Get the absolute file path of the generated .xlsx file
     absolute_output_file_path = os.path.abspath(output_file)
-    print(f"Output .json file generated and saved under: {absolute_output_file_path}")
+    print(f"Output .xlsx report generated and saved under: {absolute_output_file_path}")
+    return {
+        worksheet.get_name(): row for worksheet, row, header in sheets.values()
+    }
@@ -0,0 +1,300 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from datetime import datetime
+from typing import List, Tuple, Union
+import numpy as np
+import pandas as pd
+from pymfm.control.utils.data_input import (
+    BatteryTable,
+    Bulk,
+    P_net_after_kW_lim_to_arrays,
+    as_battery_table,
+)
+
+
+# Numerical tolerance for the comparisons of the screening (SoC in p.u., power in kW)
+TOLERANCE = 1e-6
+
+
+class InfeasibleInputError(ValueError):
+    """
+    Raised when the pre-solve screening proves that a scheduling request cannot be satisfied.
+    The individual findings are kept in the diagnostics attribute.
+    """
+
+    def __init__(self, diagnostics: List[str]):
+        self.diagnostics = diagnostics
+        super().__init__(
+            "Scheduling request is infeasible:\n"
+            + "\n".join(f"  - {diagnostic}" for diagnostic in diagnostics)
+        )
+
+
+def _format_timestamps(timestamps: pd.Index, max_shown: int = 3) -> str:
+    """
+    Format offending timestamps for a diagnostic message, truncating long lists.
+
+    :param timestamps: The offending timestamps.
+    :param max_shown: The maximum number of timestamps written out.
+    :return: Human readable string of the timestamps.
+    """
+    shown = ", ".join(str(t) for t in timestamps[:max_shown])
+    if len(timestamps) > max_shown:
+        shown += f" (and {len(timestamps) - max_shown} more)"
+    return shown
+
+
+def soc_envelopes(
+    P_load_gen: pd.DataFrame,
+    df_battery: Union[pd.DataFrame, BatteryTable],
+    delta_T: pd.Timedelta,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Compute the reachable state of charge envelopes of all batteries.
+
+    The envelopes are a relaxation of the scheduling optimization model: charging is only
+    possible in surplus timestamps and limited by the surplus and the maximum charging power,
+    household batteries (hbes) are never discharged and every battery may idle.
+    Any SoC outside of the envelopes is therefore unreachable by the optimization as well.
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast time series of float type.
+    df_battery : Union[pd.DataFrame, BatteryTable]
+        battery specifications of float and string types (SoC values between 0 and 1).
+    delta_T : pd.Timedelta
+        time step of the forecast time series.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        lower: (batteries x timestamps + 1) array of the lowest reachable SoC.
+        upper: (batteries x timestamps + 1) array of the highest reachable SoC.
+        soc_increase: (batteries x timestamps) array of the maximum SoC increase per time step.
+        soc_decrease: (batteries x timestamps) array of the maximum SoC decrease per time step.
+    """
+    dT_s = delta_T.total_seconds()
+    P_net_before_kW = (P_load_gen.P_load_kW - P_load_gen.P_gen_kW).to_numpy(dtype=float)
+    surplus_kW = np.clip(-P_net_before_kW, 0.0, None)
+
+    battery_table = as_battery_table(df_battery)
+    capacity_kWs = battery_table.bat_capacity_kWs.astype(float)[:, None]
+    P_ch_max_kW = battery_table.P_ch_max_kW.astype(float)[:, None]
+    P_dis_max_kW = battery_table.P_dis_max_kW.astype(float)[:, None]
+    ch_eff = battery_table.ch_efficiency.astype(float)[:, None]
+    dis_eff = battery_table.dis_efficiency.astype(float)[:, None]
+    is_hbes = battery_table.is_hbes[:, None]
+    min_SoC = battery_table.min_SoC.astype(float)[:, None]
+    max_SoC = battery_table.max_SoC.astype(float)[:, None]
+    initial_SoC = battery_table.initial_SoC.astype(float)[:, None]
+
+    # Charging: P_ch <= P_ch_max and P_ch / ch_eff <= surplus (no charging in deficit)
+    soc_increase = (
+        dT_s * np.minimum(P_ch_max_kW / ch_eff, surplus_kW[None, :]) / capacity_kWs
+    )
+    # Discharging: P_dis <= P_dis_max, household batteries are not discharged
+    soc_decrease = np.broadcast_to(
+        np.where(is_hbes, 0.0, dT_s * P_dis_max_kW * dis_eff / capacity_kWs),
+        soc_increase.shape,
+    )
+
+    # Increments are non-negative, so the clipped recursion reduces to a clipped cumulative sum
+    zeros = np.zeros((len(battery_table), 1))
+    upper = np.minimum(
+        max_SoC, initial_SoC + np.hstack([zeros, np.cumsum(soc_increase, axis=1)])
+    )
+    lower = np.maximum(
+        min_SoC, initial_SoC - np.hstack([zeros, np.cumsum(soc_decrease, axis=1)])
+    )
+    return lower, upper, soc_increase, soc_decrease
+
+
+def check_feasibility(
+    P_load_gen: pd.DataFrame,
+    df_battery: Union[pd.DataFrame, BatteryTable],
+    day_end: datetime,
+    bulk_data: Bulk,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+):
+    """Analytic pre-solve screening of a scheduling optimization request.
+
+    Checks the battery SoC limits, the reachability of final SoCs, the bulk energy and the
+    P_net_after_kW bounds against a relaxation of the optimization model. Only requests that
+    are provably infeasible are rejected; passing the screening does not guarantee feasibility.
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast time series of float type.
+    df_battery : Union[pd.DataFrame, BatteryTable]
+        battery specifications of float and string types (SoC values between 0 and 1).
+    day_end : datetime
+        end of the day till which household batteries should reach maximum SoC.
+    bulk_data : Bulk
+        bulk delivery/reception of energy from batteries (optional).
+    P_net_after_kW_limits : pd.DataFrame
+        upper and lower bound time series (kW) and the identifiers for their existence.
+    pv_curtailment : bool
+        If true, PV generation can be curtailed.
+
+    Raises
+    ------
+    InfeasibleInputError
+        If the request is provably infeasible. The message names the offending battery or timestamp.
+    """
+    diagnostics = []
+    delta_T = pd.to_timedelta(P_load_gen.index.freq)
+    opt_horizon = P_load_gen.index
+    soc_horizon = opt_horizon.append(pd.DatetimeIndex([opt_horizon[-1] + delta_T]))
+    battery_table = as_battery_table(df_battery)
+    batteries = battery_table.index
+
+    # Battery limits
+    min_SoC = battery_table.min_SoC.astype(float)
+    max_SoC = battery_table.max_SoC.astype(float)
+    initial_SoC = battery_table.initial_SoC.astype(float)
+    for i in np.flatnonzero(min_SoC > max_SoC + TOLERANCE):
+        diagnostics.append(
+            f"battery '{batteries[i]}': min_SoC {min_SoC[i] * 100:.2f}% is above max_SoC {max_SoC[i] * 100:.2f}%"
+        )
+    for i in np.flatnonzero(
+        (initial_SoC < min_SoC - TOLERANCE) | (initial_SoC > max_SoC + TOLERANCE)
+    ):
+        diagnostics.append(
+            f"battery '{batteries[i]}': initial_SoC {initial_SoC[i] * 100:.2f}% lies outside "
+            f"[min_SoC, max_SoC] = [{min_SoC[i] * 100:.2f}%, {max_SoC[i] * 100:.2f}%]"
+        )
+    if diagnostics:
+        # The envelopes below are meaningless for inconsistent battery limits
+        raise InfeasibleInputError(diagnostics)
+
+    lower, upper, soc_increase, soc_decrease = soc_envelopes(
+        P_load_gen, battery_table, delta_T
+    )
+
+    # Final SoC (mirrors bat_final_SoC of the optimization model)
+    for i in np.flatnonzero(battery_table.with_final_SoC):
+        n = batteries[i]
+        final_SoC = float(battery_table.final_SoC[i])
+        if battery_table.is_hbes[i]:
+            if day_end not in soc_horizon:
+                diagnostics.append(
+                    f"battery '{n}': day_end {day_end} is not a timestamp of the optimization horizon"
+                )
+                continue
+            k = soc_horizon.get_loc(day_end)
+            if upper[i, k] < max_SoC[i] - TOLERANCE:
+                diagnostics.append(
+                    f"battery '{n}': max_SoC {max_SoC[i] * 100:.2f}% cannot be reached at day_end "
+                    f"{day_end}; at most {upper[i, k] * 100:.2f}% is reachable"
+                )
+        else:
+            k = len(opt_horizon) - 1
+            if not (lower[i, k] - TOLERANCE <= final_SoC <= upper[i, k] + TOLERANCE):
+                diagnostics.append(
+                    f"battery '{n}': final_SoC {final_SoC * 100:.2f}% at {opt_horizon[k]} is unreachable; "
+                    f"reachable range is [{lower[i, k] * 100:.2f}%, {upper[i, k] * 100:.2f}%]"
+                )
+
+    # Bulk energy (mirrors bulk_energy of the optimization model)
+    if bulk_data is not None:
+        bulk_horizon = pd.date_range(
+            bulk_data.bulk_start, bulk_data.bulk_end, freq=delta_T, inclusive="both"
+        )
+        outside = bulk_horizon[~bulk_horizon.isin(opt_horizon)]
+        if len(outside) > 0:
+            diagnostics.append(
+                f"bulk window timestamps outside of the optimization horizon: {_format_timestamps(outside)}"
+            )
+        else:
+            in_bulk = opt_horizon.isin(bulk_horizon)
+            k = opt_horizon.get_loc(bulk_horizon[0])
+            capacity_kWs = battery_table.bat_capacity_kWs.astype(float)
+            max_reception_kWs = np.sum(
+                capacity_kWs
+                * np.clip(
+                    np.minimum(soc_increase[:, in_bulk].sum(axis=1), max_SoC - lower[:, k]),
+                    0.0,
+                    None,
+                )
+            )
+            max_delivery_kWs = np.sum(
+                capacity_kWs
+                * np.clip(
+                    np.minimum(soc_decrease[:, in_bulk].sum(axis=1), upper[:, k] - min_SoC),
+                    0.0,
+                    None,
+                )
+            )
+            bulk_energy_kWs = bulk_data.bulk_energy_kWh * 3600
+            if not (
+                -max_delivery_kWs - TOLERANCE
+                <= bulk_energy_kWs
+                <= max_reception_kWs + TOLERANCE
+            ):
+                diagnostics.append(
+                    f"bulk_energy_kWh {bulk_data.bulk_energy_kWh:.3f} between {bulk_data.bulk_start} and "
+                    f"{bulk_data.bulk_end} is unreachable; reachable range is "
+                    f"[{-max_delivery_kWs / 3600:.3f}, {max_reception_kWs / 3600:.3f}] kWh"
+                )
+
+    # P_net_after_kW bounds (mirrors the power balance, deficit and surplus constraints)
+    limits = P_net_after_kW_lim_to_arrays(P_net_after_kW_limits, opt_horizon)
+    with_upper = limits["with_upper_bound"]
+    with_lower = limits["with_lower_bound"]
+    upper_bound = limits["upper_bound"]
+    lower_bound = limits["lower_bound"]
+    P_net_before_kW = (P_load_gen.P_load_kW - P_load_gen.P_gen_kW).to_numpy(dtype=float)
+    is_hbes = battery_table.is_hbes
+    P_dis_total_kW = battery_table.P_dis_max_kW.astype(float)[~is_hbes].sum()
+    P_ch_total_kW = battery_table.P_ch_max_kW.astype(float).sum()
+    min_net_kW = P_net_before_kW - P_dis_total_kW
+    if pv_curtailment:
+        max_surplus_net_kW = np.zeros_like(P_net_before_kW)
+    else:
+        max_surplus_net_kW = np.minimum(0.0, P_net_before_kW + P_ch_total_kW)
+    max_net_kW = np.where(P_net_before_kW >= 0, P_net_before_kW, max_surplus_net_kW)
+
+    crossed = with_upper & with_lower & (lower_bound > upper_bound + TOLERANCE)
+    if crossed.any():
+        diagnostics.append(
+            f"P_net_after_kW lower bound above upper bound at {_format_timestamps(opt_horizon[crossed])}"
+        )
+    too_low = with_upper & (upper_bound < min_net_kW - TOLERANCE)
+    if too_low.any():
+        k = np.flatnonzero(too_low)[0]
+        diagnostics.append(
+            f"P_net_after_kW upper bound below the lowest reachable net power at "
+            f"{_format_timestamps(opt_horizon[too_low])} (e.g. {upper_bound[k]:.3f} kW < {min_net_kW[k]:.3f} kW)"
+        )
+    too_high = with_lower & (lower_bound > max_net_kW + TOLERANCE)
+    if too_high.any():
+        k = np.flatnonzero(too_high)[0]
+        diagnostics.append(
+            f"P_net_after_kW lower bound above the highest reachable net power at "
+            f"{_format_timestamps(opt_horizon[too_high])} (e.g. {lower_bound[k]:.3f} kW > {max_net_kW[k]:.3f} kW)"
+        )
+
+    if diagnostics:
+        raise InfeasibleInputError(diagnostics)
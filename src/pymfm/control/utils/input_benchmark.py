@@ -0,0 +1,127 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import argparse
+import json
+import time
+from typing import List
+import pandas as pd
+from pymfm.control.utils.data_input import InputData, open_json
+
+
+def stretch_input(data: dict, days: int) -> dict:
+    """
+    Repeat the generation and load values (and P_net_after_kW limitations) of an InputData
+    over a number of consecutive periods, e.g. to turn a day-long input into a week-long one.
+
+    :param data: The loaded JSON data of an InputData with generation_and_load.
+    :param days: Number of periods (days for a day-long input) of the stretched input.
+    :return: The loaded JSON data of the stretched InputData.
+    """
+    values = data["generation_and_load"]["values"]
+    timestamps = pd.to_datetime([row["timestamp"] for row in values])
+    # One period reaches from the first timestamp to one time step after the last
+    period = timestamps[-1] - timestamps[0] + (timestamps[1] - timestamps[0])
+
+    def repeat(rows: List[dict]) -> List[dict]:
+        return [
+            {**row, "timestamp": (pd.Timestamp(row["timestamp"]) + k * period).isoformat()}
+            for k in range(days)
+            for row in rows
+        ]
+
+    stretched = dict(data)
+    stretched["generation_and_load"] = {
+        **data["generation_and_load"],
+        "values": repeat(values),
+    }
+    if data.get("P_net_after_kW_limitation"):
+        stretched["P_net_after_kW_limitation"] = repeat(data["P_net_after_kW_limitation"])
+    stretched["uc_end"] = (pd.Timestamp(data["uc_end"]) + (days - 1) * period).isoformat()
+    return stretched
+
+
+def benchmark(data: dict, days: List[int] = (1, 7, 28), repeats: int = 5) -> pd.DataFrame:
+    """Compare the parse time of validated and trusted InputData construction.
+
+    Parameters
+    ----------
+    data : dict
+        The loaded JSON data of a day-long InputData with generation_and_load.
+    days : List[int], optional
+        Input lengths in days to benchmark, by default (1, 7, 28).
+    repeats : int, optional
+        Number of parses per input length, the fastest one is reported, by default 5.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per input length with the number of generation and load rows and the parse time
+        in seconds of InputData(**data) and InputData.from_trusted_json(data), both from the JSON string.
+    """
+    rows = []
+    for n_days in days:
+        document = json.dumps(stretch_input(data, n_days))
+        parse_times = {"validated_s": [], "trusted_s": []}
+        for _ in range(repeats):
+            start = time.perf_counter()
+            InputData(**json.loads(document))
+            parse_times["validated_s"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            input_data = InputData.from_trusted_json(document)
+            parse_times["trusted_s"].append(time.perf_counter() - start)
+        rows.append(
+            {
+                "days": n_days,
+                "rows": len(input_data.generation_and_load.values),
+                "validated_s": min(parse_times["validated_s"]),
+                "trusted_s": min(parse_times["trusted_s"]),
+            }
+        )
+
+    results = pd.DataFrame(rows)
+    results["speedup"] = results.validated_s / results.trusted_s
+    return results
+
+
+def main():
+    """
+    Command line entry point of the parse benchmark, e.g.
+    python -m pymfm.control.utils.input_benchmark inputs/scheduling_optimization_based.json --days 1 7
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark validated against trusted InputData parsing on stretched inputs."
+    )
+    parser.add_argument("input_file", help="Day-long InputData JSON file with generation_and_load.")
+    parser.add_argument("--days", nargs="+", type=int, default=[1, 7, 28])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(benchmark(open_json(args.input_file), args.days, args.repeats).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
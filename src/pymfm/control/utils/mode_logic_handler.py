@@ -21,27 +21,68 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
+import os
+import time
+from dataclasses import replace
+from multiprocessing import Pool, TimeoutError
+import numpy as np
 import pandas as pd
 from pyomo.opt import SolverStatus, TerminationCondition
-from pymfm.control.utils import data_input, data_output
+from pymfm.control.utils import (
+    data_input,
+    data_output,
+    feasibility_check,
+    model_capture,
+)
 from pymfm.control.utils.data_input import (
     InputData,
     ControlLogic as CL,
     OperationMode as OM,
 )
 from pymfm.control.algorithms import optimization_based as OptB
+from pymfm.control.algorithms import stochastic_optimization_based as StochOptB
 from pymfm.control.algorithms import rule_based as RB
+from pymfm.control.utils import solvers
+
+
+# Share of the deadline of the hybrid control given to the solver as time limit, the rest is
+# left for building the model, extracting the results and passing them back from the worker
+SOLVER_DEADLINE_SHARE = 0.8
+
+# Provenance of the output of the hybrid control
+PROVENANCE_OPTIMAL = "optimal"
+PROVENANCE_INCUMBENT = "incumbent"
+PROVENANCE_RULE_BASED = "rule_based"
 
 
-def mode_logic_handler(data: InputData):
+def mode_logic_handler(
+    data: InputData,
+    solver: str = None,
+    capture_directory: str = None,
+    solver_options: dict = None,
+):
     """
     Handle different control logic modes and operation modes.
 
     :param data: InputData object containing input data.
+    :param solver: Solver backend of the optimization based control (optional, see pymfm.control.utils.solvers).
+    :param capture_directory: Directory to dump the built optimization models into (optional,
+        defaults to the PYMFM_CAPTURE_DIRECTORY environment variable, see pymfm.control.utils.model_capture).
+    :param solver_options: Solver options of the optimization based control overriding the defaults of
+        the solver backend (optional, e.g. a time limit, see pymfm.control.utils.solvers.time_limit_options).
     :return: Tuple containing mode logic information, output DataFrame, and solver status.
     """
+    if capture_directory is None:
+        capture_directory = os.environ.get(model_capture.CAPTURE_ENV_VARIABLE)
+    # Hash of the input the captured models are filed under
+    input_hash = (
+        model_capture.input_hash(data) if capture_directory is not None else None
+    )
+
     # Prepare battery specifications, converting battery percentage to absolute values
-    battery_specs = data_input.input_prep(data.battery_specs)
+    battery_table = data_input.battery_to_table(
+        data_input.input_prep(data.battery_specs)
+    )
 
     if data.control_logic == CL.RULE_BASED:
         if data.operation_mode == OM.SCHEDULING:
@@ -50,14 +91,30 @@ def mode_logic_handler(data: InputData):
                 data.generation_and_load, start=data.uc_start, end=data.uc_end
             )
 
-            # If multiple battery nodes are present, handle them
-            if isinstance(battery_specs, list):
-                if len(battery_specs) == 1:
-                    battery_specs = battery_specs[0]
-                else:
-                    raise RuntimeError(
-                        "Rule based control cannot deal with multiple flex nodes."
-                    )
+            # Define mode_logic information
+            mode_logic = {
+                "ID": data.id,
+                "CL": data.control_logic,
+                "OM": data.operation_mode,
+            }
+
+            # If multiple battery nodes are present, dispatch them as a fleet
+            if len(battery_table) > 1:
+                print(
+                    f"Input data has been read successfully. Running scheduling rule-based control of {len(battery_table)} batteries."
+                )
+                output_df = RB.fleet_scheduling(
+                    df_forecasts,
+                    battery_table,
+                    pd.to_timedelta(df_forecasts.P_load_kW.index.freq),
+                )
+                print("Scheduling rule-based control finished.")
+                return (
+                    mode_logic,
+                    output_df,
+                    (SolverStatus.ok, TerminationCondition.optimal),
+                )
+            battery_specs = battery_table[0]
 
             # Initialize the output DataFrame
             output_df = None
@@ -79,9 +136,10 @@ def mode_logic_handler(data: InputData):
                 # Append the output for the current time
                 output_df.loc[time] = output
 
-                # Update initial SoC for the next time step
-                battery_specs.initial_SoC = (
-                    output.bat_energy_kWs / battery_specs.bat_capacity_kWs
+                # Update initial SoC for the next time step (on a copy, the input stays untouched)
+                battery_specs = replace(
+                    battery_specs,
+                    initial_SoC=output.bat_energy_kWs / battery_specs.bat_capacity_kWs,
                 )
             print("Scheduling rule-based control finished.")
 
@@ -102,13 +160,6 @@ def mode_logic_handler(data: InputData):
                 ["bat_energy_kWs", "import_kW", "export_kW"], axis=1
             )
 
-            # Define mode_logic information
-            mode_logic = {
-                "ID": data.id,
-                "CL": data.control_logic,
-                "OM": data.operation_mode,
-            }
-
             return (
                 mode_logic,
                 output_df,
@@ -116,15 +167,6 @@ def mode_logic_handler(data: InputData):
             )
 
         if data.operation_mode == OM.NEAR_REAL_TIME:
-            # Handle near real-time rule-based control
-            if isinstance(battery_specs, list):
-                if len(battery_specs) == 1:
-                    battery_specs = battery_specs[0]
-                else:
-                    raise RuntimeError(
-                        "Near real-time control cannot deal with multiple flex nodes."
-                    )
-
             # Prepare measurements request data
             measurements_request_dict = data_input.measurements_request_to_dict(
                 data.measurements_request
@@ -134,8 +176,15 @@ def mode_logic_handler(data: InputData):
                 "Input data has been read successfully. Running near real-time rule-based control."
             )
 
-            # Perform near real-time rule-based control
-            output_df = RB.near_real_time(measurements_request_dict, battery_specs)
+            # Perform near real-time rule-based control, multiple battery nodes as a fleet
+            if len(battery_table) > 1:
+                output_df = RB.fleet_near_real_time(
+                    measurements_request_dict, battery_table
+                )
+            else:
+                output_df = RB.near_real_time(
+                    measurements_request_dict, battery_table[0]
+                )
 
             # Define mode_logic information
             mode_logic = {
@@ -151,6 +200,81 @@ def mode_logic_handler(data: InputData):
                 (SolverStatus.ok, TerminationCondition.optimal),
             )
 
+    if data.control_logic == CL.OPTIMIZATION_BASED and data.forecast_scenarios:
+        # Prepare forecasted data of every scenario
+        df_forecasts_scenarios = data_input.forecast_scenarios_to_df(
+            data.forecast_scenarios, start=data.uc_start, end=data.uc_end
+        )
+        probabilities = [scenario.probability for scenario in data.forecast_scenarios]
+
+        # Prepare power limitations data
+        P_net_after_kW_limits = data_input.P_net_after_kW_lim_to_df(
+            data.P_net_after_kW_limitation, data.generation_and_load
+        )
+
+        # Every scenario has to be feasible on its own with the shared battery setpoints
+        for df_forecasts in df_forecasts_scenarios:
+            feasibility_check.check_feasibility(
+                df_forecasts,
+                battery_table,
+                data.day_end,
+                data.bulk,
+                P_net_after_kW_limits,
+                data.generation_and_load.pv_curtailment,
+            )
+
+        print(
+            f"Input data has been read successfully. Running stochastic scheduling optimization-based control with {len(probabilities)} scenarios."
+        )
+
+        # Perform stochastic scheduling optimization-based control
+        (
+            PV_profile_df,
+            P_bat_kW_df,
+            P_bat_total_kW,
+            SoC_bat_df,
+            P_net_after_kW_df,
+            upper_bound_kW,
+            lower_bound_kW,
+            solver_status,
+        ) = StochOptB.scheduling(
+            df_forecasts_scenarios,
+            probabilities,
+            battery_table,
+            data.day_end,
+            data.bulk,
+            P_net_after_kW_limits,
+            data.generation_and_load.pv_curtailment,
+            solver=solver,
+            solver_options=solver_options,
+            capture_directory=capture_directory,
+            input_hash=input_hash,
+        )
+
+        print("Stochastic scheduling optimization-based control finished.")
+
+        # Prepare the output DataFrame
+        output_df = StochOptB.prep_output_df(
+            PV_profile_df,
+            P_bat_kW_df,
+            P_bat_total_kW,
+            SoC_bat_df,
+            P_net_after_kW_df,
+            df_forecasts_scenarios,
+            probabilities,
+            upper_bound_kW,
+            lower_bound_kW,
+        )
+
+        # Define mode_logic information
+        mode_logic = {
+            "ID": data.id,
+            "CL": data.control_logic,
+            "OM": data.operation_mode,
+        }
+
+        return mode_logic, output_df, solver_status
+
     if data.control_logic == CL.OPTIMIZATION_BASED:
         # Prepare forecasted data
         df_forecasts = data_input.generation_and_load_to_df(
@@ -162,8 +286,15 @@ def mode_logic_handler(data: InputData):
             data.P_net_after_kW_limitation, data.generation_and_load
         )
 
-        # Prepare battery specifications data
-        df_battery_specs = data_input.battery_to_df(battery_specs)
+        # Reject provably infeasible requests before building the optimization model
+        feasibility_check.check_feasibility(
+            df_forecasts,
+            battery_table,
+            data.day_end,
+            data.bulk,
+            P_net_after_kW_limits,
+            data.generation_and_load.pv_curtailment,
+        )
 
         print(
             "Input data has been read successfully. Running scheduling optimization-based control."
@@ -181,11 +312,15 @@ def mode_logic_handler(data: InputData):
             solver_status,
         ) = OptB.scheduling(
             df_forecasts,
-            df_battery_specs,
+            battery_table,
             data.day_end,
             data.bulk,
             P_net_after_kW_limits,
             data.generation_and_load.pv_curtailment,
+            solver=solver,
+            capture_directory=capture_directory,
+            input_hash=input_hash,
+            solver_options=solver_options,
         )
 
         print("Scheduling optimization-based control finished.")
@@ -210,3 +345,148 @@ def mode_logic_handler(data: InputData):
         }
 
         return mode_logic, output_df, solver_status
+
+
+# Long-lived worker pool of the hybrid control, started on its first call
+_hybrid_worker = {}
+
+
+def _optimization_pool() -> Pool:
+    """
+    Return the worker pool of the hybrid control, starting it if there is none.
+
+    :return: The pool of one worker process.
+    """
+    if _hybrid_worker.get("pool") is None:
+        _hybrid_worker["pool"] = Pool(1)
+    return _hybrid_worker["pool"]
+
+
+def _terminate_optimization_pool():
+    """
+    Terminate the worker pool of the hybrid control, e.g. to stop an optimization running past
+    its deadline. The next hybrid control call starts a new pool.
+
+    :return: None
+    """
+    pool = _hybrid_worker.pop("pool", None)
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+
+def _optimization_worker(
+    data: InputData, solver: str, capture_directory: str, solver_options: dict
+):
+    """
+    Pool worker running the optimization based control of the hybrid control.
+
+    :return: Tuple of the mode_logic_handler result and its run time in seconds.
+    """
+    start = time.perf_counter()
+    result = mode_logic_handler(data, solver, capture_directory, solver_options)
+    return result, time.perf_counter() - start
+
+
+def hybrid_mode_logic_handler(
+    data: InputData,
+    deadline_s: float,
+    solver: str = None,
+    capture_directory: str = None,
+    solver_time_limit_s: float = None,
+):
+    """
+    Optimization based scheduling with a deadline and a rule based fallback. The optimization
+    based control runs in a long-lived worker process with a solver time limit, while the rule
+    based schedule of the same input is computed in this process. When the deadline fires, the
+    best available result is returned: the optimal schedule, the best feasible (incumbent)
+    schedule the solver found within its time limit, or the rule based schedule. A worker still
+    running at the deadline is terminated and replaced on the next call.
+
+    :param data: InputData object of the optimization based scheduling.
+    :param deadline_s: Time in seconds after which a result is returned.
+    :param solver: Solver backend of the optimization based control (optional, see pymfm.control.utils.solvers).
+    :param capture_directory: Directory to dump the built optimization models into (optional, see mode_logic_handler).
+    :param solver_time_limit_s: Time limit of the solver in seconds (optional, defaults to
+        SOLVER_DEADLINE_SHARE of the deadline).
+    :return: Tuple containing mode logic information, output DataFrame, and solver status as of
+        mode_logic_handler. The mode logic information additionally holds the "provenance" of the
+        output (PROVENANCE_OPTIMAL, PROVENANCE_INCUMBENT or PROVENANCE_RULE_BASED), the "timings"
+        in seconds and, if the optimization or rule based control failed, its "optimization_error"
+        or "rule_based_error".
+    :raises RuntimeError: If neither the optimization nor the rule based control produced a schedule.
+    """
+    if data.control_logic != CL.OPTIMIZATION_BASED or data.operation_mode != OM.SCHEDULING:
+        raise ValueError(
+            "Hybrid control is only available for optimization based scheduling."
+        )
+    if solver_time_limit_s is None:
+        solver_time_limit_s = SOLVER_DEADLINE_SHARE * deadline_s
+    start = time.perf_counter()
+
+    try:
+        optimization = _optimization_pool().apply_async(
+            _optimization_worker,
+            (
+                data,
+                solver,
+                capture_directory,
+                solvers.time_limit_options(solver_time_limit_s, solver),
+            ),
+        )
+
+        # Rule based fallback, computed while the optimization is running
+        rule_start = time.perf_counter()
+        rule_result, rule_based_error = None, None
+        try:
+            rule_result = mode_logic_handler(
+                data.copy(update={"control_logic": CL.RULE_BASED})
+            )
+        except Exception as error:
+            rule_based_error = f"{type(error).__name__}: {error}"
+        timings = {"rule_based_s": time.perf_counter() - rule_start}
+
+        optimization_result, optimization_error = None, None
+        try:
+            optimization_result, timings["optimization_s"] = optimization.get(
+                timeout=max(0.0, deadline_s - (time.perf_counter() - start))
+            )
+        except TimeoutError:
+            optimization_error = f"Optimization did not finish within the deadline of {deadline_s} s."
+            _terminate_optimization_pool()
+        except Exception as error:
+            optimization_error = f"{type(error).__name__}: {error}"
+    except BaseException:
+        _terminate_optimization_pool()
+        raise
+
+    provenance = None
+    if optimization_result is not None:
+        _, output_df, (_, termination_condition) = optimization_result
+        if termination_condition == TerminationCondition.optimal:
+            provenance = PROVENANCE_OPTIMAL
+        elif np.isfinite(output_df.P_net_after_kW.to_numpy(dtype=float)).all():
+            provenance = PROVENANCE_INCUMBENT
+        else:
+            optimization_error = f"Optimization terminated without a solution ({termination_condition})."
+    if provenance is None:
+        if rule_result is None:
+            raise RuntimeError(
+                f"Neither the optimization based ({optimization_error}) nor the rule based "
+                f"({rule_based_error}) control produced a schedule."
+            )
+        provenance = PROVENANCE_RULE_BASED
+    timings["total_s"] = time.perf_counter() - start
+
+    mode_logic, output_df, solver_status = (
+        rule_result if provenance == PROVENANCE_RULE_BASED else optimization_result
+    )
+    mode_logic = {**mode_logic, "provenance": provenance, "timings": timings}
+    if optimization_error is not None:
+        mode_logic["optimization_error"] = optimization_error
+    if rule_based_error is not None:
+        mode_logic["rule_based_error"] = rule_based_error
+    print(
+        f"Hybrid control finished after {timings['total_s']:.3f} s with the {provenance} schedule."
+    )
+    return mode_logic, output_df, solver_status
@@ -0,0 +1,279 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+from datetime import datetime, timezone
+from typing import List
+import pandas as pd
+from pyomo.core import value, Var, Constraint
+from pymfm.control.utils import solvers
+from pymfm.control.utils.data_input import InputData
+
+
+# Environment variable enabling model capture in a deployment
+CAPTURE_ENV_VARIABLE = "PYMFM_CAPTURE_DIRECTORY"
+
+# File names inside one capture folder
+MODEL_PICKLE = "model.pkl"
+CAPTURE_INFO = "capture.json"
+REPLAY_LOG = "replays.jsonl"
+
+
+def input_hash(data: InputData) -> str:
+    """
+    Calculate the hash identifying an input.
+
+    :param data: InputData object containing input data.
+    :return: The SHA-256 hex digest of the JSON serialized input.
+    """
+    return hashlib.sha256(data.json(by_alias=True).encode()).hexdigest()
+
+
+def capture_model(
+    model,
+    capture_directory: str,
+    input_hash: str,
+    solver: str = None,
+    options: dict = None,
+    file_format: str = "lp",
+) -> str:
+    """Dump a built scheduling model for offline analysis.
+
+    The capture folder <capture_directory>/<input_hash> contains the model as LP or MPS file
+    (with symbolic labels, for external solver tools), the pickled Pyomo model (for replay)
+    and capture.json with the input hash, solver backend, solver options and model size.
+
+    Parameters
+    ----------
+    model : ConcreteModel
+        the built pyomo model.
+    capture_directory : str
+        Directory in which the capture folder is created.
+    input_hash : str
+        hash of the InputData the model was built from.
+    solver : str, optional
+        name of the solver backend used in production, by default the selected backend.
+    options : dict, optional
+        solver options used in production, by default None.
+    file_format : str, optional
+        "lp" or "mps", by default "lp".
+
+    Returns
+    -------
+    str
+        path of the capture folder.
+    """
+    capture_path = os.path.join(capture_directory, input_hash)
+    os.makedirs(capture_path, exist_ok=True)
+
+    model.write(
+        os.path.join(capture_path, f"model.{file_format}"),
+        io_options={"symbolic_solver_labels": True},
+    )
+    with open(os.path.join(capture_path, MODEL_PICKLE), "wb") as model_file:
+        pickle.dump(model, model_file)
+
+    name = solvers.solver_name(solver)
+    capture_info = {
+        "input_hash": input_hash,
+        "captured_at": datetime.now(timezone.utc).isoformat(),
+        "solver": name,
+        "options": {**solvers.SOLVER_BACKENDS[name].options, **(options or {})},
+        "file_format": file_format,
+        "variables": sum(1 for _ in model.component_data_objects(Var)),
+        "constraints": sum(1 for _ in model.component_data_objects(Constraint)),
+    }
+    with open(os.path.join(capture_path, CAPTURE_INFO), "w") as info_file:
+        json.dump(capture_info, info_file, indent=4)
+
+    return capture_path
+
+
+def _solve_and_log(model, capture_path: str, solver: str, options: dict) -> tuple:
+    """
+    Solve a (captured) model, append the timing (or the error) to the replay log of its capture folder.
+
+    :param model: The pyomo model.
+    :param capture_path: The capture folder of the model.
+    :param solver: The solver backend name.
+    :param options: Solver options overriding the defaults of the backend.
+    :return: Tuple of the Pyomo solver results and the logged record.
+    """
+    record = {
+        "solved_at": datetime.now(timezone.utc).isoformat(),
+        "solver": solvers.solver_name(solver),
+        "options": options or {},
+    }
+    try:
+        record["interface"] = solvers.solver_interface(solver)
+        start = time.perf_counter()
+        results = solvers.solve(model, solver, options)
+        record["solve_time_s"] = time.perf_counter() - start
+        record["objective"] = value(model.obj, exception=False)
+        record["gap"] = solvers.relative_gap(results)
+        record["status"] = str(results.solver.status)
+        record["termination_condition"] = str(results.solver.termination_condition)
+    except Exception as error:
+        record["error"] = str(error)
+        raise
+    finally:
+        with open(os.path.join(capture_path, REPLAY_LOG), "a") as log_file:
+            log_file.write(json.dumps(record) + "\n")
+    return results, record
+
+
+def capture_and_solve(
+    model,
+    capture_directory: str,
+    input_hash: str,
+    solver: str = None,
+    options: dict = None,
+):
+    """
+    Capture a built scheduling model and solve it, logging the production solve time.
+
+    :param model: The pyomo model.
+    :param capture_directory: Directory in which the capture folder is created.
+    :param input_hash: Hash of the InputData the model was built from.
+    :param solver: The solver backend name (optional).
+    :param options: Solver options overriding the defaults of the backend (optional).
+    :return: The Pyomo solver results.
+    """
+    capture_path = capture_model(model, capture_directory, input_hash, solver, options)
+    results, _ = _solve_and_log(model, capture_path, solver, options)
+    return results
+
+
+def replay(
+    capture_directory: str, solver_names: List[str] = None, options: dict = None
+) -> pd.DataFrame:
+    """Re-solve all captured models with different solver backends or settings.
+
+    Every run is also appended to the replay log (replays.jsonl) of its capture folder,
+    so the captures build up a regression corpus of hard instances with their timings.
+
+    Parameters
+    ----------
+    capture_directory : str
+        Directory containing the capture folders.
+    solver_names : List[str], optional
+        Solver backends to replay with, by default all backends available on this machine.
+    options : dict, optional
+        Solver options overriding the defaults of the backends, by default None.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per capture and solver with solve time, objective, gap and status.
+    """
+    if solver_names is None:
+        solver_names = solvers.available_solvers()
+
+    rows = []
+    for capture in sorted(os.listdir(capture_directory)):
+        capture_path = os.path.join(capture_directory, capture)
+        if not os.path.isfile(os.path.join(capture_path, CAPTURE_INFO)):
+            continue
+        for solver in solver_names:
+            # Unpickle per run, so no solution of a previous run is left in the model
+            with open(os.path.join(capture_path, MODEL_PICKLE), "rb") as model_file:
+                model = pickle.load(model_file)
+            row = {"capture": capture}
+            try:
+                _, record = _solve_and_log(model, capture_path, solver, options)
+                row.update(record)
+            except Exception as error:
+                row.update({"solver": solver, "error": str(error)})
+            rows.append(row)
+
+    columns = [
+        "capture",
+        "solver",
+        "interface",
+        "options",
+        "solve_time_s",
+        "objective",
+        "gap",
+        "status",
+        "termination_condition",
+        "error",
+    ]
+    return pd.DataFrame(rows).reindex(columns=columns)
+
+
+def _parse_option(option: str) -> tuple:
+    """
+    Parse a NAME=VALUE solver option of the command line.
+
+    :param option: The option string.
+    :return: Tuple of option name and value (int, float or str).
+    """
+    name, _, option_value = option.partition("=")
+    for option_type in (int, float):
+        try:
+            return name, option_type(option_value)
+        except ValueError:
+            pass
+    return name, option_value
+
+
+def main():
+    """
+    Command line entry point of the replay tool, e.g.
+    python -m pymfm.control.utils.model_capture captures/ --solvers scip --option limits/time=60
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(
+        description="Re-solve captured scheduling models and record their timings."
+    )
+    parser.add_argument("capture_directory", help="Directory containing the captures.")
+    parser.add_argument(
+        "--solvers",
+        nargs="+",
+        default=None,
+        help=f"Solver backends to replay with (default: all available of {', '.join(solvers.SOLVER_BACKENDS)}).",
+    )
+    parser.add_argument(
+        "--option",
+        action="append",
+        default=[],
+        help="Solver option as NAME=VALUE, can be given multiple times.",
+    )
+    parser.add_argument("--output", default=None, help="Optional CSV file for the results.")
+    args = parser.parse_args()
+
+    options = dict(_parse_option(option) for option in args.option)
+    results = replay(args.capture_directory, args.solvers, options)
+    print(results.to_string(index=False))
+    if args.output is not None:
+        results.to_csv(args.output, index=False)
+        print(f"Replay results saved under: {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
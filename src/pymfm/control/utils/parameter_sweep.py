@@ -0,0 +1,236 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import itertools
+import os
+import time
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Union
+import pandas as pd
+from pyomo.environ import value
+from scipy.stats import qmc
+from pymfm.control.utils.backtest import schedule_kpis
+from pymfm.control.utils.data_input import InputData, P_net_after_kWLimitation
+from pymfm.control.utils.scheduling_session import (
+    BATTERY_OVERRIDES,
+    LIMITATION_OVERRIDE,
+    SchedulingSession,
+)
+
+# Methods generating the variations of a sweep
+SWEEP_METHODS = ("cartesian", "latin_hypercube")
+# Columns of the sweep results besides the swept parameters
+RESULT_COLUMNS = [
+    "variation",
+    "status",
+    "objective",
+    "runtime_s",
+    "grid_import_kWh",
+    "grid_export_kWh",
+    "peak_import_kW",
+    "peak_export_kW",
+    "bound_violation_steps",
+    "bound_violation_kWh",
+    "error",
+]
+
+
+def sweep_grid(
+    parameters: Dict[str, Union[list, tuple]],
+    method: str = "cartesian",
+    samples: int = None,
+    seed: int = None,
+) -> List[dict]:
+    """
+    Generate the variations (overrides) of a parameter sweep.
+
+    :param parameters: The swept parameters (see SchedulingSession.apply_overrides). With the
+        cartesian method, each is given as a list of values. With the latin_hypercube method, a
+        (low, high) tuple is sampled continuously and a list is sampled as categorical choices.
+    :param method: The sweep method, see SWEEP_METHODS.
+    :param samples: The number of variations of the latin_hypercube method.
+    :param seed: The seed of the latin_hypercube sampling (optional).
+    :return: The variations, dictionaries of parameter values.
+    """
+    if method not in SWEEP_METHODS:
+        raise ValueError(
+            f"unknown sweep method '{method}', use one of {', '.join(SWEEP_METHODS)}"
+        )
+    names = list(parameters)
+    if method == "cartesian":
+        return [
+            dict(zip(names, values))
+            for values in itertools.product(*(list(parameters[name]) for name in names))
+        ]
+
+    if samples is None:
+        raise ValueError("the latin_hypercube method needs the number of samples")
+    unit_samples = qmc.LatinHypercube(d=len(names), seed=seed).random(samples)
+    variations = [{} for _ in range(samples)]
+    for column, name in enumerate(names):
+        values = parameters[name]
+        if isinstance(values, tuple):
+            low, high = values
+            sampled = (low + unit_samples[:, column] * (high - low)).tolist()
+        else:
+            values = list(values)
+            sampled = [values[int(u * len(values))] for u in unit_samples[:, column]]
+        for variation, sample in zip(variations, sampled):
+            variation[name] = sample
+    return variations
+
+
+# Session and settings of a sweep worker process
+_worker = {}
+
+
+def _init_worker(
+    base: InputData,
+    limitation_profiles: Dict[str, List[P_net_after_kWLimitation]],
+    solver: str,
+    options: dict,
+):
+    """
+    Pool initializer passing the base InputData and the settings to a worker process once.
+    """
+    _worker.update(
+        base=base,
+        limitation_profiles=limitation_profiles,
+        solver=solver,
+        options=options,
+        session=None,
+    )
+
+
+def _run_variation(job: tuple) -> dict:
+    """
+    Pool worker scheduling one variation. The scheduling session (and its optimization model)
+    of the worker is built on its first variation and reused for all further ones.
+
+    :param job: Tuple of the variation number and the variation.
+    :return: The result row.
+    """
+    number, variation = job
+    row = dict.fromkeys(RESULT_COLUMNS)
+    row.update(variation)
+    row["variation"] = number
+    start = time.perf_counter()
+    try:
+        if _worker["session"] is None:
+            _worker["session"] = SchedulingSession(_worker["base"], _worker["solver"])
+        session = _worker["session"]
+        overrides = dict(variation)
+        if LIMITATION_OVERRIDE in overrides and overrides[LIMITATION_OVERRIDE] is not None:
+            overrides[LIMITATION_OVERRIDE] = _worker["limitation_profiles"][
+                overrides[LIMITATION_OVERRIDE]
+            ]
+        session.apply_overrides(overrides)
+        _, output_df, (_, termination_condition) = session.solve(_worker["options"])
+        row["runtime_s"] = time.perf_counter() - start
+        row["status"] = str(termination_condition)
+        row["objective"] = value(session.model.obj, exception=False)
+        row.update(schedule_kpis(output_df, session.P_net_after_kW_limits))
+    except Exception as error:
+        row["runtime_s"] = time.perf_counter() - start
+        row["status"] = "error"
+        row["error"] = f"{type(error).__name__}: {error}"
+        # The next variation of the worker starts from a fresh session
+        _worker["session"] = None
+    return row
+
+
+def iter_sweep(
+    base: InputData,
+    variations: List[dict],
+    limitation_profiles: Dict[str, list] = None,
+    solver: str = None,
+    options: dict = None,
+    processes: int = None,
+) -> Iterator[dict]:
+    """
+    Run the optimization based scheduling of every variation of a base InputData, yielding the
+    result rows as they finish. The base InputData is parsed once. Every worker process builds
+    the optimization model once and only updates the parameters and constraints changed by a
+    variation (see SchedulingSession.apply_overrides). Consecutive variations are given to the same
+    worker, so the cartesian grid changes few parameters from one variation to the next.
+
+    :param base: The optimization based scheduling InputData.
+    :param variations: The overrides of every variation (see sweep_grid).
+    :param limitation_profiles: P_net_after_kW limitation profiles by name (lists of
+        P_net_after_kWLimitation or their JSON dictionaries), the values of the
+        P_net_after_kW_limitation parameter of the variations are names of these profiles (optional).
+    :param solver: Solver backend (optional, see pymfm.control.utils.solvers).
+    :param options: Solver options overriding the defaults of the backend (optional).
+    :param processes: The number of worker processes (optional, defaults to the number of CPUs).
+        With one process the variations are scheduled in this process.
+    :return: Iterator over the result rows: the variation number, its parameter values, the
+        solver termination condition, objective, runtime and the KPIs of the schedule (see
+        backtest.schedule_kpis), or the error of a failed variation.
+    """
+    names = set(itertools.chain.from_iterable(variations))
+    unknown = names.difference(BATTERY_OVERRIDES + (LIMITATION_OVERRIDE,))
+    if unknown:
+        raise ValueError(
+            f"unknown sweep parameters {sorted(unknown)}, use {', '.join(BATTERY_OVERRIDES)} or {LIMITATION_OVERRIDE}"
+        )
+    limitation_profiles = {
+        name: [
+            limitation
+            if isinstance(limitation, P_net_after_kWLimitation)
+            else P_net_after_kWLimitation(**limitation)
+            for limitation in profile
+        ]
+        for name, profile in (limitation_profiles or {}).items()
+    }
+    initargs = (base, limitation_profiles, solver, options)
+    jobs = list(enumerate(variations))
+    if processes == 1:
+        _init_worker(*initargs)
+        for job in jobs:
+            yield _run_variation(job)
+        return
+    with Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+        chunksize = max(1, len(jobs) // (4 * (processes or os.cpu_count())))
+        yield from pool.imap_unordered(_run_variation, jobs, chunksize=chunksize)
+
+
+def sweep(
+    base: InputData,
+    variations: List[dict],
+    limitation_profiles: Dict[str, list] = None,
+    solver: str = None,
+    options: dict = None,
+    processes: int = None,
+) -> pd.DataFrame:
+    """
+    Run a parameter sweep (see iter_sweep) and collect the result rows.
+
+    :return: DataFrame with one row per variation, ordered by variation number, with the swept
+        parameters as columns next to the RESULT_COLUMNS.
+    """
+    rows = list(
+        iter_sweep(base, variations, limitation_profiles, solver, options, processes)
+    )
+    names = list(dict.fromkeys(itertools.chain.from_iterable(variations)))
+    results = pd.DataFrame(rows, columns=["variation", *names, *RESULT_COLUMNS[1:]])
+    return results.sort_values("variation", ignore_index=True)
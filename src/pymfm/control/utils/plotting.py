@@ -0,0 +1,478 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import io
+import os
+import time
+import itertools
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from matplotlib import colormaps
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from pymfm.control.utils.data_input import (
+    ControlLogic as CL,
+    OperationMode as OM,
+)
+
+
+# Size of the plots in inches
+FIGURE_SIZE = (12, 8)
+# Resolution of raster (PNG) plots in dots per inch
+DPI = 100
+# Downsampling methods applied to long time series before drawing
+DOWNSAMPLING_METHODS = ("minmax", "lttb")
+# Maximum number of drawn points per line, about two per pixel column of the plot width
+MAX_POINTS = 2400
+
+
+@dataclass(frozen=True)
+class Line:
+    """
+    One line of a plot: the plotted output column and its matplotlib keyword arguments.
+    """
+
+    column: str
+    style: Dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class PlotSpec:
+    """
+    Description of one output plot, rendered by render_plot.
+    """
+
+    filename: str  # File name of the plot without extension
+    lines: Tuple[Line, ...]
+    title: str = None
+    ylabel: str = None
+
+
+def plot_specs(mode_logic: dict, dataframe: pd.DataFrame) -> List[PlotSpec]:
+    """
+    The plots of a control output, depending on the control logic and operation mode.
+
+    :param mode_logic: Containing control logic and operation mode information.
+    :param dataframe: Control output data.
+    :return: List of plot descriptions (empty for near real-time control).
+    """
+    prefix = mode_logic["ID"]
+    P_net_before = Line("P_net_before_kW", dict(label="P_net_before_kW", c="hotpink", lw=2))
+    P_net_after = Line(
+        "P_net_after_kW", dict(linestyle="--", label="P_net_after_kW", c="olivedrab", lw=2)
+    )
+
+    if mode_logic["CL"] == CL.OPTIMIZATION_BASED:
+        # Columns to plot for battery state of charge (detect dynamically) in distinct colors
+        color_cycle = itertools.cycle(colormaps["tab20"].colors)
+        battery_soc_lines = tuple(
+            Line(column, dict(label=column, c=next(color_cycle), lw=2))
+            for column in dataframe.columns
+            if "SoC_bat" in column
+        )
+        return [
+            PlotSpec(
+                f"{prefix}_p_net_after_and_boundries_plot",
+                (
+                    P_net_after,
+                    Line("upperb", dict(label="Upperbound", c="red", lw=2)),
+                    Line("lowerb", dict(label="Lowerbound", c="red", lw=2)),
+                ),
+                title="Net power after and its Boundaries",
+                ylabel="Value",
+            ),
+            PlotSpec(
+                f"{prefix}_power_balance_plot",
+                (
+                    P_net_before,
+                    P_net_after,
+                    Line("P_bat_total_kW", dict(label="P_bat_total_kW", c="turquoise", lw=2)),
+                ),
+                title="The Power Balance",
+            ),
+            PlotSpec(
+                f"{prefix}_battery_soc_plot",
+                battery_soc_lines,
+                title="State of Charges of the Batteries",
+            ),
+        ]
+
+    if mode_logic["CL"] == CL.RULE_BASED and mode_logic["OM"] == OM.SCHEDULING:
+        # Battery fleets (see rule_based.fleet_scheduling) are plotted with their total power
+        P_bat = "P_bat_total_kW" if "P_bat_total_kW" in dataframe.columns else "P_bat_1_kW"
+        return [
+            PlotSpec(
+                f"{prefix}_output_plot",
+                (
+                    P_net_before,
+                    P_net_after,
+                    Line(P_bat, dict(label=P_bat, c="turquoise", lw=2)),
+                ),
+            )
+        ]
+    return []
+
+
+def minmax_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """
+    Per-bucket min/max envelope of a time series: the positions of the minimum and maximum of
+    every bucket of consecutive points, plus the first and last point. Drawn at one bucket per
+    pixel column, the line is indistinguishable from the full series.
+
+    :param y: The values (NaN are ignored).
+    :param n_buckets: The number of buckets.
+    :return: The sorted positions of the kept points.
+    """
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    bucket_size = -(-n // n_buckets)
+    n_padded = bucket_size * -(-n // bucket_size)
+    padded = np.full(n_padded, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(-1, bucket_size)
+    offsets = np.arange(0, n_padded, bucket_size)
+    with_values = ~np.isnan(buckets).all(axis=1)
+    minima = offsets + np.argmin(np.where(np.isnan(buckets), np.inf, buckets), axis=1)
+    maxima = offsets + np.argmax(np.where(np.isnan(buckets), -np.inf, buckets), axis=1)
+    return np.unique(
+        np.concatenate(([0, n - 1], minima[with_values], maxima[with_values]))
+    )
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-triangle-three-buckets downsampling of a time series: per bucket the point spanning
+    the largest triangle with the previously kept point and the mean of the next bucket.
+
+    :param x: The (increasing) positions of the points, e.g. timestamps as float.
+    :param y: The values.
+    :param n_out: The number of kept points (at least 3).
+    :return: The sorted positions of the kept points.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    # Bucket edges of the n - 2 inner points, the first and last point are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        mean_x = x[next_lo:next_hi].mean()
+        next_y = y[next_lo:next_hi]
+        mean_y = y[a] if np.isnan(next_y).all() else np.nanmean(next_y)
+        area = np.abs(
+            (x[a] - mean_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y - y[a])
+        )
+        a = lo + (0 if np.isnan(area).all() else int(np.nanargmax(area)))
+        indices[i + 1] = a
+    return indices
+
+
+def downsample(
+    series: pd.Series, method: str = "minmax", max_points: int = MAX_POINTS
+) -> pd.Series:
+    """
+    Downsample a time series for drawing, keeping its visual shape. Series of at most
+    max_points points are returned unchanged.
+
+    :param series: The time series.
+    :param method: The downsampling method, 'minmax' (per-pixel min/max envelope) or 'lttb'
+        (largest-triangle-three-buckets).
+    :param max_points: The maximum number of kept points.
+    :return: The downsampled time series.
+    """
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(
+            f"unknown downsampling method '{method}', use one of {DOWNSAMPLING_METHODS}"
+        )
+    if len(series) <= max_points:
+        return series
+    y = series.to_numpy(dtype=float)
+    if method == "minmax":
+        indices = minmax_indices(y, max_points // 2 - 1)
+    else:
+        x = np.arange(len(y), dtype=float)
+        if isinstance(series.index, pd.DatetimeIndex):
+            x = (series.index.asi8 - series.index.asi8[0]).astype(float)
+        indices = lttb_indices(x, y, max_points)
+    return series.iloc[indices]
+
+
+def render_plot_bytes(
+    spec: PlotSpec,
+    dataframe: pd.DataFrame,
+    format: str = "svg",
+    downsampling: str = "minmax",
+    max_points: int = MAX_POINTS,
+) -> Tuple[bytes, float]:
+    """
+    Render one plot headless with the object-oriented matplotlib API (Agg canvas) in memory.
+    Long lines are downsampled before drawing, so the size and render time are bounded
+    by max_points regardless of the horizon length. The figure is not registered with pyplot
+    and is closed after rendering.
+
+    :param spec: Description of the plot.
+    :param dataframe: Control output data (at least the columns of the plot).
+    :param format: File format of the plot, 'svg' or a raster format such as 'png'.
+    :param downsampling: Downsampling method (see downsample), None draws every point.
+    :param max_points: The maximum number of drawn points per line.
+    :return: Tuple of the file content and the render time in seconds.
+    """
+    start = time.perf_counter()
+    figure = Figure(figsize=FIGURE_SIZE, dpi=DPI)
+    FigureCanvasAgg(figure)
+    buffer = io.BytesIO()
+    try:
+        axes = figure.add_subplot()
+        for line in spec.lines:
+            series = dataframe[line.column]
+            if downsampling is not None:
+                series = downsample(series, downsampling, max_points)
+            axes.plot(series.index, series, **line.style)
+        if spec.title is not None:
+            axes.set_title(spec.title)
+        axes.set_xlabel("Timestamp")
+        if spec.ylabel is not None:
+            axes.set_ylabel(spec.ylabel)
+        axes.grid(True)
+        axes.legend()
+        figure.savefig(buffer, format=format)
+    finally:
+        figure.clear()
+    return buffer.getvalue(), time.perf_counter() - start
+
+
+def render_plot(
+    spec: PlotSpec,
+    dataframe: pd.DataFrame,
+    output_directory: str,
+    format: str = "svg",
+    downsampling: str = "minmax",
+    max_points: int = MAX_POINTS,
+) -> Tuple[str, float]:
+    """
+    Render one plot (see render_plot_bytes) and save it.
+
+    :param spec: Description of the plot.
+    :param dataframe: Control output data (at least the columns of the plot).
+    :param output_directory: Directory where the plot will be saved.
+    :param format: File format of the plot, 'svg' or a raster format such as 'png'.
+    :param downsampling: Downsampling method (see downsample), None draws every point.
+    :param max_points: The maximum number of drawn points per line.
+    :return: Tuple of the file path and the render time in seconds.
+    """
+    content, render_time = render_plot_bytes(
+        spec, dataframe, format, downsampling, max_points
+    )
+    output_file = os.path.join(output_directory, f"{spec.filename}.{format}")
+    with open(output_file, "wb") as plot_file:
+        plot_file.write(content)
+    return output_file, render_time
+
+
+def _render_plot(job: tuple) -> Tuple[str, bytes, float]:
+    """
+    Pool worker rendering one plot.
+
+    :param job: Tuple of the arguments of render_plot_bytes.
+    :return: Tuple of the file name, the file content and the render time in seconds.
+    """
+    spec, format = job[0], job[2]
+    return (f"{spec.filename}.{format}", *render_plot_bytes(*job))
+
+
+def _plot_jobs(mode_logic: dict, dataframe: pd.DataFrame, *options) -> List[tuple]:
+    """
+    render_plot_bytes arguments of all plots of a control output, each with only its plotted columns.
+    """
+    return [
+        (spec, dataframe[[line.column for line in spec.lines]], *options)
+        for spec in plot_specs(mode_logic, dataframe)
+    ]
+
+
+def _render_jobs(jobs: List[tuple], processes: int = None) -> List[Tuple[str, bytes, float]]:
+    """
+    Render plots in memory, in a process pool if more than one process is given.
+    """
+    if processes is not None and processes > 1 and len(jobs) > 1:
+        with Pool(min(processes, len(jobs))) as pool:
+            return pool.map(_render_plot, jobs)
+    return [_render_plot(job) for job in jobs]
+
+
+def _save_plots(
+    plots: List[Tuple[str, bytes, float]], output_directory: str
+) -> Dict[str, float]:
+    """
+    File sink of rendered plots, printing the render time of every plot.
+    """
+    render_times = {}
+    for filename, content, render_time in plots:
+        output_file = os.path.join(output_directory, filename)
+        with open(output_file, "wb") as plot_file:
+            plot_file.write(content)
+        print(f"Plot {filename} rendered in {render_time:.3f} s")
+        render_times[output_file] = render_time
+    return render_times
+
+
+def render_plot_buffers(
+    mode_logic: dict,
+    dataframe: pd.DataFrame,
+    format: str = "svg",
+    processes: int = None,
+    downsampling: str = "minmax",
+    max_points: int = MAX_POINTS,
+) -> Dict[str, bytes]:
+    """Render all plots of a control output in memory, without writing any file.
+
+    Parameters
+    ----------
+    mode_logic : dict
+        containing control logic and operation mode information.
+    dataframe : pd.DataFrame
+        containing data to be visualized.
+    format : str, optional
+        File format of the plots, by default 'svg'.
+    processes : int, optional
+        Number of worker processes rendering the plots in parallel, by default the plots are
+        rendered in the calling process.
+    downsampling : str, optional
+        Downsampling method of long lines (see downsample), by default 'minmax'.
+        None draws every point.
+    max_points : int, optional
+        The maximum number of drawn points per line, by default MAX_POINTS.
+
+    Returns
+    -------
+    Dict[str, bytes]
+        File name and content of every plot.
+    """
+    jobs = _plot_jobs(mode_logic, dataframe, format, downsampling, max_points)
+    return {
+        filename: content for filename, content, _ in _render_jobs(jobs, processes)
+    }
+
+
+def render_plots(
+    mode_logic: dict,
+    dataframe: pd.DataFrame,
+    output_directory: str,
+    format: str = "svg",
+    processes: int = None,
+    downsampling: str = "minmax",
+    max_points: int = MAX_POINTS,
+) -> Dict[str, float]:
+    """Render and save all plots of a control output.
+
+    Parameters
+    ----------
+    mode_logic : dict
+        containing control logic and operation mode information.
+    dataframe : pd.DataFrame
+        containing data to be visualized.
+    output_directory : str
+        Directory where the plots will be saved.
+    format : str, optional
+        File format of the plots, by default 'svg'. Raster formats (e.g. 'png') keep the file
+        size independent of the number of points.
+    processes : int, optional
+        Number of worker processes rendering the plots in parallel, by default the plots are
+        rendered in the calling process.
+    downsampling : str, optional
+        Downsampling method of long lines (see downsample), by default 'minmax'.
+        None draws every point.
+    max_points : int, optional
+        The maximum number of drawn points per line, by default MAX_POINTS.
+
+    Returns
+    -------
+    Dict[str, float]
+        Render time in seconds of every saved plot file.
+    """
+    jobs = _plot_jobs(mode_logic, dataframe, format, downsampling, max_points)
+    return _save_plots(_render_jobs(jobs, processes), output_directory)
+
+
+class PlotQueue:
+    """
+    Deferred plot generation: the plots of control outputs are queued instead of being rendered
+    right away (e.g. during batch runs) and rendered later on demand, optionally in a process pool.
+    """
+
+    def __init__(self):
+        # Output directory and render_plot_bytes arguments of every queued plot
+        self._jobs = []
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def add(
+        self,
+        mode_logic: dict,
+        dataframe: pd.DataFrame,
+        output_directory: str,
+        format: str = "svg",
+        downsampling: str = "minmax",
+        max_points: int = MAX_POINTS,
+    ):
+        """
+        Queue the plots of a control output.
+
+        :param mode_logic: Containing control logic and operation mode information.
+        :param dataframe: Control output data.
+        :param output_directory: Directory where the plots will be saved.
+        :param format: File format of the plots, by default 'svg'.
+        :param downsampling: Downsampling method of long lines (see downsample), by default 'minmax'.
+        :param max_points: The maximum number of drawn points per line.
+        """
+        self._jobs += [
+            (output_directory, job)
+            for job in _plot_jobs(mode_logic, dataframe, format, downsampling, max_points)
+        ]
+
+    def clear(self):
+        """Drop all queued plots without rendering them."""
+        self._jobs.clear()
+
+    def render(self, processes: int = None) -> Dict[str, float]:
+        """
+        Render all queued plots and empty the queue.
+
+        :param processes: Number of worker processes rendering the plots in parallel (optional).
+        :return: Render time in seconds of every saved plot file.
+        """
+        queued, self._jobs = self._jobs, []
+        plots = _render_jobs([job for _, job in queued], processes)
+        render_times = {}
+        for (output_directory, _), plot in zip(queued, plots):
+            render_times.update(_save_plots([plot], output_directory))
+        return render_times
@@ -0,0 +1,200 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from dataclasses import dataclass
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+
+# Methods to fill the time steps missing in a time series
+GAP_FILL_METHODS = ("ffill", "interpolate", "zero")
+
+
+@dataclass(frozen=True)
+class QualityReport:
+    """
+    Quality report of the regularization of a time series.
+    """
+
+    step: pd.Timedelta  # The dominant time step of the time series.
+    n_input: int  # The number of input rows.
+    n_duplicates: int  # The number of rows dropped as duplicates of a time step (the last one is kept).
+    n_off_grid: int  # The number of rows moved to the nearest time step of the regular grid.
+    n_filled: int  # The number of missing time steps filled.
+    gaps: List[Tuple[pd.Timestamp, pd.Timestamp]]  # First and last timestamp of every filled gap.
+    fill_method: str  # The method the gaps were filled with.
+
+    @property
+    def is_regular(self) -> bool:
+        """True if the time series was regular already."""
+        return self.n_duplicates == 0 and self.n_off_grid == 0 and self.n_filled == 0
+
+    def __str__(self) -> str:
+        return (
+            f"step {self.step}, {self.n_input} rows: {self.n_duplicates} duplicates dropped, "
+            f"{self.n_off_grid} off-grid rows moved, {self.n_filled} missing time steps "
+            f"in {len(self.gaps)} gaps filled ({self.fill_method})"
+        )
+
+
+def dominant_step(timestamps: np.ndarray) -> int:
+    """
+    Detect the most frequent positive time step of sorted timestamps.
+    On a tie the smaller step is taken.
+
+    :param timestamps: Sorted timestamps as integer nanoseconds.
+    :return: The dominant time step in nanoseconds.
+    """
+    steps = np.diff(timestamps)
+    counts = pd.Series(steps[steps > 0]).value_counts()
+    if counts.empty:
+        raise ValueError("the time step cannot be detected from less than two distinct timestamps")
+    return int(counts.index[counts.to_numpy() == counts.iloc[0]].min())
+
+
+def _slots(timestamps: np.ndarray, origin: int, step: int) -> np.ndarray:
+    """
+    Nearest time step of every timestamp on the grid origin + k * step (ties go to the later step).
+
+    :param timestamps: Timestamps as integer nanoseconds.
+    :param origin: The first timestamp of the grid in nanoseconds.
+    :param step: The time step of the grid in nanoseconds.
+    :return: The integer time step k of every timestamp.
+    """
+    return (timestamps - origin + step // 2) // step
+
+
+def regular_index(timestamps: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """
+    The regular time index regularize maps a time series with these timestamps onto, without
+    building the time series itself.
+
+    :param timestamps: The (possibly unsorted, duplicate or jittered) timestamps.
+    :return: The regular index (with its freq set) from the first to the last timestamp. Less than
+        two distinct timestamps are returned sorted and unique, as no time step can be detected.
+    """
+    timestamps = timestamps.sort_values()
+    if len(timestamps.unique()) < 2:
+        return timestamps.unique()
+    values = timestamps.asi8
+    step = dominant_step(values)
+    n_steps = int(_slots(values[-1:], values[0], step)[0]) + 1
+    return pd.date_range(
+        timestamps[0], periods=n_steps, freq=pd.Timedelta(step), name=timestamps.name
+    )
+
+
+def snap(timestamps: pd.DatetimeIndex, index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """
+    Move timestamps to the nearest time step of a regular index (or its continuation beyond
+    its ends), as regularize does for the rows of a time series.
+
+    :param timestamps: The timestamps to move.
+    :param index: The regular index (as returned by regular_index).
+    :return: The moved timestamps in their input order. They are returned unchanged if the
+        index has no freq.
+    """
+    if index.freq is None:
+        return timestamps
+    step = pd.Timedelta(index.freq).value
+    slots = _slots(timestamps.asi8, index[0].value, step)
+    return pd.DatetimeIndex(
+        index[0] + pd.to_timedelta(slots * step, unit="ns"), name=timestamps.name
+    )
+
+
+def regularize(
+    df: pd.DataFrame, fill_method: str = "interpolate"
+) -> Tuple[pd.DataFrame, QualityReport]:
+    """Map a time series with gaps, duplicates or jitter onto a regular time index.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Time series of float columns with a DatetimeIndex.
+    fill_method : str, optional
+        "ffill" repeats the last value, "interpolate" interpolates linearly in time and "zero"
+        fills zeros into missing time steps, by default "interpolate".
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, QualityReport]
+        The time series on the regular index (with its freq set) from the first to the last
+        input timestamp and the quality report.
+    """
+    if fill_method not in GAP_FILL_METHODS:
+        raise ValueError(
+            f"unknown gap fill method '{fill_method}', use one of {', '.join(GAP_FILL_METHODS)}"
+        )
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind="stable")
+    timestamps = df.index.asi8
+    step = dominant_step(timestamps)
+
+    # Time step of every row on the grid starting at the first timestamp
+    slots = _slots(timestamps, timestamps[0], step)
+    n_off_grid = int(np.count_nonzero((timestamps - timestamps[0]) % step))
+    # Keep the last row of every time step
+    last = np.append(slots[1:] != slots[:-1], True)
+    n_duplicates = int(len(slots) - np.count_nonzero(last))
+    slots = slots[last]
+
+    n_steps = int(slots[-1]) + 1
+    present = np.zeros(n_steps, dtype=bool)
+    present[slots] = True
+    values = np.full((n_steps, df.shape[1]), np.nan)
+    values[slots] = df.to_numpy(dtype=float)[last]
+
+    missing = ~present
+    if missing.any():
+        if fill_method == "zero":
+            values[missing] = 0.0
+        elif fill_method == "ffill":
+            # Index of the last present time step for every time step
+            source = np.maximum.accumulate(np.where(present, np.arange(n_steps), 0))
+            values = values[source]
+        else:
+            for column in range(values.shape[1]):
+                values[missing, column] = np.interp(
+                    np.flatnonzero(missing), slots, values[slots, column]
+                )
+
+    # First and last time step of every run of missing time steps
+    edges = np.diff(missing.astype(np.int8), prepend=0, append=0)
+    index = pd.date_range(
+        df.index[0], periods=n_steps, freq=pd.Timedelta(step), name=df.index.name
+    )
+    gaps = list(
+        zip(index[np.flatnonzero(edges == 1)], index[np.flatnonzero(edges == -1) - 1])
+    )
+
+    report = QualityReport(
+        step=pd.Timedelta(step),
+        n_input=len(df),
+        n_duplicates=n_duplicates,
+        n_off_grid=n_off_grid,
+        n_filled=int(np.count_nonzero(missing)),
+        gaps=gaps,
+        fill_method=fill_method,
+    )
+    return pd.DataFrame(values, index=index, columns=df.columns), report
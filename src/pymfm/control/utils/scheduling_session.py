@@ -0,0 +1,386 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import itertools
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from pyomo.core import Constraint
+from pymfm.control.utils import data_input, feasibility_check, solvers
+from pymfm.control.utils.data_input import (
+    ForecastPatch,
+    InputData,
+    ControlLogic as CL,
+    OperationMode as OM,
+)
+from pymfm.control.algorithms import optimization_based as OptB
+
+# Constraints of the scheduling model depending on the forecast of their time step
+FORECAST_CONSTRAINTS = (
+    ("power_balance", OptB.power_balance, False),
+    ("deficit_case_1", OptB.deficit_case_1, False),
+    ("deficit_case_2", OptB.deficit_case_2, True),
+    ("surplus_case_1", OptB.surplus_case_1, False),
+    ("surplus_case_2", OptB.surplus_case_2, False),
+    ("pv_curtailment_constr", OptB.pv_curtailment_constr, False),
+)
+# Constraints of the scheduling model depending on a battery parameter (BatteryTable column),
+# with their index sets besides the battery and whether they are indexed by battery
+BATTERY_CONSTRAINTS = {
+    "initial_SoC": (("bat_init_SoC", OptB.bat_init_SoC, (), True),),
+    "final_SoC": (("bat_final_SoC", OptB.bat_final_SoC, (), True),),
+    "min_SoC": (("bat_min_SoC", OptB.bat_min_SoC, ("T_SoC_bat",), True),),
+    "max_SoC": (
+        ("bat_max_SoC", OptB.bat_max_SoC, ("T_SoC_bat",), True),
+        ("bat_final_SoC", OptB.bat_final_SoC, (), True),
+    ),
+    "bat_capacity_kWs": (("bat_charging", OptB.bat_charging, ("T",), True),),
+    "P_ch_max_kW": (("bat_max_ch_power", OptB.bat_max_ch_power, ("T",), True),),
+    "P_dis_max_kW": (("bat_max_dis_power", OptB.bat_max_dis_power, ("T",), True),),
+    "ch_efficiency": (
+        ("bat_charging", OptB.bat_charging, ("T",), True),
+        ("surplus_case_1", OptB.surplus_case_1, ("T",), False),
+        ("bulk_energy", OptB.bulk_energy, (), False),
+    ),
+    "dis_efficiency": (
+        ("bat_charging", OptB.bat_charging, ("T",), True),
+        ("bulk_energy", OptB.bulk_energy, (), False),
+    ),
+}
+# Model parameters of the battery parameters (see OptB.build_model)
+BATTERY_MODEL_PARAMETERS = {
+    "initial_SoC": "ini_SoC_bat",
+    "final_SoC": "final_SoC_bat",
+    "min_SoC": "min_SoC_bat",
+    "max_SoC": "max_SoC_bat",
+    "bat_capacity_kWs": "bat_capacity_kWs",
+    "P_ch_max_kW": "P_ch_bat_max_kW",
+    "P_dis_max_kW": "P_dis_bat_max_kW",
+    "ch_efficiency": "ch_eff_bat",
+    "dis_efficiency": "dis_eff_bat",
+}
+# Battery parameters which can be overridden (in BatterySpecs units, SoCs in %)
+BATTERY_OVERRIDES = (
+    "initial_SoC",
+    "final_SoC",
+    "min_SoC",
+    "max_SoC",
+    "bat_capacity_kWh",
+    "P_ch_max_kW",
+    "P_dis_max_kW",
+    "ch_efficiency",
+    "dis_efficiency",
+)
+# Override of the P_net_after_kW limitation profile
+LIMITATION_OVERRIDE = "P_net_after_kW_limitation"
+# Bound constraints rebuilt on a changed P_net_after_kW limitation, with their index set
+BOUND_CONSTRAINTS = (
+    ("P_net_after_kW_upper_bound", OptB.P_net_after_kW_upper_bound, "T_upper_bound"),
+    ("P_net_after_kW_lower_bound", OptB.P_net_after_kW_lower_bound, "T_lower_bound"),
+)
+
+
+def _rederive(constraint, rule, model, indices: List[tuple]):
+    """
+    Re-derive single indices of an indexed constraint from its rule.
+    Indices whose rule now returns Constraint.Feasible are removed, new ones are added.
+    A scalar constraint is re-derived with the empty index ().
+
+    :param constraint: The indexed (or scalar) pyomo constraint.
+    :param rule: The rule of the constraint.
+    :param model: The pyomo model.
+    :param indices: The indices (as tuples) to re-derive.
+    :return: None
+    """
+    if not constraint.is_indexed():
+        constraint.set_value(rule(model))
+        return
+    for index in indices:
+        key = index[0] if len(index) == 1 else index
+        expr = rule(model, *index)
+        if expr is Constraint.Feasible or expr is Constraint.Skip:
+            if key in constraint:
+                del constraint[key]
+        else:
+            constraint[key] = expr
+
+
+class SchedulingSession:
+    """
+    Running optimization based scheduling of one InputData, which accepts intraday forecast patches.
+    The forecast DataFrame, the battery table and the optimization model are built once. A patch updates them
+    in place and only re-derives the constraints of the changed time steps (and batteries). The solver
+    object is kept for the whole session, so persistent solver interfaces (e.g. appsi_highs) only
+    receive the changed constraints instead of the whole model.
+    """
+
+    def __init__(self, data: InputData, solver: str = None):
+        """
+        Prepare the input data and build the optimization model.
+
+        :param data: Optimization based scheduling InputData.
+        :param solver: Solver backend (optional, see pymfm.control.utils.solvers).
+        """
+        if (
+            data.control_logic != CL.OPTIMIZATION_BASED
+            or data.operation_mode != OM.SCHEDULING
+        ):
+            raise ValueError(
+                "Scheduling sessions are only available for optimization based scheduling."
+            )
+        self.data = data
+        self.df_forecasts = data_input.generation_and_load_to_df(
+            data.generation_and_load, start=data.uc_start, end=data.uc_end
+        )
+        self.P_net_after_kW_limits = data_input.P_net_after_kW_lim_to_df(
+            data.P_net_after_kW_limitation, data.generation_and_load
+        )
+        self.battery_table = data_input.battery_to_table(
+            data_input.input_prep(data.battery_specs)
+        )
+        self.model = OptB.build_model(
+            self.df_forecasts,
+            self.battery_table,
+            data.day_end,
+            data.bulk,
+            self.P_net_after_kW_limits,
+            data.generation_and_load.pv_curtailment,
+        )
+        self._solver, self._backend = solvers.get_solver(solver)
+        # Battery table of the InputData, the base of apply_overrides
+        self._input_battery_table = self.battery_table
+
+    def apply_patch(self, patch: ForecastPatch) -> pd.DatetimeIndex:
+        """
+        Apply a forecast patch to the cached forecast, battery table and the optimization model.
+
+        :param patch: The changed generation and load values and/or new initial SoCs (in %).
+        :return: The time steps whose forecast changed.
+        """
+        model = self.model
+        changed = pd.DatetimeIndex([])
+        if patch.values:
+            values = pd.DataFrame(
+                {
+                    "P_gen_kW": [value.P_gen_kW for value in patch.values],
+                    "P_load_kW": [value.P_load_kW for value in patch.values],
+                },
+                index=pd.DatetimeIndex([value.timestamp for value in patch.values]),
+            )
+            outside = values.index.difference(self.df_forecasts.index)
+            if len(outside) > 0:
+                raise ValueError(
+                    f"forecast patch timestamps {list(outside)} lie outside of the session horizon "
+                    f"{self.df_forecasts.index[0]} to {self.df_forecasts.index[-1]}"
+                )
+            current = self.df_forecasts.loc[values.index, ["P_gen_kW", "P_load_kW"]]
+            changed = values.index[(current != values).any(axis=1).to_numpy()]
+            values = values.loc[changed]
+            self.df_forecasts.loc[changed, ["P_gen_kW", "P_load_kW"]] = values.to_numpy()
+            # The model parameters are Series of the optimization horizon
+            model.P_load_kW.loc[changed] = values.P_load_kW
+            model.P_PV_limit_kW.loc[changed] = values.P_gen_kW
+            model.P_net_before_kW.loc[changed] = values.P_load_kW - values.P_gen_kW
+            for name, rule, per_battery in FORECAST_CONSTRAINTS:
+                if per_battery:
+                    indices = [(n, t) for n in model.N for t in changed]
+                else:
+                    indices = [(t,) for t in changed]
+                _rederive(getattr(model, name), rule, model, indices)
+
+        if patch.initial_SoC:
+            batteries = {str(n): n for n in self.battery_table.index}
+            unknown = set(patch.initial_SoC).difference(batteries)
+            if unknown:
+                raise ValueError(f"forecast patch refers to unknown batteries {sorted(unknown)}")
+            initial_SoCs = self.battery_table.initial_SoC.copy()
+            for battery_id, initial_SoC in patch.initial_SoC.items():
+                initial_SoCs[self.battery_table.position(batteries[battery_id])] = (
+                    initial_SoC / 100
+                )
+            self.battery_table = self.battery_table.with_column("initial_SoC", initial_SoCs)
+            model.ini_SoC_bat = self.battery_table.mapping("initial_SoC")
+            _rederive(
+                model.bat_init_SoC,
+                OptB.bat_init_SoC,
+                model,
+                [(batteries[battery_id],) for battery_id in patch.initial_SoC],
+            )
+        return changed
+
+    def apply_overrides(self, overrides: dict) -> List[str]:
+        """
+        Override battery parameters and/or the P_net_after_kW limitation profile in the
+        optimization model, e.g. for a sizing study. Only the model parameters and constraints
+        depending on a changed value are updated. Overrides are relative to the InputData of the
+        session: parameters not given are reset to their input values (including initial SoCs
+        set by a forecast patch).
+
+        :param overrides: Dictionary of battery parameters (see BATTERY_OVERRIDES, in BatterySpecs
+            units with SoCs in %) applied to all batteries, and/or the LIMITATION_OVERRIDE, a list of
+            P_net_after_kWLimitation (None for no limitation).
+        :return: The names of the changed parameters.
+        """
+        unknown = set(overrides).difference(BATTERY_OVERRIDES + (LIMITATION_OVERRIDE,))
+        if unknown:
+            raise ValueError(
+                f"unknown overrides {sorted(unknown)}, use {', '.join(BATTERY_OVERRIDES)} or {LIMITATION_OVERRIDE}"
+            )
+        model = self.model
+        changed = []
+
+        battery_table = self._input_battery_table
+        n_batteries = len(battery_table)
+        for name in BATTERY_OVERRIDES:
+            if name not in overrides:
+                continue
+            value = overrides[name]
+            if name.endswith("_SoC") and value is not None:
+                value = value / 100
+            if name == "bat_capacity_kWh":
+                battery_table = battery_table.with_column(
+                    "bat_capacity_kWs", np.full(n_batteries, value * 3600)
+                )
+            battery_table = battery_table.with_column(
+                name, np.full(n_batteries, np.nan if value is None else value)
+            )
+        limitation = overrides.get(LIMITATION_OVERRIDE, self.data.P_net_after_kW_limitation)
+        limits = data_input.P_net_after_kW_lim_to_df(limitation, self.data.generation_and_load)
+
+        rederive = {}
+        for column, constraints in BATTERY_CONSTRAINTS.items():
+            if np.array_equal(
+                getattr(battery_table, column),
+                getattr(self.battery_table, column),
+                equal_nan=True,
+            ):
+                continue
+            changed.append(column)
+            for name, rule, sets, per_battery in constraints:
+                # Optional constraints (e.g. bulk_energy without a bulk window) are not built
+                if model.component(name) is not None:
+                    rederive[name] = (rule, sets, per_battery)
+        if "bat_capacity_kWs" in changed:
+            changed.append("bat_capacity_kWh")
+        if not limits.equals(self.P_net_after_kW_limits):
+            changed.append(LIMITATION_OVERRIDE)
+
+        # If a constraint cannot be rebuilt, the parameters and constraints of the session are restored
+        try:
+            self._set_battery_parameters(battery_table, rederive)
+            if LIMITATION_OVERRIDE in changed:
+                self._set_limits(limits)
+        except Exception:
+            self._set_battery_parameters(self.battery_table, rederive)
+            self._set_limits(self.P_net_after_kW_limits)
+            raise
+        self.battery_table = battery_table
+        self.P_net_after_kW_limits = limits
+        return changed
+
+    def _set_battery_parameters(self, battery_table: data_input.BatteryTable, rederive: dict):
+        """
+        Set the battery parameters of the optimization model and re-derive their constraints.
+
+        :param battery_table: The battery table to set.
+        :param rederive: Dictionary of the constraint names to re-derive and their rule, index sets
+            besides the battery and whether they are indexed by battery.
+        :return: None
+        """
+        model = self.model
+        for column, parameter in BATTERY_MODEL_PARAMETERS.items():
+            setattr(model, parameter, battery_table.mapping(column))
+        for name, (rule, sets, per_battery) in rederive.items():
+            indices = list(itertools.product(*(getattr(model, s) for s in sets)))
+            if per_battery:
+                indices = [(n, *index) for n in model.N for index in indices]
+            _rederive(getattr(model, name), rule, model, indices)
+
+    def _set_limits(self, limits: pd.DataFrame):
+        """
+        Set the P_net_after_kW limitation of the optimization model and rebuild its bound constraints.
+
+        :param limits: The P_net_after_kW limits DataFrame (see data_input.P_net_after_kW_lim_to_df).
+        :return: None
+        """
+        model = self.model
+        opt_horizon = pd.DatetimeIndex(model.T, freq=model.dT)
+        arrays = data_input.P_net_after_kW_lim_to_arrays(limits, opt_horizon)
+        model.upper_bound_kW = pd.Series(arrays["upper_bound"], index=opt_horizon)
+        model.lower_bound_kW = pd.Series(arrays["lower_bound"], index=opt_horizon)
+        model.with_upper_bound = pd.Series(arrays["with_upper_bound"], index=opt_horizon)
+        model.with_lower_bound = pd.Series(arrays["with_lower_bound"], index=opt_horizon)
+        model.T_upper_bound = tuple(opt_horizon[arrays["with_upper_bound"]])
+        model.T_lower_bound = tuple(opt_horizon[arrays["with_lower_bound"]])
+        # The bounded time steps index the bound constraints, so these are rebuilt
+        for name, rule, index_set in BOUND_CONSTRAINTS:
+            model.del_component(name)
+            model.del_component(f"{name}_index")
+            model.add_component(name, Constraint(getattr(model, index_set), rule=rule))
+
+    def solve(self, options: dict = None) -> Tuple[dict, pd.DataFrame, tuple]:
+        """
+        Solve the (patched) scheduling optimization model.
+
+        :param options: Solver options overriding the defaults of the backend (optional).
+        :return: Tuple containing mode logic information, output DataFrame, and solver status
+            (as returned by mode_logic_handler).
+        """
+        data = self.data
+        feasibility_check.check_feasibility(
+            self.df_forecasts,
+            self.battery_table,
+            data.day_end,
+            data.bulk,
+            self.P_net_after_kW_limits,
+            data.generation_and_load.pv_curtailment,
+        )
+        results = self._solver.solve(
+            self.model, options={**self._backend.options, **(options or {})}
+        )
+        (
+            P_net_after_kW,
+            PV_profile,
+            P_bat_kW_df,
+            P_bat_total_kW,
+            SoC_bat_df,
+            upper_bound_kW,
+            lower_bound_kW,
+            solver_status,
+        ) = OptB.extract_results(self.model, self.battery_table, results.solver)
+        output_df = OptB.prep_output_df(
+            P_net_after_kW,
+            PV_profile,
+            P_bat_kW_df,
+            P_bat_total_kW,
+            SoC_bat_df,
+            self.df_forecasts,
+            upper_bound_kW,
+            lower_bound_kW,
+        )
+        mode_logic = {
+            "ID": data.id,
+            "CL": data.control_logic,
+            "OM": data.operation_mode,
+        }
+        return mode_logic, output_df, solver_status
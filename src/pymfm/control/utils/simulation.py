@@ -0,0 +1,353 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+import numpy as np
+import pandas as pd
+from pymfm.control.utils.data_input import PreparedBattery
+
+try:
+    # Optional dependency compiling the simulation kernel (pip install pymfm[simulation])
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Number of time steps simulated at once by simulate_near_real_time
+CHUNK_SIZE = 86400
+# SoC deviation (in p.u.) from the SoC limits not counted as violation, absorbing rounding errors
+SOC_TOLERANCE = 1e-9
+# Key performance indicators of a near real-time control simulation
+KPI_COLUMNS = [
+    "steps",
+    "grid_import_kWh",
+    "grid_export_kWh",
+    "peak_import_kW",
+    "peak_export_kW",
+    "deviation_steps",
+    "deviation_kWh",
+    "SoC_violation_steps",
+    "final_SoC_%",
+]
+
+
+def _near_real_time_kernel(
+    P_deviation_kW,
+    bat_Energy_kWh,
+    delta_T_h,
+    P_dis_max_kW,
+    P_ch_max_kW,
+    bat_min_Energy_kWh,
+    bat_max_Energy_kWh,
+    ch_efficiency,
+    dis_efficiency,
+    P_bat_kW,
+    bat_Energy_out_kWh,
+    P_net_after_kW,
+):
+    """
+    The rule based near real-time control (see rule_based.near_real_time) of consecutive time
+    steps, carrying the battery energy from one step to the next. Written on scalars only, so it
+    can be compiled with numba.
+
+    :param P_deviation_kW: Measured minus requested net power of every time step in kW.
+    :param bat_Energy_kWh: The battery energy at the start of the first time step in kWh.
+    :param P_bat_kW: Output array of the battery power in kW (charging: positive).
+    :param bat_Energy_out_kWh: Output array of the battery energy after every time step in kWh.
+    :param P_net_after_kW: Output array of the net power after control in kW.
+    :return: The battery energy after the last time step in kWh.
+    """
+    for t in range(len(P_deviation_kW)):
+        bat_initial_Energy_kWh = bat_Energy_kWh
+        import_kW = 0.0
+        export_kW = 0.0
+        P_kW = P_deviation_kW[t]
+        if P_kW > 0:
+            bat_Energy_kWh = bat_initial_Energy_kWh - dis_efficiency * P_kW * delta_T_h
+            P_kW = P_kW / dis_efficiency
+        else:
+            bat_Energy_kWh = bat_initial_Energy_kWh - P_kW * delta_T_h / ch_efficiency
+            P_kW = P_kW * ch_efficiency
+        # discharging
+        if P_kW > 0:
+            act_ptcb = P_kW
+            if abs(P_kW) >= P_dis_max_kW:
+                import_kW = P_kW - P_dis_max_kW
+                P_kW = P_dis_max_kW
+                bat_Energy_kWh = (
+                    bat_initial_Energy_kWh - dis_efficiency * P_dis_max_kW * delta_T_h
+                )
+            if bat_Energy_kWh < bat_min_Energy_kWh:
+                import_kW = import_kW + (bat_min_Energy_kWh - bat_Energy_kWh) / delta_T_h
+                P_kW = act_ptcb - import_kW
+                bat_Energy_kWh = bat_min_Energy_kWh
+        # charging
+        if P_kW < 0:
+            act_ptcb = P_kW
+            if abs(P_kW) <= P_ch_max_kW:
+                export_kW = 0.0
+            else:
+                export_kW = abs(P_kW) - P_ch_max_kW
+                P_kW = -P_ch_max_kW
+                bat_Energy_kWh = (
+                    bat_initial_Energy_kWh + P_ch_max_kW * delta_T_h / ch_efficiency
+                )
+            if bat_Energy_kWh > bat_max_Energy_kWh:
+                export_kW = export_kW + (bat_Energy_kWh - bat_max_Energy_kWh) / delta_T_h
+                P_kW = -(abs(act_ptcb) - export_kW)
+                bat_Energy_kWh = bat_max_Energy_kWh
+        P_bat_kW[t] = -P_kW
+        bat_Energy_out_kWh[t] = bat_Energy_kWh
+        P_net_after_kW[t] = import_kW - export_kW
+    return bat_Energy_kWh
+
+
+if njit is not None:
+    _compiled_kernel = njit(cache=True)(_near_real_time_kernel)
+else:
+    _compiled_kernel = None
+
+
+class NearRealTimeSimulation:
+    """
+    Closed-loop replay of the rule based near real-time control (see rule_based.near_real_time)
+    over measurement arrays. The battery energy is carried from one call of run to the next and the
+    key performance indicators (see KPI_COLUMNS) are accumulated, so long measurement series can be
+    streamed through in chunks.
+    """
+
+    def __init__(self, battery_specs: PreparedBattery, delta_T_h: float):
+        """
+        :param battery_specs: The battery specifications (as prepared by input_prep).
+        :param delta_T_h: The time step of the measurements in hours.
+        """
+        self.battery_specs = battery_specs
+        self.delta_T_h = float(delta_T_h)
+        self.bat_Energy_kWh = battery_specs.initial_SoC * battery_specs.bat_capacity_kWh
+        self._kpis = dict.fromkeys(KPI_COLUMNS, 0.0)
+        self._kpis["steps"] = 0
+        self._kpis["deviation_steps"] = 0
+        self._kpis["SoC_violation_steps"] = 0
+        self._kpis["final_SoC_%"] = battery_specs.initial_SoC * 100
+
+    @property
+    def SoC(self) -> float:
+        """
+        The current SoC of the battery in p.u.
+        """
+        return self.bat_Energy_kWh / self.battery_specs.bat_capacity_kWh
+
+    def run(
+        self,
+        P_net_meas_kW: Union[np.ndarray, pd.Series],
+        P_req_kW: Union[np.ndarray, pd.Series, float] = 0.0,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Simulate the next time steps.
+
+        :param P_net_meas_kW: The measured net power of every time step in kW.
+        :param P_req_kW: The requested net power of every time step (or of all steps) in kW.
+        :return: Dictionary of the arrays "P_bat_kW" (charging: positive), "SoC_bat_%" after every
+            time step, "P_net_after_kW" (net power after control as returned by near_real_time)
+            and "P_grid_kW" (resulting grid power, measured net power plus battery power).
+        """
+        P_net_meas_kW = np.asarray(P_net_meas_kW, dtype=float)
+        P_deviation_kW = P_net_meas_kW - np.asarray(P_req_kW, dtype=float)
+        n_steps = len(P_deviation_kW)
+        P_bat_kW = np.empty(n_steps)
+        bat_Energy_kWh = np.empty(n_steps)
+        P_net_after_kW = np.empty(n_steps)
+
+        battery = self.battery_specs
+        parameters = (
+            self.delta_T_h,
+            float(battery.P_dis_max_kW),
+            float(battery.P_ch_max_kW),
+            float(battery.min_SoC * battery.bat_capacity_kWh),
+            float(battery.max_SoC * battery.bat_capacity_kWh),
+            float(battery.ch_efficiency),
+            float(battery.dis_efficiency),
+        )
+        if _compiled_kernel is not None:
+            self.bat_Energy_kWh = _compiled_kernel(
+                P_deviation_kW,
+                float(self.bat_Energy_kWh),
+                *parameters,
+                P_bat_kW,
+                bat_Energy_kWh,
+                P_net_after_kW,
+            )
+        else:
+            # Python floats are much faster to iterate over than NumPy scalars
+            self.bat_Energy_kWh = _near_real_time_kernel(
+                P_deviation_kW.tolist(),
+                float(self.bat_Energy_kWh),
+                *parameters,
+                P_bat_kW,
+                bat_Energy_kWh,
+                P_net_after_kW,
+            )
+
+        SoC_bat = bat_Energy_kWh / battery.bat_capacity_kWh
+        P_grid_kW = P_net_meas_kW + P_bat_kW
+        self._accumulate(SoC_bat, P_net_after_kW, P_grid_kW)
+        return {
+            "P_bat_kW": P_bat_kW,
+            "SoC_bat_%": SoC_bat * 100,
+            "P_net_after_kW": P_net_after_kW,
+            "P_grid_kW": P_grid_kW,
+        }
+
+    def _accumulate(
+        self, SoC_bat: np.ndarray, P_net_after_kW: np.ndarray, P_grid_kW: np.ndarray
+    ):
+        """
+        Add the time steps of a run to the key performance indicators.
+        """
+        if len(P_grid_kW) == 0:
+            return
+        kpis = self._kpis
+        kpis["steps"] += len(P_grid_kW)
+        kpis["grid_import_kWh"] += np.clip(P_grid_kW, 0, None).sum() * self.delta_T_h
+        kpis["grid_export_kWh"] += np.clip(-P_grid_kW, 0, None).sum() * self.delta_T_h
+        kpis["peak_import_kW"] = max(kpis["peak_import_kW"], P_grid_kW.max())
+        kpis["peak_export_kW"] = max(kpis["peak_export_kW"], -P_grid_kW.min())
+        deviating = P_net_after_kW != 0
+        kpis["deviation_steps"] += int(deviating.sum())
+        kpis["deviation_kWh"] += np.abs(P_net_after_kW).sum() * self.delta_T_h
+        kpis["SoC_violation_steps"] += int(
+            (
+                (SoC_bat < self.battery_specs.min_SoC - SOC_TOLERANCE)
+                | (SoC_bat > self.battery_specs.max_SoC + SOC_TOLERANCE)
+            ).sum()
+        )
+        kpis["final_SoC_%"] = SoC_bat[-1] * 100
+
+    def kpis(self) -> Dict[str, float]:
+        """
+        The key performance indicators of all time steps simulated so far.
+
+        :return: Dictionary of the KPI_COLUMNS: the number of simulated steps, imported and
+            exported grid energy in kWh, peak grid import and export in kW, number of steps and
+            energy in kWh in which the requested net power could not be followed, number of
+            steps with the SoC outside of its limits and the final SoC in %.
+        """
+        return {
+            key: value if isinstance(value, int) else float(value)
+            for key, value in self._kpis.items()
+        }
+
+
+def simulate_near_real_time(
+    measurements: Iterable[Tuple[np.ndarray, np.ndarray]],
+    battery_specs: PreparedBattery,
+    delta_T_h: float,
+) -> Iterator[Dict[str, float]]:
+    """
+    Stream chunks of measurements through the near real-time control simulation.
+
+    :param measurements: Iterable of tuples of measured and requested net power arrays in kW.
+    :param battery_specs: The battery specifications (as prepared by input_prep).
+    :param delta_T_h: The time step of the measurements in hours.
+    :return: Iterator over the key performance indicators (see NearRealTimeSimulation.kpis)
+        of all time steps simulated so far, after every chunk.
+    """
+    simulation = NearRealTimeSimulation(battery_specs, delta_T_h)
+    for P_net_meas_kW, P_req_kW in measurements:
+        simulation.run(P_net_meas_kW, P_req_kW)
+        yield simulation.kpis()
+
+
+def measurement_chunks(
+    P_net_meas_kW: np.ndarray, P_req_kW: np.ndarray, chunk_size: int = CHUNK_SIZE
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Split measured and requested net power arrays into chunks (see simulate_near_real_time).
+    """
+    P_req_kW = np.broadcast_to(np.asarray(P_req_kW, dtype=float), np.shape(P_net_meas_kW))
+    for start in range(0, len(P_net_meas_kW), chunk_size):
+        yield (
+            P_net_meas_kW[start : start + chunk_size],
+            P_req_kW[start : start + chunk_size],
+        )
+
+
+# Measurements of the simulate_parameter_sets worker processes
+_worker_measurements = {}
+
+
+def _init_worker(P_net_meas_kW: np.ndarray, P_req_kW: np.ndarray, delta_T_h: float):
+    """
+    Pool initializer passing the measurements to a worker process once.
+    """
+    _worker_measurements.update(
+        P_net_meas_kW=P_net_meas_kW, P_req_kW=P_req_kW, delta_T_h=delta_T_h
+    )
+
+
+def _simulate_parameter_set(battery_specs: PreparedBattery) -> Dict[str, float]:
+    """
+    Pool worker simulating the measurements with one parameter set.
+    """
+    kpis = {}
+    for kpis in simulate_near_real_time(
+        measurement_chunks(
+            _worker_measurements["P_net_meas_kW"], _worker_measurements["P_req_kW"]
+        ),
+        battery_specs,
+        _worker_measurements["delta_T_h"],
+    ):
+        pass
+    return kpis
+
+
+def simulate_parameter_sets(
+    P_net_meas_kW: Union[np.ndarray, pd.Series],
+    P_req_kW: Union[np.ndarray, pd.Series, float],
+    parameter_sets: List[PreparedBattery],
+    delta_T_h: float,
+    processes: int = None,
+) -> pd.DataFrame:
+    """
+    Simulate the near real-time control of the same measurements with several battery
+    parameter sets, in parallel processes.
+
+    :param P_net_meas_kW: The measured net power of every time step in kW.
+    :param P_req_kW: The requested net power of every time step (or of all steps) in kW.
+    :param parameter_sets: The battery specifications (as prepared by input_prep) to simulate,
+        e.g. variations of one battery created with dataclasses.replace.
+    :param delta_T_h: The time step of the measurements in hours.
+    :param processes: The number of worker processes (optional, defaults to the number of CPUs).
+        With one process the parameter sets are simulated in this process.
+    :return: DataFrame with the key performance indicators (see KPI_COLUMNS) of every parameter set.
+    """
+    P_net_meas_kW = np.asarray(P_net_meas_kW, dtype=float)
+    P_req_kW = np.broadcast_to(np.asarray(P_req_kW, dtype=float), P_net_meas_kW.shape)
+    initargs = (P_net_meas_kW, np.ascontiguousarray(P_req_kW), float(delta_T_h))
+    if processes == 1 or len(parameter_sets) == 1:
+        _init_worker(*initargs)
+        rows = [_simulate_parameter_set(battery) for battery in parameter_sets]
+    else:
+        with Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+            rows = pool.map(_simulate_parameter_set, parameter_sets)
+    return pd.DataFrame(rows, columns=KPI_COLUMNS)
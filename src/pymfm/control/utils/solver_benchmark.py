@@ -0,0 +1,166 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import argparse
+import os
+import time
+from typing import List
+import pandas as pd
+from pyomo.core import value
+from pymfm.control.utils import data_input, solvers
+from pymfm.control.utils.data_input import InputData, open_json, ControlLogic as CL
+from pymfm.control.algorithms import optimization_based as OptB
+
+
+def benchmark_input(data: dict, solver: str) -> dict:
+    """
+    Build and solve one scheduling optimization input with one solver backend.
+
+    :param data: The loaded JSON data of an optimization based InputData.
+    :param solver: The solver backend name.
+    :return: Dictionary with build and solve time in seconds, objective, gap and solver status,
+        or the error message of a failed run.
+    """
+    row = {}
+    try:
+        _run_input(data, solver, row)
+    except Exception as error:
+        row["error"] = str(error)
+    return row
+
+
+def _run_input(data: dict, solver: str, row: dict):
+    """
+    Build and solve one scheduling optimization input, filling the benchmark row step by step.
+
+    :param data: The loaded JSON data of an optimization based InputData.
+    :param solver: The solver backend name.
+    :param row: The benchmark row to fill.
+    :return: None
+    """
+    input_data = InputData(**data)
+    battery_specs = data_input.input_prep(input_data.battery_specs)
+    df_forecasts = data_input.generation_and_load_to_df(
+        input_data.generation_and_load, start=input_data.uc_start, end=input_data.uc_end
+    )
+    P_net_after_kW_limits = data_input.P_net_after_kW_lim_to_df(
+        input_data.P_net_after_kW_limitation, input_data.generation_and_load
+    )
+    battery_table = data_input.battery_to_table(battery_specs)
+
+    start = time.perf_counter()
+    model = OptB.build_model(
+        df_forecasts,
+        battery_table,
+        input_data.day_end,
+        input_data.bulk,
+        P_net_after_kW_limits,
+        input_data.generation_and_load.pv_curtailment,
+    )
+    row["build_time_s"] = time.perf_counter() - start
+
+    row["interface"] = solvers.solver_interface(solver)
+    start = time.perf_counter()
+    results = solvers.solve(model, solver)
+    row["solve_time_s"] = time.perf_counter() - start
+
+    row["objective"] = value(model.obj, exception=False)
+    row["gap"] = solvers.relative_gap(results)
+    row["status"] = str(results.solver.status)
+    row["termination_condition"] = str(results.solver.termination_condition)
+
+
+def benchmark(input_directory: str, solver_names: List[str] = None) -> pd.DataFrame:
+    """Run every optimization based InputData JSON file of a directory with every solver backend.
+
+    Parameters
+    ----------
+    input_directory : str
+        Directory containing the InputData JSON files. Files with another control logic are skipped.
+    solver_names : List[str], optional
+        Solver backends to compare, by default all backends available on this machine.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per input file and solver with build time, solve time, objective, gap and status.
+        Runs that failed are reported with their error message.
+    """
+    if solver_names is None:
+        solver_names = solvers.available_solvers()
+
+    rows = []
+    for filename in sorted(os.listdir(input_directory)):
+        if not filename.endswith(".json"):
+            continue
+        data = open_json(os.path.join(input_directory, filename))
+        if data.get("control_logic") != CL.OPTIMIZATION_BASED:
+            continue
+        for solver in solver_names:
+            rows.append(
+                {"input": filename, "solver": solver, **benchmark_input(data, solver)}
+            )
+
+    columns = [
+        "input",
+        "solver",
+        "interface",
+        "build_time_s",
+        "solve_time_s",
+        "objective",
+        "gap",
+        "status",
+        "termination_condition",
+        "error",
+    ]
+    return pd.DataFrame(rows).reindex(columns=columns)
+
+
+def main():
+    """
+    Command line entry point of the solver benchmark, e.g.
+    python -m pymfm.control.utils.solver_benchmark inputs/ --solvers gurobi scip
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scheduling optimization on InputData files across solver backends."
+    )
+    parser.add_argument("input_directory", help="Directory containing InputData JSON files.")
+    parser.add_argument(
+        "--solvers",
+        nargs="+",
+        default=None,
+        help=f"Solver backends to compare (default: all available of {', '.join(solvers.SOLVER_BACKENDS)}).",
+    )
+    parser.add_argument("--output", default=None, help="Optional CSV file for the results.")
+    args = parser.parse_args()
+
+    results = benchmark(args.input_directory, args.solvers)
+    print(results.to_string(index=False))
+    if args.output is not None:
+        results.to_csv(args.output, index=False)
+        print(f"Benchmark results saved under: {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import math
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Tuple
+from pyomo.environ import SolverFactory
+from pyomo.opt import SolverResults
+
+
+# Environment variable selecting the solver backend of a deployment
+SOLVER_ENV_VARIABLE = "PYMFM_SOLVER"
+# Solver backend used if neither the call nor the environment selects one
+DEFAULT_SOLVER = "gurobi"
+
+
+@dataclass(frozen=True)
+class SolverBackend:
+    """
+    A solver backend consisting of its registry name, the Pyomo solver interfaces
+    that can run it (in order of preference) and default solver options.
+    """
+
+    name: str  # The registry name of the backend.
+    interfaces: Tuple[str, ...]  # Pyomo SolverFactory names, most preferred first.
+    options: Dict[str, object] = field(default_factory=dict)  # Default solver options.
+    time_limit_option: str = None  # Name of the solver option limiting the solve time in seconds.
+
+
+# Registry of the known solver backends
+SOLVER_BACKENDS: Dict[str, SolverBackend] = {}
+
+
+def register_solver(
+    name: str,
+    interfaces: Tuple[str, ...],
+    options: dict = None,
+    time_limit_option: str = None,
+):
+    """
+    Register (or replace) a solver backend.
+
+    :param name: The registry name of the backend.
+    :param interfaces: Pyomo SolverFactory names able to run the backend, most preferred first.
+    :param options: Default solver options passed on every solve (optional).
+    :param time_limit_option: Name of the solver option limiting the solve time in seconds (optional).
+    :return: The registered SolverBackend.
+    """
+    backend = SolverBackend(
+        name, tuple(interfaces), dict(options or {}), time_limit_option
+    )
+    SOLVER_BACKENDS[name] = backend
+    return backend
+
+
+# Gurobi (gurobipy) and SCIP are able to solve the bilinear (MIQCP) scheduling model.
+# The linear MILP solvers HiGHS, CBC and GLPK are registered for models without bilinear terms.
+# In-process interfaces come first: they pass the model to the solver library in memory, whereas
+# the shell interfaces write an LP file, start a solver process and parse its solution file.
+register_solver("gurobi", ("gurobi_direct", "gurobi"), time_limit_option="TimeLimit")
+register_solver("scip", ("scip",), time_limit_option="limits/time")
+register_solver("highs", ("appsi_highs",), time_limit_option="time_limit")
+register_solver("cbc", ("cbc",), time_limit_option="sec")
+register_solver("glpk", ("glpk",), time_limit_option="tmlim")
+
+
+@lru_cache(maxsize=None)
+def _interface_available(interface: str) -> bool:
+    """
+    Check (once per process) whether a Pyomo solver interface is available.
+
+    :param interface: The Pyomo SolverFactory name.
+    :return: True if the interface can be used.
+    """
+    try:
+        return bool(SolverFactory(interface).available(exception_flag=False))
+    except Exception:
+        return False
+
+
+def solver_name(name: str = None) -> str:
+    """
+    Resolve the solver backend name of a call.
+
+    :param name: The backend requested by the call (optional).
+    :return: The requested backend, else the one of the PYMFM_SOLVER environment variable, else gurobi.
+    """
+    if name is None:
+        name = os.environ.get(SOLVER_ENV_VARIABLE, DEFAULT_SOLVER)
+    if name not in SOLVER_BACKENDS:
+        raise ValueError(
+            f"Unknown solver backend '{name}'. Registered backends are: {', '.join(SOLVER_BACKENDS)}"
+        )
+    return name
+
+
+def available_solvers() -> List[str]:
+    """
+    List the registered solver backends that can be used on this machine.
+
+    :return: Names of the available solver backends.
+    """
+    return [
+        name
+        for name, backend in SOLVER_BACKENDS.items()
+        if any(_interface_available(interface) for interface in backend.interfaces)
+    ]
+
+
+def solver_interface(name: str = None) -> str:
+    """
+    Select the Pyomo interface of a solver backend, preferring in-process over shell interfaces.
+
+    :param name: The backend name (optional, see solver_name).
+    :return: The most preferred available Pyomo SolverFactory name of the backend.
+    """
+    backend = SOLVER_BACKENDS[solver_name(name)]
+    for interface in backend.interfaces:
+        if _interface_available(interface):
+            return interface
+    raise RuntimeError(
+        f"Solver backend '{backend.name}' is not available. "
+        f"None of its interfaces ({', '.join(backend.interfaces)}) could be found."
+    )
+
+
+def get_solver(name: str = None):
+    """
+    Create the Pyomo solver of a solver backend using its most preferred available interface.
+
+    :param name: The backend name (optional, see solver_name).
+    :return: Tuple of the Pyomo solver object and its SolverBackend.
+    """
+    backend = SOLVER_BACKENDS[solver_name(name)]
+    return SolverFactory(solver_interface(backend.name)), backend
+
+
+def solve(model, name: str = None, options: dict = None) -> SolverResults:
+    """
+    Solve a Pyomo model with a registered solver backend.
+
+    :param model: The pyomo model.
+    :param name: The backend name (optional, see solver_name).
+    :param options: Solver options overriding the defaults of the backend (optional).
+    :return: The Pyomo solver results.
+    """
+    optimization_solver, backend = get_solver(name)
+    solver_options = {**backend.options, **(options or {})}
+    return optimization_solver.solve(model, options=solver_options)
+
+
+def time_limit_options(seconds: float, name: str = None) -> dict:
+    """
+    Solver options limiting the solve time of a solver backend. On the time limit the
+    solvers stop and report the best feasible solution found so far (if any).
+
+    :param seconds: The time limit in seconds.
+    :param name: The backend name (optional, see solver_name).
+    :return: The solver options, to be passed to solve.
+    """
+    backend = SOLVER_BACKENDS[solver_name(name)]
+    if backend.time_limit_option is None:
+        raise ValueError(f"Solver backend '{backend.name}' has no time limit option.")
+    if backend.time_limit_option == "tmlim":
+        # GLPK only accepts whole seconds
+        seconds = max(1, int(seconds))
+    return {backend.time_limit_option: seconds}
+
+
+def relative_gap(results) -> float:
+    """
+    Calculate the relative MIP gap reported by the solver.
+
+    :param results: The Pyomo solver results.
+    :return: The relative gap, NaN if the solver did not report both bounds.
+    """
+    lower_bound = results.problem.lower_bound
+    upper_bound = results.problem.upper_bound
+    if lower_bound is None or upper_bound is None:
+        return math.nan
+    lower_bound, upper_bound = float(lower_bound), float(upper_bound)
+    if math.isinf(lower_bound) or math.isinf(upper_bound):
+        return math.nan
+    return abs(upper_bound - lower_bound) / max(abs(upper_bound), 1e-10)
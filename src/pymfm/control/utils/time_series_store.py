@@ -0,0 +1,272 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import List
+import numpy as np
+import pandas as pd
+from pymfm.control.utils.data_input import (
+    GenerationAndLoad,
+    generation_and_load_values_from_arrays,
+)
+
+# File with the store layout (start, step, length and columns)
+STORE_INFO = "store.json"
+# Default columns of a generation and load forecast store
+FORECAST_COLUMNS = ("P_gen_kW", "P_load_kW")
+# Initial number of time steps allocated per column
+INITIAL_CAPACITY = 1024
+
+
+def _to_epoch(timestamp) -> int:
+    """
+    Nanoseconds since epoch of a timestamp, naive timestamps are taken as UTC.
+    """
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize("UTC")
+    return timestamp.value
+
+
+class TimeSeriesStore:
+    """
+    On-disk columnar store of fixed-step float64 time series.
+    Every column is a memory-mapped .npy file and the time index is given by the epoch based
+    start and step in store.json, so windows are sliced with O(1) seeks and without parsing the files.
+    Time steps never written are NaN.
+    """
+
+    def __init__(
+        self, directory: str, step: pd.Timedelta = None, columns: List[str] = FORECAST_COLUMNS
+    ):
+        """
+        Open the store in a directory, creating it if it does not exist.
+
+        :param directory: The store directory.
+        :param step: The time step of the time series, needed to create a store.
+        :param columns: The column names of a new store, by default the generation and load forecast columns.
+        """
+        self.directory = directory
+        info_path = os.path.join(directory, STORE_INFO)
+        if os.path.exists(info_path):
+            with open(info_path) as info_file:
+                info = json.load(info_file)
+            if step is not None and pd.Timedelta(step).value != info["step"]:
+                raise ValueError(
+                    f"the store in {directory} has the time step {pd.Timedelta(info['step'])}, not {pd.Timedelta(step)}"
+                )
+        else:
+            if step is None:
+                raise ValueError(f"no store in {directory}, a time step is needed to create one")
+            os.makedirs(directory, exist_ok=True)
+            info = {
+                "start": None,
+                "step": pd.Timedelta(step).value,
+                "length": 0,
+                "capacity": 0,
+                "columns": list(columns),
+            }
+            self._info = info
+            self._write_info()
+        # Opening an existing store does not write, so readers can open it concurrently
+        self._info = info
+
+    @property
+    def step(self) -> pd.Timedelta:
+        """The time step of the time series."""
+        return pd.Timedelta(self._info["step"])
+
+    @property
+    def columns(self) -> List[str]:
+        """The column names."""
+        return list(self._info["columns"])
+
+    @property
+    def start(self) -> pd.Timestamp:
+        """The first timestamp (UTC), None for an empty store."""
+        if self._info["start"] is None:
+            return None
+        return pd.Timestamp(self._info["start"], tz="UTC")
+
+    @property
+    def end(self) -> pd.Timestamp:
+        """The last timestamp (UTC), None for an empty store."""
+        if self._info["start"] is None:
+            return None
+        return self.start + (len(self) - 1) * self.step
+
+    def __len__(self) -> int:
+        return self._info["length"]
+
+    def _path(self, column: str) -> str:
+        return os.path.join(self.directory, f"{column}.npy")
+
+    def _write_info(self):
+        # Replace the info file atomically, after the column data has been flushed. The temporary
+        # file is unique, so concurrent writers never rename each other's file.
+        descriptor, temporary_path = tempfile.mkstemp(
+            prefix=STORE_INFO, suffix=".tmp", dir=self.directory
+        )
+        try:
+            with os.fdopen(descriptor, "w") as info_file:
+                json.dump(self._info, info_file, indent=4)
+            os.chmod(temporary_path, 0o644)
+            os.replace(temporary_path, os.path.join(self.directory, STORE_INFO))
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+    def _reallocate(self, shift: int, capacity: int):
+        """
+        Move the columns into new files of a larger capacity, shifting them by a number of time steps.
+        """
+        for column in self.columns:
+            array = np.lib.format.open_memmap(
+                self._path(column) + ".tmp", mode="w+", dtype="<f8", shape=(capacity,)
+            )
+            array[:] = np.nan
+            if self._info["capacity"] > 0:
+                old = np.load(self._path(column), mmap_mode="r")
+                array[shift : shift + len(self)] = old[: len(self)]
+                del old
+            array.flush()
+            del array
+            os.replace(self._path(column) + ".tmp", self._path(column))
+        self._info["capacity"] = capacity
+
+    def append(self, df: pd.DataFrame):
+        """
+        Write a time series into the store. Time steps already in the store are overwritten,
+        gaps to the stored time steps stay NaN. Only the columns of the store are written.
+
+        :param df: Time series with a DatetimeIndex on the time step grid of the store.
+        :return: None
+        """
+        if len(df) == 0:
+            return
+        step = self._info["step"]
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is None:
+            index = index.tz_localize("UTC")
+        epochs = index.asi8
+        if self._info["start"] is None:
+            self._info["start"] = int(epochs[0])
+        offsets = epochs - self._info["start"]
+        if np.any(offsets % step):
+            raise ValueError(
+                f"timestamps are not on the time step grid of the store (step {self.step}, start {self.start})"
+            )
+        positions = offsets // step
+
+        # Grow the store to the front (shifting the stored time steps) and/or to the back
+        shift = int(max(0, -positions.min()))
+        length = max(len(self) + shift, int(positions.max()) + shift + 1)
+        if shift > 0 or length > self._info["capacity"]:
+            capacity = max(INITIAL_CAPACITY, self._info["capacity"])
+            while capacity < length:
+                capacity *= 2
+            self._reallocate(shift, capacity)
+            self._info["start"] -= shift * step
+            positions = positions + shift
+
+        for column in self.columns:
+            if column not in df:
+                continue
+            array = np.load(self._path(column), mmap_mode="r+")
+            array[positions] = df[column].to_numpy(dtype=float)
+            array.flush()
+            del array
+        self._info["length"] = length
+        self._write_info()
+
+    def window(self, start: datetime = None, end: datetime = None) -> pd.DataFrame:
+        """Slice a window of the stored time series.
+
+        Parameters
+        ----------
+        start : datetime, optional
+            First timestamp of the window (naive timestamps are UTC), by default the store start.
+        end : datetime, optional
+            Last timestamp of the window (inclusive), by default the store end.
+
+        Returns
+        -------
+        pd.DataFrame
+            The time series of the window on its regular UTC index (with its freq set).
+            Time steps outside of the stored range are NaN.
+        """
+        if self._info["start"] is None:
+            raise ValueError(f"the store in {self.directory} is empty")
+        step = self._info["step"]
+        first = 0 if start is None else -(-(_to_epoch(start) - self._info["start"]) // step)
+        last = len(self) - 1 if end is None else (_to_epoch(end) - self._info["start"]) // step
+        n_steps = max(0, last - first + 1)
+        index = pd.date_range(
+            pd.Timestamp(self._info["start"] + first * step, tz="UTC"),
+            periods=n_steps,
+            freq=self.step,
+            name="timestamp",
+        )
+        # Part of the window within the stored time steps
+        stored_first, stored_last = max(first, 0), min(last, len(self) - 1)
+        data = {}
+        for column in self.columns:
+            values = np.full(n_steps, np.nan)
+            if stored_first <= stored_last:
+                array = np.load(self._path(column), mmap_mode="r")
+                values[stored_first - first : stored_last - first + 1] = array[
+                    stored_first : stored_last + 1
+                ]
+                del array
+            data[column] = values
+        return pd.DataFrame(data, index=index)
+
+    def to_generation_and_load(
+        self, start: datetime, end: datetime, pv_curtailment: bool = None
+    ) -> GenerationAndLoad:
+        """
+        Slice a window of a generation and load forecast store as GenerationAndLoad of an InputData.
+
+        :param start: First timestamp of the window.
+        :param end: Last timestamp of the window (inclusive).
+        :param pv_curtailment: PV curtailment of the GenerationAndLoad (optional).
+        :return: The GenerationAndLoad (values not validated row by row, see InputData.from_trusted_json).
+        """
+        window = self.window(start, end)
+        missing = window[["P_gen_kW", "P_load_kW"]].isna().any(axis=1)
+        if missing.any():
+            raise ValueError(
+                f"the store has no generation and load data for {int(missing.sum())} time steps "
+                f"between {window.index[0]} and {window.index[-1]}"
+            )
+        return GenerationAndLoad(pv_curtailment=pv_curtailment, values=[]).copy(
+            update={
+                "values": generation_and_load_values_from_arrays(
+                    window.index, window.P_gen_kW, window.P_load_kW
+                )
+            }
+        )
@@ -0,0 +1,248 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Callable, Tuple
+import numpy as np
+import pandas as pd
+from pymfm.control.utils import data_output
+from pymfm.control.utils.data_input import InputData
+
+# Available binary wire formats (both optional dependencies, pip install pymfm[binary])
+WIRE_FORMATS = ("msgpack", "cbor")
+# Keys marking the packed values
+RECORDS = "~records"  # List of records with the same keys, stored column by column
+COLUMNS = "~columns"
+FLOATS = "~f8"  # Little-endian float64 array
+TIMESTAMPS = "~ts"  # Little-endian int64 array of microseconds since epoch
+TIMESTAMP = "~t"  # Single timestamp as microseconds since epoch
+UTC_OFFSET = "~tz"  # UTC offset of the timestamps in seconds (None for naive timestamps)
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _codec(wire_format: str) -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    """
+    Get the encoder and decoder of a wire format.
+
+    :param wire_format: The wire format, see WIRE_FORMATS.
+    :return: Tuple of the encode and decode functions.
+    """
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(
+            f"unknown wire format '{wire_format}', use one of {', '.join(WIRE_FORMATS)}"
+        )
+    try:
+        if wire_format == "msgpack":
+            import msgpack
+
+            return (
+                lambda obj: msgpack.packb(obj, use_bin_type=True),
+                lambda payload: msgpack.unpackb(payload, raw=False),
+            )
+        import cbor2
+
+        return cbor2.dumps, cbor2.loads
+    except ImportError as error:
+        raise ImportError(
+            f"The {wire_format} wire format requires the optional {error.name} package "
+            "(pip install pymfm[binary])."
+        ) from error
+
+
+def _utc_offset(timestamp: datetime):
+    """
+    UTC offset of a timestamp in seconds, None for naive timestamps.
+    """
+    offset = timestamp.utcoffset()
+    return None if offset is None else int(offset.total_seconds())
+
+
+def _to_microseconds(timestamp: datetime) -> int:
+    """
+    Microseconds since epoch of a timestamp.
+    """
+    epoch = EPOCH if timestamp.tzinfo is None else EPOCH_UTC
+    return (timestamp - epoch) // timedelta(microseconds=1)
+
+
+def _from_microseconds(microseconds: int, utc_offset) -> datetime:
+    """
+    Timestamp from microseconds since epoch and its UTC offset in seconds.
+    """
+    if utc_offset is None:
+        return EPOCH + timedelta(microseconds=microseconds)
+    tz = timezone.utc if utc_offset == 0 else timezone(timedelta(seconds=utc_offset))
+    return (EPOCH_UTC + timedelta(microseconds=microseconds)).astimezone(tz)
+
+
+def _pack_column(column: list):
+    """
+    Pack the values of one record column, as float or timestamp array where possible.
+    """
+    if all(isinstance(value, float) for value in column):
+        return {FLOATS: np.asarray(column, dtype="<f8").tobytes()}
+    if all(isinstance(value, datetime) for value in column):
+        offsets = {_utc_offset(value) for value in column}
+        if len(offsets) == 1:
+            return {
+                TIMESTAMPS: np.asarray(
+                    [_to_microseconds(value) for value in column], dtype="<i8"
+                ).tobytes(),
+                UTC_OFFSET: offsets.pop(),
+            }
+    return [pack(value) for value in column]
+
+
+def pack(obj):
+    """
+    Convert a JSON like structure (with datetimes) into its compact form for the binary wire formats.
+    Lists of records with the same keys are stored column by column, float columns as packed float64
+    and timestamps as integer microseconds since epoch.
+
+    :param obj: The structure of dicts, lists, strings, numbers, None and datetimes.
+    :return: The packed structure.
+    """
+    if isinstance(obj, dict):
+        return {key: pack(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        if (
+            len(obj) > 0
+            and all(isinstance(row, dict) for row in obj)
+            and all(row.keys() == obj[0].keys() for row in obj)
+        ):
+            keys = list(obj[0].keys())
+            return {
+                RECORDS: keys,
+                COLUMNS: [_pack_column([row[key] for row in obj]) for key in keys],
+            }
+        return [pack(value) for value in obj]
+    if isinstance(obj, datetime):
+        return {TIMESTAMP: _to_microseconds(obj), UTC_OFFSET: _utc_offset(obj)}
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (float, np.floating)):
+        return float(obj)
+    if isinstance(obj, np.integer):
+        return int(obj)
+    return obj
+
+
+def unpack(obj):
+    """
+    Restore a structure converted by pack.
+
+    :param obj: The packed structure.
+    :return: The structure of dicts, lists, strings, numbers, None and datetimes.
+    """
+    if isinstance(obj, dict):
+        if RECORDS in obj:
+            columns = [unpack(column) for column in obj[COLUMNS]]
+            return [dict(zip(obj[RECORDS], row)) for row in zip(*columns)]
+        if FLOATS in obj:
+            return np.frombuffer(obj[FLOATS], dtype="<f8").tolist()
+        if TIMESTAMPS in obj:
+            utc_offset = obj[UTC_OFFSET]
+            index = pd.to_datetime(
+                np.frombuffer(obj[TIMESTAMPS], dtype="<i8").astype(np.int64),
+                unit="us",
+                utc=utc_offset is not None,
+            )
+            if utc_offset:
+                index = index.tz_convert(timezone(timedelta(seconds=utc_offset)))
+            return list(index.to_pydatetime())
+        if TIMESTAMP in obj:
+            return _from_microseconds(obj[TIMESTAMP], obj[UTC_OFFSET])
+        return {key: unpack(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [unpack(value) for value in obj]
+    return obj
+
+
+def encode_input(data: InputData, wire_format: str = "msgpack") -> bytes:
+    """
+    Encode InputData in a binary wire format.
+
+    :param data: The InputData.
+    :param wire_format: The wire format, see WIRE_FORMATS.
+    :return: The encoded InputData.
+    """
+    encode, _ = _codec(wire_format)
+    return encode(pack(data.dict(by_alias=True, exclude_unset=True)))
+
+
+def decode_input(
+    payload: bytes, wire_format: str = "msgpack", trusted: bool = False
+) -> InputData:
+    """
+    Decode InputData from a binary wire format.
+
+    :param payload: The encoded InputData.
+    :param wire_format: The wire format, see WIRE_FORMATS.
+    :param trusted: If true, the rows are not validated one by one (see InputData.from_trusted_json).
+    :return: The InputData.
+    """
+    _, decode = _codec(wire_format)
+    data = unpack(decode(payload))
+    if trusted:
+        return InputData.from_trusted_json(data)
+    return InputData(**data)
+
+
+def encode_output(
+    mode_logic: dict, output_df: pd.DataFrame, wire_format: str = "msgpack"
+) -> bytes:
+    """
+    Encode the control output (near real-time output dictionary or scheduling results) in a binary wire format.
+
+    :param mode_logic: The mode logic information.
+    :param output_df: The control output data (dictionary for near real-time).
+    :param wire_format: The wire format, see WIRE_FORMATS.
+    :return: The encoded output.
+    """
+    encode, _ = _codec(wire_format)
+    return encode(
+        pack(data_output.output_to_dict(mode_logic, output_df, format_timestamps=False))
+    )
+
+
+def decode_output(payload: bytes, wire_format: str = "msgpack") -> dict:
+    """
+    Decode the control output from a binary wire format into the structure of the output JSON files
+    (see pymfm.control.utils.data_output.output_to_dict).
+
+    :param payload: The encoded output.
+    :param wire_format: The wire format, see WIRE_FORMATS.
+    :return: The output data with the timestamps formatted as in the output JSON files.
+    """
+    _, decode = _codec(wire_format)
+    output = unpack(decode(payload))
+    operation_mode = output["operation_mode"]
+    for key in ("timestamp", "uc_start", "uc_end"):
+        if key in output:
+            output[key] = data_output.format_timestamp(output[key], operation_mode)
+    for row in output.get("results", []):
+        row["timestamp"] = data_output.format_timestamp(row["timestamp"], operation_mode)
+    return output
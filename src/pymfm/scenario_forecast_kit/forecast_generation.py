@@ -24,7 +24,9 @@
 import json
 import os
 from datetime import datetime, timedelta
+import pandas as pd
 from scipy import interpolate
+from pymfm.control.utils.time_series_store import TimeSeriesStore
 
 
 def calc_load_scaling_factor(households, avg_consumption):
@@ -69,19 +71,29 @@ def calc_total_load(slp_value, dynamic_factor, load_scaling_factor):
     return dynamic_load
 
 
-def generate_forecast(input_folder_path, output_folder_path, time_resolution):
+def generate_forecast(
+    input_folder_path, output_folder_path, time_resolution, store_directory=None
+):
     """
     Generate a forecast based on input JSON files and save the results in the output folder.
 
     :param input_folder_path: Path to the folder containing input JSON files.
     :param output_folder_path: Path to the folder where output JSON files will be saved.
     :param time_resolution: Time resolution in minutes for the forecast.
+    :param store_directory: Directory of a TimeSeriesStore the forecasts are appended to (optional).
     :return: A list of forecast data for each input file.
     """
     # Create the output folder if it doesn't exist
     if not os.path.exists(output_folder_path):
         os.makedirs(output_folder_path)
 
+    # Open (or create) the historical time series store
+    store = None
+    if store_directory is not None:
+        store = TimeSeriesStore(
+            store_directory, step=pd.Timedelta(minutes=time_resolution)
+        )
+
     # Output scenario list
     forecast_list = []
 
@@ -169,6 +181,14 @@ def generate_forecast(input_folder_path, output_folder_path, time_resolution):
             # Add output data of the input file to the output scenario list
             forecast_list.append(output_data)
 
+            # Append the forecast to the historical time series store
+            if store is not None:
+                forecast_df = pd.DataFrame(generation_and_load).set_index("timestamp")
+                forecast_df.index = pd.to_datetime(
+                    forecast_df.index, format="%Y-%m-%dT%H:%M:%S.%fZ"
+                )
+                store.append(forecast_df)
+
             # The output file name
             # Get the start date of the forecast
             start_date = datetime.strptime(
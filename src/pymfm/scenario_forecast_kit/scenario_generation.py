@@ -25,23 +25,14 @@ import json
 import os
 
 
-def generate_scenario(forecast_input_file, scenario_input_file, output_file):
+def merge_scenario(forecast_data, scenario_data):
     """
-    Generate a scenario JSON file by merging information from two input JSON files.
+    Merge the information of a forecast and a scenario into the data of one scenario.
 
-    :param forecast_input_file: Path to the forecast input JSON file.
-    :param scenario_input_file: Path to the scenario input JSON file.
-    :param output_file: Path to the output JSON file to save the merged scenario.
-    :return: None
+    :param forecast_data: The loaded forecast JSON data.
+    :param scenario_data: The loaded scenario JSON data.
+    :return: The merged scenario data as a dictionary.
     """
-    # Read the content of the first input JSON file
-    with open(forecast_input_file, "r") as file1:
-        forecast_data = json.load(file1)
-
-    # Read the content of the second input JSON file
-    with open(scenario_input_file, "r") as file2:
-        scenario_data = json.load(file2)
-
     # Extract the required information from each dictionary
     id_data = scenario_data["id"]
     app_data = forecast_data["application"]
@@ -112,6 +103,28 @@ def generate_scenario(forecast_input_file, scenario_input_file, output_file):
     if P_net_after_kW_data:
         new_data["P_net_after_kW_limitation"] = P_net_after_kW_data
 
+    return new_data
+
+
+def generate_scenario(forecast_input_file, scenario_input_file, output_file):
+    """
+    Generate a scenario JSON file by merging information from two input JSON files.
+
+    :param forecast_input_file: Path to the forecast input JSON file.
+    :param scenario_input_file: Path to the scenario input JSON file.
+    :param output_file: Path to the output JSON file to save the merged scenario.
+    :return: None
+    """
+    # Read the content of the first input JSON file
+    with open(forecast_input_file, "r") as file1:
+        forecast_data = json.load(file1)
+
+    # Read the content of the second input JSON file
+    with open(scenario_input_file, "r") as file2:
+        scenario_data = json.load(file2)
+
+    new_data = merge_scenario(forecast_data, scenario_data)
+
     # Convert the new dictionary to a JSON string
     new_json_string = json.dumps(new_data, indent=4)
 
@@ -121,3 +134,65 @@ def generate_scenario(forecast_input_file, scenario_input_file, output_file):
     # Get the absolute file path of the generated .json file
     absolute_output_file_path = os.path.abspath(output_file)
     print(f"Scenario file generated and saved under: {absolute_output_file_path}")
+
+
+def generate_stochastic_scenario(
+    forecast_input_files, probabilities, scenario_input_file, output_file
+):
+    """
+    Generate a stochastic scenario JSON file with one forecast scenario per forecast input file.
+
+    The first forecast file is the expected forecast and provides generation_and_load.
+    Forecast files of other days (e.g. historical analog days) are mapped onto the timestamps
+    of the first forecast, which requires all forecasts to have the same number of values.
+
+    :param forecast_input_files: Paths to the forecast input JSON files, one per scenario.
+    :param probabilities: The probability of each scenario (summing up to 1).
+    :param scenario_input_file: Path to the scenario input JSON file.
+    :param output_file: Path to the output JSON file to save the merged scenario.
+    :return: None
+    """
+    if len(forecast_input_files) != len(probabilities):
+        raise ValueError(
+            "Exactly one probability has to be given per forecast input file."
+        )
+
+    forecasts = []
+    for forecast_input_file in forecast_input_files:
+        with open(forecast_input_file, "r") as file:
+            forecasts.append(json.load(file))
+    with open(scenario_input_file, "r") as file:
+        scenario_data = json.load(file)
+
+    new_data = merge_scenario(forecasts[0], scenario_data)
+
+    # Map every forecast onto the timestamps of the expected forecast
+    timestamps = [entry["timestamp"] for entry in forecasts[0]["generation_and_load"]]
+    forecast_scenarios = []
+    for forecast_input_file, forecast, probability in zip(
+        forecast_input_files, forecasts, probabilities
+    ):
+        values = forecast["generation_and_load"]
+        if len(values) != len(timestamps):
+            raise ValueError(
+                f"Forecast '{forecast_input_file}' has {len(values)} values, expected {len(timestamps)}."
+            )
+        forecast_scenarios.append(
+            {
+                "probability": probability,
+                "values": [
+                    {**entry, "timestamp": timestamp}
+                    for entry, timestamp in zip(values, timestamps)
+                ],
+            }
+        )
+    new_data["forecast_scenarios"] = forecast_scenarios
+
+    # Write the JSON string to the output file
+    with open(output_file, "w") as json_file:
+        json_file.write(json.dumps(new_data, indent=4))
+    # Get the absolute file path of the generated .json file
+    absolute_output_file_path = os.path.abspath(output_file)
+    print(
+        f"Stochastic scenario file with {len(forecast_scenarios)} forecast scenarios generated and saved under: {absolute_output_file_path}"
+    )
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+
+def _battery_dict(**fields):
+    return {
+        "bat_type": "cbes",
+        "initial_SoC": 50,
+        "P_dis_max_kW": 10,
+        "P_ch_max_kW": 10,
+        "min_SoC": 10,
+        "max_SoC": 90,
+        "bat_capacity_kWh": 40,
+        "ch_efficiency": 1,
+        "dis_efficiency": 1,
+        **fields,
+    }
+
+
+def _input_dict(
+    timestamps=None,
+    P_gen_kW=0.0,
+    P_load_kW=1.0,
+    control_logic="optimization_based",
+    **fields,
+):
+    if timestamps is None:
+        timestamps = pd.date_range(
+            "2021-04-01", "2021-04-01 23:45", freq="15min", tz="UTC"
+        )
+    timestamps = [pd.Timestamp(timestamp).isoformat() for timestamp in timestamps]
+    n_steps = len(timestamps)
+    P_gen_kW = pd.Series(P_gen_kW, index=range(n_steps), dtype=float).tolist()
+    P_load_kW = pd.Series(P_load_kW, index=range(n_steps), dtype=float).tolist()
+    return {
+        "id": "test",
+        "application": "pymfm",
+        "control_logic": control_logic,
+        "operation_mode": "scheduling",
+        "uc_start": "2021-04-01T00:00:00Z",
+        "uc_end": "2021-04-01T23:45:00Z",
+        "generation_and_load": {
+            "values": [
+                {"timestamp": timestamp, "P_gen_kW": gen, "P_load_kW": load}
+                for timestamp, gen, load in zip(timestamps, P_gen_kW, P_load_kW)
+            ]
+        },
+        "battery_specs": _battery_dict(),
+        **fields,
+    }
+
+
+@pytest.fixture
+def battery_dict():
+    """Factory of BatterySpecs dictionaries of a 40 kWh cbes, fields can be overridden."""
+    return _battery_dict
+
+
+@pytest.fixture
+def input_dict():
+    """
+    Factory of scheduling InputData dictionaries of 2021-04-01 (15 min steps by default).
+    P_gen_kW and P_load_kW are scalars or sequences over the timestamps, other fields can be overridden.
+    """
+    return _input_dict
@@ -0,0 +1,78 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+from pymfm.control.utils.backtest import backtest, day_input, read_checkpoint
+from pymfm.control.utils.data_input import InputData
+from pymfm.control.utils.time_series_store import TimeSeriesStore
+
+
+def forecast_store(directory):
+    index = pd.date_range("2021-01-01", "2021-12-31 23:45", freq="15min", tz="UTC")
+    store = TimeSeriesStore(str(directory), pd.Timedelta("15min"))
+    store.append(
+        pd.DataFrame(
+            {"P_gen_kW": np.zeros(len(index)), "P_load_kW": np.ones(len(index))},
+            index=index,
+        )
+    )
+    return store
+
+
+def test_day_input_derives_the_sunset_day_end_of_every_day(tmp_path, input_dict):
+    store = forecast_store(tmp_path)
+    template = InputData(**input_dict(control_logic="rule_based"))
+
+    # Berlin sunsets at about 19:33 UTC in June and 14:54 UTC in December
+    assert day_input(template, date(2021, 6, 21), store).day_end == pd.Timestamp(
+        "2021-06-21T19:30:00Z"
+    )
+    assert day_input(template, date(2021, 12, 21), store).day_end == pd.Timestamp(
+        "2021-12-21T15:00:00Z"
+    )
+
+
+def test_day_input_shifts_a_given_day_end(tmp_path, input_dict):
+    store = forecast_store(tmp_path)
+    template = InputData(
+        **input_dict(control_logic="rule_based", day_end="2021-04-01T18:00:00Z")
+    )
+
+    assert day_input(template, date(2021, 12, 21), store).day_end == pd.Timestamp(
+        "2021-12-21T18:00:00Z"
+    )
+
+
+def test_backtest_retries_days_without_input(tmp_path, input_dict):
+    store = TimeSeriesStore(str(tmp_path / "store"), pd.Timedelta("15min"))
+    index = pd.date_range("2021-04-01", "2021-04-02 23:45", freq="15min", tz="UTC")
+    forecast = pd.DataFrame(
+        {"P_gen_kW": np.zeros(len(index)), "P_load_kW": np.ones(len(index))},
+        index=index,
+    )
+    store.append(forecast)
+    template = InputData(**input_dict(control_logic="rule_based"))
+    checkpoint_file = str(tmp_path / "checkpoint.jsonl")
+
+    def run():
+        return backtest(
+            template,
+            str(tmp_path / "store"),
+            date(2021, 4, 1),
+            date(2021, 4, 3),
+            control_logics=("rule_based",),
+            checkpoint_file=checkpoint_file,
+            processes=2,
+        )
+
+    results = run()
+    assert results.status.tolist() == ["optimal", "optimal", "error"]
+    # The day without forecast is not checkpointed as finished
+    assert sorted(row["day"] for row in read_checkpoint(checkpoint_file)) == [
+        "2021-04-01",
+        "2021-04-02",
+    ]
+
+    store.append(forecast.set_axis(forecast.index + pd.Timedelta(days=2)))
+    results = run()
+    assert results.status.tolist() == ["optimal"] * 3
+    assert len(read_checkpoint(checkpoint_file)) == 3
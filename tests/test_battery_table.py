@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pymfm.control.utils import data_input
+from pymfm.control.utils.data_input import BatterySpecs, BatteryTable
+
+
+def test_battery_types_are_kept_in_full(battery_dict):
+    battery_table = data_input.battery_to_table(
+        data_input.input_prep(
+            [
+                BatterySpecs(**battery_dict(id="bat_1", bat_type="hbes_2")),
+                BatterySpecs(**battery_dict(id="bat_2", bat_type="hbes")),
+            ]
+        )
+    )
+    assert battery_table.bat_type.tolist() == ["hbes_2", "hbes"]
+    assert battery_table.is_hbes.tolist() == [False, True]
+
+
+def fleet(battery_dict):
+    return data_input.input_prep(
+        [
+            BatterySpecs(**battery_dict(id="bat_1", final_SoC=80)),
+            BatterySpecs(**battery_dict(id="bat_2", bat_type="hbes", max_SoC=95)),
+            BatterySpecs(**battery_dict(id="bat_3", bat_capacity_kWh=10)),
+        ]
+    )
+
+
+def test_battery_table_matches_battery_df(battery_dict):
+    batteries = fleet(battery_dict)
+    battery_table = data_input.battery_to_table(batteries)
+
+    pd.testing.assert_frame_equal(battery_table.to_df(), data_input.battery_to_df(batteries))
+    assert list(BatteryTable.from_df(battery_table.to_df())) == list(battery_table)
+    assert list(battery_table) == batteries
+    assert battery_table.position("bat_3") == 2
+    # Household batteries have to reach max_SoC as soon as any battery has a final SoC
+    assert battery_table.with_final_SoC.tolist() == [True, True, False]
+    final_SoC = battery_table.mapping("final_SoC")
+    assert final_SoC["bat_1"] == 0.8 and final_SoC["bat_3"] is None
+    assert final_SoC["bat_2"] is not None
+    assert battery_table.mapping("bat_capacity_kWs")["bat_3"] == 36000.0
+
+
+def test_battery_table_columns(battery_dict):
+    batteries = fleet(battery_dict)
+    battery_table = data_input.battery_to_table(batteries)
+    float32_table = data_input.battery_to_table(batteries, dtype=np.float32)
+
+    assert float32_table.dtype == np.float32
+    float_nbytes = battery_table.nbytes - battery_table.bat_type.nbytes
+    assert float32_table.nbytes - float32_table.bat_type.nbytes == float_nbytes // 2
+
+    next_table = battery_table.with_column("initial_SoC", [0.2, 0.3, 0.4])
+    assert next_table.initial_SoC.tolist() == [0.2, 0.3, 0.4]
+    assert battery_table.initial_SoC.tolist() == [0.5, 0.5, 0.5]
+    assert next_table.index == battery_table.index
+
+    with pytest.raises(ValueError, match="unique"):
+        BatteryTable(["bat_1", "bat_1"], ["cbes", "cbes"], {})
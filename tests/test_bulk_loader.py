@@ -0,0 +1,68 @@
+import json
+import numpy as np
+from pymfm.control.utils import bulk_loader
+from pymfm.control.utils.data_input import InputData
+from pymfm.control.utils.mode_logic_handler import mode_logic_handler
+
+P_GEN_KW = np.repeat([0.0, 10.0, 0.0], [32, 40, 24])
+
+
+def write_inputs(path, inputs):
+    with open(path, "w") as jsonl_file:
+        for data in inputs:
+            jsonl_file.write(json.dumps(data) + "\n")
+        # Near real-time requests without generation_and_load are skipped
+        jsonl_file.write(json.dumps({"id": "near_real_time"}) + "\n")
+
+
+def test_shared_series_round_trip(tmp_path, input_dict):
+    inputs = [
+        input_dict(id="community_1", P_gen_kW=P_GEN_KW, P_load_kW=2.0),
+        input_dict(id="community_2", P_gen_kW=P_GEN_KW, P_load_kW=np.linspace(1, 3, 96)),
+    ]
+    write_inputs(tmp_path / "inputs.jsonl", inputs)
+
+    with bulk_loader.SharedSeriesStore() as store:
+        bulk_inputs = bulk_loader.load_bulk(str(tmp_path / "inputs.jsonl"), store)
+        assert [bulk_input.name for bulk_input in bulk_inputs] == [
+            "inputs.jsonl:1",
+            "inputs.jsonl:2",
+        ]
+        # The timestamps and the PV forecast are shared by both inputs
+        assert len(store) == 4
+        assert store.nbytes == 4 * 96 * 8
+        assert bulk_inputs[0].P_gen_kW == bulk_inputs[1].P_gen_kW
+
+        for bulk_input, data in zip(bulk_inputs, inputs):
+            shared = bulk_loader.to_input_data(bulk_input)
+            expected = InputData(**data)
+            assert shared.id == expected.id
+            assert shared.generation_and_load.timestamps().equals(
+                expected.generation_and_load.timestamps()
+            )
+            assert [
+                (value.P_gen_kW, value.P_load_kW) for value in shared.generation_and_load.values
+            ] == [
+                (value.P_gen_kW, value.P_load_kW) for value in expected.generation_and_load.values
+            ]
+            assert not bulk_loader.attach(bulk_input.P_load_kW).flags.writeable
+
+
+def test_run_bulk_matches_single_runs(tmp_path, input_dict):
+    inputs = [
+        input_dict(
+            id=f"community_{i}", control_logic="rule_based", P_gen_kW=P_GEN_KW * i, P_load_kW=2.0
+        )
+        for i in range(1, 4)
+    ]
+    write_inputs(tmp_path / "inputs.jsonl", inputs)
+
+    results = bulk_loader.run_bulk(str(tmp_path / "inputs.jsonl"), processes=2)
+
+    assert len(results) == 3
+    for (_, mode_logic, output_df, _), data in zip(results, inputs):
+        expected_mode_logic, expected_df, _ = mode_logic_handler(InputData(**data))
+        assert mode_logic["ID"] == expected_mode_logic["ID"]
+        np.testing.assert_allclose(
+            output_df.to_numpy(dtype=float), expected_df.to_numpy(dtype=float)
+        )
@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+from pymfm.control.utils import data_input
+from pymfm.control.utils.data_input import InputData
+
+
+def irregular_timestamps():
+    grid = pd.date_range("2021-04-01", "2021-04-01 23:45", freq="15min", tz="UTC")
+    timestamps = list(grid)
+    # Jitter around sunset, a duplicate, a gap and unordered rows
+    timestamps[70] += pd.Timedelta(seconds=7)
+    timestamps[71] -= pd.Timedelta(seconds=9)
+    timestamps.insert(20, timestamps[20])
+    del timestamps[50]
+    timestamps[30], timestamps[40] = timestamps[40], timestamps[30]
+    return grid, timestamps
+
+
+def test_limits_and_day_end_lie_on_the_regular_index(input_dict):
+    grid, timestamps = irregular_timestamps()
+    data = InputData(
+        **input_dict(
+            timestamps,
+            P_net_after_kW_limitation=[
+                {"timestamp": "2021-04-01T00:00:04Z", "upper_bound": 50, "lower_bound": -50},
+                {"timestamp": "2021-04-01T00:00:00Z", "upper_bound": 60, "lower_bound": -60},
+                {"timestamp": "2021-04-01T00:14:58Z", "upper_bound": 40},
+            ],
+        )
+    )
+
+    limits = data_input.P_net_after_kW_lim_to_df(
+        data.P_net_after_kW_limitation, data.generation_and_load
+    )
+    assert limits.index.equals(grid.rename("timestamp"))
+    assert limits.upper_bound.iloc[:2].tolist() == [60.0, 40.0]
+    assert limits.with_lower_bound.iloc[:2].tolist() == [True, False]
+    # The optimization horizon alignment needs unique timestamps
+    arrays = data_input.P_net_after_kW_lim_to_arrays(limits, grid)
+    assert arrays["with_upper_bound"].sum() == 2
+
+    assert data.day_end in grid
+    df_forecasts = data_input.generation_and_load_to_df(
+        data.generation_and_load, start=data.uc_start, end=data.uc_end
+    )
+    assert data.day_end in df_forecasts.index
+
+
+def test_given_day_end_is_moved_to_the_regular_index(input_dict):
+    _, timestamps = irregular_timestamps()
+    data = InputData(**input_dict(timestamps, day_end="2021-04-01T18:00:06Z"))
+    assert data.day_end == pd.Timestamp("2021-04-01T18:00:00Z")
+
+
+def test_forecast_scenarios_require_generation_and_load(input_dict):
+    data = input_dict()
+    data["forecast_scenarios"] = [
+        {"probability": 1.0, "values": data.pop("generation_and_load")["values"]}
+    ]
+    with pytest.raises(ValidationError, match="require generation_and_load"):
+        InputData(**data)
+
+
+def test_regularization_report_is_logged(input_dict, caplog, capsys):
+    _, timestamps = irregular_timestamps()
+    data = InputData(**input_dict(timestamps))
+    with caplog.at_level("DEBUG", logger="pymfm.control.utils.data_input"):
+        df_forecasts = data_input.generation_and_load_to_df(data.generation_and_load)
+    assert not df_forecasts.attrs["quality_report"].is_regular
+    assert "regularized" in caplog.text
+    assert capsys.readouterr().out == ""
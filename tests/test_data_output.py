@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pymfm.control.utils import data_output
+from pymfm.control.utils.data_input import InputData
+from pymfm.control.utils.mode_logic_handler import mode_logic_handler
+
+
+@pytest.fixture
+def scheduling_output(input_dict):
+    return mode_logic_handler(
+        InputData(
+            **input_dict(
+                control_logic="rule_based",
+                P_gen_kW=np.repeat([0.0, 10.0, 0.0], [32, 40, 24]),
+                P_load_kW=2.0,
+            )
+        )
+    )[:2]
+
+
+@pytest.mark.parametrize("layout", data_output.OUTPUT_LAYOUTS)
+@pytest.mark.parametrize("regular", [True, False])
+def test_output_round_trip(scheduling_output, layout, regular):
+    mode_logic, output_df = scheduling_output
+    if not regular:
+        output_df = output_df.drop(output_df.index[[10, 50]])
+
+    payload = data_output.output_to_json(mode_logic, output_df, layout)
+    read_mode_logic, read_df = data_output.read_output_json(payload)
+
+    assert read_mode_logic == {key: mode_logic[key] for key in ("ID", "CL", "OM")}
+    # The rule based output columns are of object dtype, the read columns are float
+    pd.testing.assert_frame_equal(
+        read_df, output_df, check_freq=False, check_names=False, check_dtype=False
+    )
+
+
+def test_columns_layout_is_compact(scheduling_output):
+    mode_logic, output_df = scheduling_output
+    output = data_output.output_to_dict(mode_logic, output_df, layout="columns")
+
+    assert output["step_s"] == 900.0
+    assert "timestamps" not in output
+    assert len(data_output.output_to_json(mode_logic, output_df, "columns")) < len(
+        data_output.output_to_json(mode_logic, output_df, "records")
+    ) / 2
+    with pytest.raises(ValueError, match="unknown output layout 'rows'"):
+        data_output.output_to_dict(mode_logic, output_df, layout="rows")
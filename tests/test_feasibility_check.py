@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pymfm.control.utils import data_input, feasibility_check
+from pymfm.control.utils.data_input import InputData
+from pymfm.control.utils.feasibility_check import InfeasibleInputError
+
+# With a load of 2 kW: 8 kW surplus from 08:00 to 17:45, 2 kW deficit otherwise
+P_GEN_KW = [0.0] * 32 + [10.0] * 40 + [0.0] * 24
+
+
+def check(data):
+    feasibility_check.check_feasibility(
+        data_input.generation_and_load_to_df(
+            data.generation_and_load, start=data.uc_start, end=data.uc_end
+        ),
+        data_input.battery_to_table(data_input.input_prep(data.battery_specs)),
+        data.day_end,
+        data.bulk,
+        data_input.P_net_after_kW_lim_to_df(
+            data.P_net_after_kW_limitation, data.generation_and_load
+        ),
+        data.generation_and_load.pv_curtailment,
+    )
+
+
+def test_soc_envelopes(input_dict):
+    data = InputData(**input_dict(P_gen_kW=P_GEN_KW, P_load_kW=2.0))
+    df_forecasts = data_input.generation_and_load_to_df(data.generation_and_load)
+    battery_table = data_input.battery_to_table(data_input.input_prep(data.battery_specs))
+
+    lower, upper, soc_increase, soc_decrease = feasibility_check.soc_envelopes(
+        df_forecasts, battery_table, pd.Timedelta("15min")
+    )
+
+    # 15 min of min(10 kW, 8 kW surplus) and of 10 kW into 40 kWh
+    np.testing.assert_allclose(soc_increase[0], np.repeat([0.0, 0.05, 0.0], [32, 40, 24]))
+    np.testing.assert_allclose(soc_decrease[0], 0.0625)
+    np.testing.assert_allclose(upper[0, :33], 0.5)
+    np.testing.assert_allclose(upper[0, 33:41], 0.5 + 0.05 * np.arange(1, 9))
+    np.testing.assert_allclose(upper[0, 41:], 0.9)
+    np.testing.assert_allclose(lower[0, :7], 0.5 - 0.0625 * np.arange(7))
+    np.testing.assert_allclose(lower[0, 7:], 0.1)
+
+
+def test_unreachable_final_SoC_names_the_battery(input_dict, battery_dict):
+    data = InputData(
+        **input_dict(
+            P_gen_kW=P_GEN_KW,
+            P_load_kW=2.0,
+            battery_specs=[
+                battery_dict(id="bat_1", final_SoC=90),
+                # No surplus is left to charge 1 kW for 10 h
+                battery_dict(id="bat_2", P_ch_max_kW=1, final_SoC=90),
+            ],
+        )
+    )
+    with pytest.raises(InfeasibleInputError) as error:
+        check(data)
+    assert len(error.value.diagnostics) == 1
+    assert error.value.diagnostics[0].startswith("battery 'bat_2': final_SoC 90.00%")
+    assert "[10.00%, 75.00%]" in error.value.diagnostics[0]
+
+
+def test_P_net_after_kW_bounds(input_dict):
+    def limited_input(upper_bound, lower_bound):
+        limitation = {
+            "timestamp": "2021-04-01T12:00:00Z",
+            "upper_bound": upper_bound,
+            "lower_bound": lower_bound,
+        }
+        return InputData(
+            **input_dict(
+                P_gen_kW=P_GEN_KW, P_load_kW=2.0, P_net_after_kW_limitation=[limitation]
+            )
+        )
+
+    # At noon, P_net_before_kW is -8 kW, reachable with up to 10 kW of (dis)charging
+    check(limited_input(-18, -18))
+    with pytest.raises(InfeasibleInputError, match="upper bound below the lowest reachable"):
+        check(limited_input(-19, -20))
+    with pytest.raises(InfeasibleInputError, match="lower bound above upper bound"):
+        check(limited_input(-10, -5))
@@ -0,0 +1,33 @@
+import pytest
+from pymfm.control.algorithms import rule_based as RB
+from pymfm.control.utils import mode_logic_handler as MLH
+from pymfm.control.utils.data_input import InputData
+
+
+@pytest.fixture
+def hybrid_input(input_dict):
+    yield InputData(**input_dict(P_gen_kW=[0.0] * 32 + [8.0] * 40 + [0.0] * 24))
+    MLH._terminate_optimization_pool()
+
+
+def test_hybrid_control_reuses_its_worker_pool(hybrid_input):
+    # HiGHS does not solve the bilinear scheduling model, so the rule based schedule is returned
+    mode_logic, output_df, _ = MLH.hybrid_mode_logic_handler(hybrid_input, 30, "highs")
+    assert mode_logic["provenance"] == MLH.PROVENANCE_RULE_BASED
+    assert "optimization_error" in mode_logic
+    assert len(output_df) == 96
+    pool = MLH._hybrid_worker["pool"]
+
+    mode_logic, _, _ = MLH.hybrid_mode_logic_handler(hybrid_input, 30, "highs")
+    assert mode_logic["provenance"] == MLH.PROVENANCE_RULE_BASED
+    assert MLH._hybrid_worker["pool"] is pool
+
+
+def test_hybrid_control_reports_a_failed_fallback(hybrid_input, monkeypatch):
+    def fail(*args, **kwargs):
+        raise ValueError("no rule based schedule")
+
+    monkeypatch.setattr(RB, "scheduling", fail)
+    monkeypatch.setattr(RB, "fleet_scheduling", fail)
+    with pytest.raises(RuntimeError, match="no rule based schedule"):
+        MLH.hybrid_mode_logic_handler(hybrid_input, 30, "highs")
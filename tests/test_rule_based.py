@@ -0,0 +1,84 @@
+from dataclasses import replace
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from pymfm.control.algorithms import rule_based as RB
+from pymfm.control.utils import data_input
+from pymfm.control.utils.data_input import BatterySpecs
+
+
+def single_battery_scheduling(df_forecasts, battery_specs, delta_T):
+    # The time step loop of mode_logic_handler for a single battery
+    outputs = []
+    for _, P_load_gen in df_forecasts.iterrows():
+        output = RB.scheduling(P_load_gen, battery_specs, delta_T)
+        outputs.append(output)
+        battery_specs = replace(
+            battery_specs,
+            initial_SoC=output.bat_energy_kWs / battery_specs.bat_capacity_kWs,
+        )
+    return pd.DataFrame(outputs, index=df_forecasts.index)
+
+
+def cbes(ch_efficiency, dis_efficiency, P_max_kW):
+    return BatterySpecs(
+        id="bat_1",
+        bat_type="cbes",
+        initial_SoC=50,
+        P_dis_max_kW=P_max_kW,
+        P_ch_max_kW=P_max_kW,
+        min_SoC=10,
+        max_SoC=90,
+        bat_capacity_kWh=40,
+        ch_efficiency=ch_efficiency,
+        dis_efficiency=dis_efficiency,
+    )
+
+
+def forecasts(P_net_kW):
+    index = pd.date_range("2021-04-01", periods=len(P_net_kW), freq="15min", tz="UTC")
+    P_net_kW = np.asarray(P_net_kW, dtype=float)
+    return pd.DataFrame(
+        {"P_load_kW": np.clip(P_net_kW, 0, None), "P_gen_kW": np.clip(-P_net_kW, 0, None)},
+        index=index,
+    )
+
+
+@pytest.mark.parametrize(
+    "P_net_kW",
+    [
+        # Power and SoC limits binding
+        [20, 60, 60, 60, 60, 0, -60, -60, -60, -60, -60, -60, 10],
+        # Within the limits
+        [5, 10, -8, 0, -15, 12],
+    ],
+)
+def test_fleet_scheduling_matches_single_battery_scheduling(P_net_kW):
+    battery_specs = data_input.input_prep(cbes(1, 1, 50))
+    df_forecasts = forecasts(P_net_kW)
+    delta_T = timedelta(minutes=15)
+
+    expected = single_battery_scheduling(df_forecasts, battery_specs, delta_T)
+    output = RB.fleet_scheduling(
+        df_forecasts, data_input.battery_to_table(battery_specs), delta_T
+    )
+
+    np.testing.assert_allclose(output.P_bat_1_kW, expected.P_bat_kW)
+    np.testing.assert_allclose(output["SoC_bat_1_%"], expected.SoC_bat)
+    np.testing.assert_allclose(output.P_net_after_kW, expected.P_net_after_kW)
+
+
+def test_fleet_scheduling_applies_efficiencies_as_single_battery_scheduling():
+    # Within the limits, both deplete dis_eff * P * dT and add P * dT / ch_eff
+    battery_specs = data_input.input_prep(cbes(0.9, 0.8, 50))
+    df_forecasts = forecasts([5, 10, -8, 0, -15, 12])
+    delta_T = timedelta(minutes=15)
+
+    expected = single_battery_scheduling(df_forecasts, battery_specs, delta_T)
+    output = RB.fleet_scheduling(
+        df_forecasts, data_input.battery_to_table(battery_specs), delta_T
+    )
+
+    np.testing.assert_allclose(output["SoC_bat_1_%"], expected.SoC_bat)
+    np.testing.assert_allclose(output.P_net_after_kW, expected.P_net_after_kW)
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from pyomo.core import Constraint
+from pymfm.control.utils.data_input import ForecastPatch, InputData, P_net_after_kWLimitation
+from pymfm.control.utils.scheduling_session import SchedulingSession
+
+P_GEN_KW = np.repeat([0.0, 8.0, 0.0], [32, 40, 24])
+
+
+def constraints(model):
+    # The constraints of a model as strings, to compare models built in different ways
+    return {
+        constraint.name: {
+            index: (str(data.lower), str(data.body), str(data.upper))
+            for index, data in constraint.items()
+        }
+        for constraint in model.component_objects(Constraint, active=True)
+    }
+
+
+def scheduling_input(
+    input_dict, battery_dict, P_gen_kW=P_GEN_KW, initial_SoCs=(50, 50), **battery_fields
+):
+    return InputData(
+        **input_dict(
+            P_gen_kW=P_gen_kW,
+            P_load_kW=2.0,
+            battery_specs=[
+                battery_dict(id="bat_1", initial_SoC=initial_SoCs[0], **battery_fields),
+                battery_dict(
+                    id="bat_2",
+                    initial_SoC=initial_SoCs[1],
+                    **{"bat_capacity_kWh": 20, **battery_fields},
+                ),
+            ],
+        )
+    )
+
+
+def test_failed_overrides_keep_the_session_model(input_dict, battery_dict):
+    session = SchedulingSession(scheduling_input(input_dict, battery_dict), "highs")
+    expected = constraints(session.model)
+
+    with pytest.raises(ZeroDivisionError):
+        session.apply_overrides({"ch_efficiency": 0, "max_SoC": 80})
+    assert constraints(session.model) == expected
+    assert session.battery_table.ch_efficiency.tolist() == [1.0, 1.0]
+
+    # The failed overrides are applied again on the next call
+    assert session.apply_overrides({"ch_efficiency": 0.9, "max_SoC": 80}) == [
+        "max_SoC",
+        "ch_efficiency",
+    ]
+    fresh = SchedulingSession(
+        scheduling_input(input_dict, battery_dict, ch_efficiency=0.9, max_SoC=80), "highs"
+    )
+    assert constraints(session.model) == constraints(fresh.model)
+
+
+def test_patch_matches_a_fresh_build(input_dict, battery_dict):
+    session = SchedulingSession(scheduling_input(input_dict, battery_dict), "highs")
+    # Surplus turns into deficit and vice versa, which adds and removes constraint indices
+    P_gen_kW = P_GEN_KW.copy()
+    P_gen_kW[[30, 31, 40, 41]] = [5.0, 5.0, 1.0, 0.0]
+    timestamps = session.df_forecasts.index
+    patch = ForecastPatch(
+        values=[
+            {"timestamp": timestamps[i], "P_gen_kW": P_gen_kW[i], "P_load_kW": 2.0}
+            for i in range(28, 44)
+        ],
+        initial_SoC={"bat_1": 70},
+    )
+
+    changed = session.apply_patch(patch)
+
+    assert changed.equals(timestamps[[30, 31, 40, 41]])
+    fresh = SchedulingSession(
+        scheduling_input(input_dict, battery_dict, P_gen_kW=P_gen_kW, initial_SoCs=(70, 50)),
+        "highs",
+    )
+    assert constraints(session.model) == constraints(fresh.model)
+
+
+def test_overrides_match_a_fresh_build(input_dict, battery_dict):
+    limitation = [
+        P_net_after_kWLimitation(
+            timestamp="2021-04-01T12:00:00Z", upper_bound=-2, lower_bound=-4
+        ),
+        P_net_after_kWLimitation(timestamp="2021-04-01T12:15:00Z", upper_bound=-3),
+    ]
+    session = SchedulingSession(scheduling_input(input_dict, battery_dict), "highs")
+    base = constraints(session.model)
+
+    changed = session.apply_overrides(
+        {"bat_capacity_kWh": 60, "dis_efficiency": 0.9, "P_net_after_kW_limitation": limitation}
+    )
+
+    assert changed == [
+        "bat_capacity_kWs",
+        "dis_efficiency",
+        "bat_capacity_kWh",
+        "P_net_after_kW_limitation",
+    ]
+    data = scheduling_input(input_dict, battery_dict, bat_capacity_kWh=60, dis_efficiency=0.9)
+    fresh = SchedulingSession(
+        data.copy(update={"P_net_after_kW_limitation": limitation}), "highs"
+    )
+    assert constraints(session.model) == constraints(fresh.model)
+
+    # Overrides are relative to the input of the session
+    session.apply_overrides({})
+    assert constraints(session.model) == base
@@ -0,0 +1,77 @@
+from dataclasses import replace
+import numpy as np
+import pandas as pd
+import pytest
+from pymfm.control.algorithms import rule_based as RB
+from pymfm.control.utils import data_input, simulation
+from pymfm.control.utils.data_input import BatterySpecs
+
+DELTA_T_H = 0.25
+
+
+def battery(battery_dict, **fields):
+    return data_input.input_prep(
+        BatterySpecs(
+            **battery_dict(id="bat_1", ch_efficiency=0.9, dis_efficiency=0.95, **fields)
+        )
+    )
+
+
+def measurements(n_steps=500, seed=0):
+    # Power limits and both SoC limits are hit
+    rng = np.random.default_rng(seed)
+    P_net_meas_kW = rng.normal(0, 8, n_steps) + 6 * np.sin(np.arange(n_steps) / 40)
+    return P_net_meas_kW, rng.normal(0, 2, n_steps)
+
+
+def test_kernel_matches_near_real_time(battery_dict):
+    battery_specs = battery(battery_dict)
+    P_net_meas_kW, P_req_kW = measurements()
+
+    expected = []
+    step_specs = battery_specs
+    for P_net, P_req in zip(P_net_meas_kW, P_req_kW):
+        output = RB.near_real_time(
+            {
+                "timestamp": None,
+                "P_req_kW": P_req,
+                "delta_T_h": DELTA_T_H,
+                "P_net_meas_kW": P_net,
+            },
+            step_specs,
+        )
+        expected.append(output)
+        step_specs = replace(step_specs, initial_SoC=output["SoC_bat_%"] / 100)
+    expected = pd.DataFrame(expected)
+
+    sim = simulation.NearRealTimeSimulation(battery_specs, DELTA_T_H)
+    chunks = list(simulation.measurement_chunks(P_net_meas_kW, P_req_kW, chunk_size=128))
+    results = pd.DataFrame([sim.run(*chunk) for chunk in chunks]).apply(np.concatenate)
+
+    assert expected["SoC_bat_%"].min() == pytest.approx(10)
+    assert expected["SoC_bat_%"].max() == pytest.approx(90)
+    np.testing.assert_allclose(results["SoC_bat_%"], expected["SoC_bat_%"], atol=1e-9)
+    np.testing.assert_allclose(results["P_net_after_kW"], expected["P_net_after_kW"], atol=1e-9)
+    kpis = sim.kpis()
+    assert kpis["steps"] == 500
+    assert kpis["SoC_violation_steps"] == 0
+    assert kpis["final_SoC_%"] == pytest.approx(expected["SoC_bat_%"].iloc[-1])
+    assert kpis["deviation_steps"] == int((expected["P_net_after_kW"] != 0).sum())
+
+
+def test_parameter_sets_in_parallel(battery_dict):
+    P_net_meas_kW, P_req_kW = measurements()
+    parameter_sets = [
+        battery(battery_dict, bat_capacity_kWh=capacity) for capacity in (10, 40, 80)
+    ]
+
+    kpis = simulation.simulate_parameter_sets(
+        P_net_meas_kW, P_req_kW, parameter_sets, DELTA_T_H, processes=2
+    )
+
+    expected = simulation.simulate_parameter_sets(
+        P_net_meas_kW, P_req_kW, parameter_sets, DELTA_T_H, processes=1
+    )
+    pd.testing.assert_frame_equal(kpis, expected)
+    # Larger batteries follow the requests more often
+    assert kpis.deviation_steps.is_monotonic_decreasing
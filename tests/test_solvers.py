@@ -0,0 +1,59 @@
+import math
+import pytest
+from pyomo.environ import ConcreteModel, Constraint, Objective, Var, value
+from pymfm.control.utils import solvers
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # Backends registered by a test are dropped afterwards
+    monkeypatch.setattr(solvers, "SOLVER_BACKENDS", dict(solvers.SOLVER_BACKENDS))
+    monkeypatch.delenv(solvers.SOLVER_ENV_VARIABLE, raising=False)
+
+
+def test_solver_name_resolution(registry, monkeypatch):
+    assert solvers.solver_name() == solvers.DEFAULT_SOLVER
+    monkeypatch.setenv(solvers.SOLVER_ENV_VARIABLE, "highs")
+    assert solvers.solver_name() == "highs"
+    assert solvers.solver_name("glpk") == "glpk"
+    with pytest.raises(ValueError, match="Unknown solver backend 'cplex'"):
+        solvers.solver_name("cplex")
+
+
+def test_interfaces_fall_back_in_order(registry):
+    solvers.register_solver("fallback", ("no_such_solver", "appsi_highs", "glpk"))
+    assert solvers.solver_interface("fallback") == "appsi_highs"
+    assert "fallback" in solvers.available_solvers()
+
+    solvers.register_solver("missing", ("no_such_solver",))
+    assert "missing" not in solvers.available_solvers()
+    with pytest.raises(RuntimeError, match="'missing' is not available"):
+        solvers.solver_interface("missing")
+
+
+def test_time_limit_options(registry):
+    assert solvers.time_limit_options(2.5, "highs") == {"time_limit": 2.5}
+    # GLPK only accepts whole seconds
+    assert solvers.time_limit_options(0.4, "glpk") == {"tmlim": 1}
+    solvers.register_solver("no_limit", ("appsi_highs",))
+    with pytest.raises(ValueError, match="no time limit option"):
+        solvers.time_limit_options(1, "no_limit")
+
+
+def test_solve_with_backend_options(registry):
+    model = ConcreteModel()
+    model.x = Var(bounds=(0, 10))
+    model.y = Var(bounds=(0, 10))
+    model.c = Constraint(expr=model.x + 2 * model.y >= 4)
+    model.obj = Objective(expr=3 * model.x + 2 * model.y)
+    solvers.register_solver("highs_quiet", ("appsi_highs",), {"output_flag": False})
+
+    results = solvers.solve(model, "highs_quiet")
+    assert str(results.solver.termination_condition) == "optimal"
+    assert value(model.obj) == pytest.approx(4.0)
+    assert solvers.relative_gap(results) == pytest.approx(0.0)
+
+
+def test_relative_gap_without_bounds():
+    results = solvers.SolverResults()
+    assert math.isnan(solvers.relative_gap(results))
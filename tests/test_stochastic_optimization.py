@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from pymfm.control.utils.data_input import InputData
+from pymfm.control.utils.mode_logic_handler import mode_logic_handler
+
+P_GEN_KW = np.repeat([0.0, 10.0, 0.0], [32, 40, 24])
+
+
+def scenarios_input(input_dict, scenarios):
+    # Scenarios as (probability, P_gen_kW factor) on the timestamps of generation_and_load
+    data = input_dict(P_gen_kW=P_GEN_KW, P_load_kW=2.0)
+    values = data["generation_and_load"]["values"]
+    data["forecast_scenarios"] = [
+        {
+            "probability": probability,
+            "values": [dict(value, P_gen_kW=value["P_gen_kW"] * factor) for value in values],
+        }
+        for probability, factor in scenarios
+    ]
+    return InputData(**data)
+
+
+def test_battery_setpoints_are_shared_by_all_scenarios(input_dict):
+    _, output_df, (_, termination_condition) = mode_logic_handler(
+        scenarios_input(input_dict, [(0.7, 1.0), (0.3, 0.5)]), "highs"
+    )
+
+    assert str(termination_condition) == "optimal"
+    # Power balance of every scenario with the shared battery power
+    for k, factor in enumerate([1.0, 0.5]):
+        np.testing.assert_allclose(
+            output_df[f"P_net_after_kW_scenario_{k}"],
+            2.0 - factor * P_GEN_KW + output_df.P_bat_total_kW,
+            atol=1e-9,
+        )
+    np.testing.assert_allclose(
+        output_df.P_net_after_kW,
+        0.7 * output_df.P_net_after_kW_scenario_0 + 0.3 * output_df.P_net_after_kW_scenario_1,
+    )
+    np.testing.assert_allclose(output_df.P_PV_forecast_kW, 0.85 * P_GEN_KW)
+    SoC = output_df["SoC_0_%"]
+    assert SoC.min() >= 10 - 1e-6 and SoC.max() <= 90 + 1e-6
+
+
+def test_identical_scenarios_match_a_single_scenario(input_dict):
+    _, single, _ = mode_logic_handler(scenarios_input(input_dict, [(1.0, 1.0)]), "highs")
+    _, split, _ = mode_logic_handler(
+        scenarios_input(input_dict, [(0.25, 1.0), (0.75, 1.0)]), "highs"
+    )
+
+    assert np.abs(split.P_net_after_kW).sum() == pytest.approx(
+        np.abs(single.P_net_after_kW).sum()
+    )
+    np.testing.assert_allclose(
+        split.P_net_after_kW_scenario_0, split.P_net_after_kW_scenario_1, atol=1e-9
+    )
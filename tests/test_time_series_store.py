@@ -0,0 +1,66 @@
+from multiprocessing import get_context
+import numpy as np
+import pandas as pd
+import pytest
+from pymfm.control.utils.time_series_store import TimeSeriesStore
+
+
+def forecast(start, periods):
+    index = pd.date_range(start, periods=periods, freq="15min", tz="UTC")
+    return pd.DataFrame(
+        {
+            "P_gen_kW": np.arange(periods, dtype=float),
+            "P_load_kW": np.arange(periods, dtype=float) + 0.5,
+        },
+        index=index,
+    )
+
+
+def open_and_read(directory, n_opens=100):
+    for _ in range(n_opens):
+        store = TimeSeriesStore(directory)
+        window = store.window("2021-04-01T00:00Z", "2021-04-01T23:45Z")
+        assert len(window) == 96 and not window.isna().any().any()
+    return n_opens
+
+
+def test_store_opens_concurrently(tmp_path):
+    directory = str(tmp_path / "store")
+    TimeSeriesStore(directory, pd.Timedelta("15min")).append(
+        forecast("2021-04-01", 96)
+    )
+    with get_context("fork").Pool(8) as pool:
+        assert pool.starmap(open_and_read, [(directory,)] * 8) == [100] * 8
+    assert [path.name for path in (tmp_path / "store").glob("*.tmp")] == []
+
+
+def test_append_and_window(tmp_path):
+    directory = str(tmp_path / "store")
+    store = TimeSeriesStore(directory, pd.Timedelta("15min"))
+    store.append(forecast("2021-04-02", 96))
+    # Grow to the front, past the initial capacity to the back and overwrite stored time steps
+    store.append(forecast("2021-04-01", 48))
+    store.append(forecast("2021-04-03", 2000))
+    store.append(forecast("2021-04-02 12:00", 4) * 10)
+
+    store = TimeSeriesStore(directory)
+    assert store.start == pd.Timestamp("2021-04-01T00:00Z")
+    assert len(store) == 96 * 2 + 2000
+    window = store.window("2021-04-01T11:30Z", "2021-04-02T12:30Z")
+    assert window.index.freq == pd.Timedelta("15min")
+    np.testing.assert_array_equal(
+        window.P_gen_kW, np.r_[46.0, 47.0, np.full(48, np.nan), np.arange(48.0), 0.0, 10.0, 20.0]
+    )
+
+    # Time steps outside of the stored range are NaN
+    window = store.window("2021-03-31T23:30Z", "2021-04-01T00:15Z")
+    np.testing.assert_array_equal(window.P_load_kW, [np.nan, np.nan, 0.5, 1.5])
+    with pytest.raises(ValueError, match="no generation and load data for 48 time steps"):
+        store.to_generation_and_load("2021-04-01T00:00Z", "2021-04-01T23:45Z")
+    generation_and_load = store.to_generation_and_load("2021-04-02T00:00Z", "2021-04-02T23:45Z")
+    assert generation_and_load.timestamps().equals(
+        pd.date_range("2021-04-02", periods=96, freq="15min", tz="UTC")
+    )
+
+    with pytest.raises(ValueError, match="not on the time step grid"):
+        store.append(forecast("2021-04-01 00:05", 1))
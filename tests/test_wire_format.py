@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+import pytest
+from pymfm.control.utils import data_output, wire_format
+from pymfm.control.utils.data_input import InputData
+from pymfm.control.utils.mode_logic_handler import mode_logic_handler
+
+EXAMPLE_INPUTS = sorted(
+    (Path(__file__).parents[1] / "src/pymfm/examples/control/inputs").glob("*.json")
+)
+
+
+def example_input(path):
+    with open(path) as data_file:
+        return InputData(**json.load(data_file))
+
+
+@pytest.mark.parametrize("path", EXAMPLE_INPUTS, ids=lambda path: path.stem)
+def test_pack_round_trip(path):
+    data = example_input(path).dict(by_alias=True, exclude_unset=True)
+    packed = wire_format.pack(data)
+    assert wire_format.unpack(packed) == data
+
+
+@pytest.mark.parametrize("name", wire_format.WIRE_FORMATS)
+@pytest.mark.parametrize("path", EXAMPLE_INPUTS, ids=lambda path: path.stem)
+def test_input_round_trip(path, name):
+    pytest.importorskip({"msgpack": "msgpack", "cbor": "cbor2"}[name])
+    data = example_input(path)
+    payload = wire_format.encode_input(data, name)
+    assert len(payload) < len(data.json(by_alias=True, exclude_unset=True))
+    assert wire_format.decode_input(payload, name) == data
+    assert wire_format.decode_input(payload, name, trusted=True) == data
+
+
+@pytest.mark.parametrize("name", wire_format.WIRE_FORMATS)
+def test_output_round_trip(input_dict, name):
+    pytest.importorskip({"msgpack": "msgpack", "cbor": "cbor2"}[name])
+    mode_logic, output_df, _ = mode_logic_handler(
+        InputData(**input_dict(control_logic="rule_based", P_gen_kW=3.0))
+    )
+    payload = wire_format.encode_output(mode_logic, output_df, name)
+    assert wire_format.decode_output(payload, name) == data_output.output_to_dict(
+        mode_logic, output_df
+    )
+
+
+def test_unknown_wire_format():
+    with pytest.raises(ValueError, match="unknown wire format 'protobuf'"):
+        wire_format.encode_input(None, "protobuf")